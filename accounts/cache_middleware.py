@@ -7,6 +7,10 @@ class PreventCacheMiddleware:
     """
     Middleware to prevent caching of authenticated pages and API responses.
     This ensures that users can't access cached versions of pages after logging out.
+
+    Responses carrying an ETag (the dashboard JSON endpoints, tagged with their
+    data version) may be kept privately by the browser, but only reused after
+    revalidating with If-None-Match, which still goes through authentication.
     """
     def __init__(self, get_response):
         self.get_response = get_response
@@ -16,6 +20,11 @@ class PreventCacheMiddleware:
         
         # Don't cache authenticated pages
         if hasattr(request, 'user') and request.user.is_authenticated:
+            if response.has_header('ETag'):
+                # Allow private revalidation: stored by the browser, checked on every use
+                response['Cache-Control'] = 'private, no-cache, max-age=0'
+                return response
+            
             add_never_cache_headers(response)
             
             # Additional headers to prevent caching
@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Usagereport, ReportGeneration, SubscriberProductRate, ENQUIRY_RATES
+from .models import (
+    Usagereport, ReportGeneration, SubscriberProductRate, UsageDailyRollup, SubscriberFirstSeen, AggregateWatermark,
+    ENQUIRY_RATES,
+)
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
@@ -17,6 +20,28 @@ class UsagereportAdmin(admin.ModelAdmin):
     list_per_page = 50
 
 
+class UsageDailyRollupAdmin(admin.ModelAdmin):
+    list_display = ('date', 'subscriber_name', 'product_name', 'usage_count')
+    list_filter = ('date',)
+    search_fields = ('subscriber_name', 'product_name')
+    date_hierarchy = 'date'
+    ordering = ('-date', 'subscriber_name', 'product_name')
+    list_per_page = 50
+
+
+class SubscriberFirstSeenAdmin(admin.ModelAdmin):
+    list_display = ('subscriber_name', 'first_seen')
+    search_fields = ('subscriber_name',)
+    date_hierarchy = 'first_seen'
+    ordering = ('-first_seen', 'subscriber_name')
+    list_per_page = 50
+
+
+class AggregateWatermarkAdmin(admin.ModelAdmin):
+    list_display = ('name', 'high_water_date', 'last_refreshed_at', 'rows_scanned')
+    readonly_fields = ('last_refreshed_at', 'rows_scanned')
+
+
 class ReportGenerationAdmin(admin.ModelAdmin):
     list_display = ('user', 'report_type', 'status', 'formatted_generated_at', 'formatted_completed_at', 'subscriber_name', 'duration_display')
     list_filter = ('report_type', 'status', 'generated_at')
@@ -176,3 +201,6 @@ class SubscriberProductRateAdmin(admin.ModelAdmin):
 admin.site.register(Usagereport, UsagereportAdmin)
 admin.site.register(ReportGeneration, ReportGenerationAdmin)
 admin.site.register(SubscriberProductRate, SubscriberProductRateAdmin)
+admin.site.register(UsageDailyRollup, UsageDailyRollupAdmin)
+admin.site.register(SubscriberFirstSeen, SubscriberFirstSeenAdmin)
+admin.site.register(AggregateWatermark, AggregateWatermarkAdmin)
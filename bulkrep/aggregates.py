@@ -0,0 +1,92 @@
+# Incremental refresh of usage-derived aggregates
+# usagereport is loaded by an external process and nothing tells the app which
+# days changed. Each aggregate built from it keeps an AggregateWatermark: the
+# newest DetailsViewedDate it has absorbed. A refresh recomputes only the days
+# after the watermark plus a late-arrival window before it (rows for recent
+# days can keep landing after the load that first delivered them), so a
+# scheduled run costs work proportional to new data rather than a full rebuild.
+# Every refresher replaces whole days, so repeated or overlapping runs are safe.
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .first_seen import refresh_subscriber_first_seen
+from .models import AggregateWatermark
+from .rollups import refresh_usage_rollup, usage_date_bounds
+
+logger = logging.getLogger(__name__)
+
+# Days before the watermark recomputed on every run (USAGE_LATE_ARRIVAL_DAYS in settings)
+DEFAULT_LATE_ARRIVAL_DAYS = 3
+
+# Aggregate name -> refresh(start_date, end_date) returning (usage rows scanned, rows written)
+AGGREGATE_REFRESHERS = {
+    'usage_daily_rollup': refresh_usage_rollup,
+    'subscriber_first_seen': refresh_subscriber_first_seen,
+}
+
+
+def late_arrival_days():
+    """Number of days before each watermark that are recomputed on every run."""
+    return max(0, getattr(settings, 'USAGE_LATE_ARRIVAL_DAYS', DEFAULT_LATE_ARRIVAL_DAYS))
+
+
+def refresh_aggregate(name, late_days=None, full=False, latest_date=None):
+    """
+    Bring one aggregate up to date with usagereport.
+
+    Args:
+        name: Key of AGGREGATE_REFRESHERS
+        late_days: Late-arrival window; defaults to late_arrival_days()
+        full: Ignore the watermark and rebuild from the first usage date
+        latest_date: Newest DetailsViewedDate, if the caller already looked it up
+
+    Returns:
+        Dictionary with the refreshed range, rows scanned and rows written
+    """
+    refresh = AGGREGATE_REFRESHERS[name]
+    if late_days is None:
+        late_days = late_arrival_days()
+
+    if latest_date is None:
+        latest_date = usage_date_bounds()[1]
+
+    watermark, _ = AggregateWatermark.objects.get_or_create(name=name)
+    if latest_date is None:
+        logger.info(f"{name}: usagereport is empty, nothing to refresh")
+        return {'name': name, 'start_date': None, 'end_date': None, 'scanned': 0, 'written': 0}
+
+    if full or watermark.high_water_date is None:
+        start_date = usage_date_bounds()[0]
+    else:
+        start_date = min(watermark.high_water_date - timedelta(days=late_days), latest_date)
+    # Recompute up to an older, later watermark too, so days whose rows were removed are cleared
+    end_date = max(latest_date, watermark.high_water_date or latest_date)
+
+    scanned, written = refresh(start_date, end_date)
+
+    watermark.high_water_date = latest_date
+    watermark.last_refreshed_at = timezone.now()
+    watermark.rows_scanned = scanned
+    watermark.save()
+
+    logger.info(f"{name}: refreshed {start_date} to {end_date}, scanned {scanned} usage rows, wrote {written} rows")
+    return {'name': name, 'start_date': start_date, 'end_date': end_date, 'scanned': scanned, 'written': written}
+
+
+def refresh_aggregates(names=None, late_days=None, full=False):
+    """
+    Refresh every registered aggregate (or the ones named) from its watermark.
+
+    Returns:
+        List of refresh_aggregate() results, in registration order
+    """
+    latest_date = usage_date_bounds()[1]
+    return [
+        refresh_aggregate(name, late_days=late_days, full=full, latest_date=latest_date)
+        for name in AGGREGATE_REFRESHERS
+        if names is None or name in names
+    ]
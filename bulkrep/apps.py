@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class BulkrepConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'bulkrep'
+
+    def ready(self):
+        # Register the report job queue checks
+        from . import checks  # noqa: F401
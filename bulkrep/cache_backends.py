@@ -0,0 +1,209 @@
+# Two-tier cache backend for dashboard data
+# The default DatabaseCache lives on the same SQL Server that answers the
+# analytics queries, so every cache hit is a database round trip and culling
+# runs DELETE scans there. TieredCache keeps a bounded in-process LRU in front
+# of a shared cache (Redis, or a local file cache when Redis isn't available):
+# hot dashboard entries are served from process memory, and other processes
+# still share what one of them computed.
+# Local copies live at most LOCAL_TIMEOUT seconds (and never past their own
+# timeout), since a delete or clear in another process can't reach them. The
+# shared tier stores each value with its absolute expiry, so a copy taken from
+# it expires when the shared entry does rather than a full LOCAL_TIMEOUT later.
+#
+# CACHES = {
+#     'dashboard': {
+#         'BACKEND': 'bulkrep.cache_backends.TieredCache',
+#         'LOCATION': 'dashboard',
+#         'OPTIONS': {'SHARED_CACHE': 'dashboard_shared', 'MAX_ENTRIES': 1024, 'LOCAL_TIMEOUT': 60},
+#     },
+#     'dashboard_shared': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', ...},
+# }
+
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+logger = logging.getLogger(__name__)
+
+# Seconds a value is kept in process memory before the shared tier is asked again
+DEFAULT_LOCAL_TIMEOUT = 60
+
+# Django creates a cache backend instance per thread; the in-process tier is
+# shared by every thread of the process, per LOCATION
+_local_stores = {}
+_local_locks = {}
+
+# Form of a value in the shared tier: expires_at is an absolute time, or None
+# for no timeout
+SharedEntry = namedtuple('SharedEntry', ['value', 'expires_at'])
+
+
+class TieredCache(BaseCache):
+    """
+    Cache backend with an in-process LRU first tier and a shared second tier.
+
+    Reads try process memory first and fall back to the shared cache, copying
+    hits into memory. Writes go to both tiers. Errors from the shared cache are
+    logged and treated as misses, so the dashboard keeps working without it.
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED_CACHE')
+        self._local_timeout = options.get('LOCAL_TIMEOUT', DEFAULT_LOCAL_TIMEOUT)
+        self._store = _local_stores.setdefault(location, OrderedDict())
+        self._lock = _local_locks.setdefault(location, threading.Lock())
+
+    @property
+    def shared_tier(self):
+        """The shared cache behind the in-process tier, or None when none is configured."""
+        return caches[self._shared_alias] if self._shared_alias else None
+
+    # In-process tier
+
+    def _local_expiry(self, expires_at):
+        """Absolute expiry for a local copy of a value that expires at expires_at (None = never)."""
+        expiry = time.time() + self._local_timeout
+        return expiry if expires_at is None else min(expiry, expires_at)
+
+    def _local_get(self, key):
+        with self._lock:
+            entry = self._store.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._store[key]
+                return None
+            self._store.move_to_end(key)
+            return entry
+
+    def _local_set(self, key, value, expires_at):
+        expiry = self._local_expiry(expires_at)
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        with self._lock:
+            self._store[key] = (pickled, expiry)
+            self._store.move_to_end(key)
+            while len(self._store) > self._max_entries:
+                self._store.popitem(last=False)
+
+    def _local_delete(self, key):
+        with self._lock:
+            return self._store.pop(key, None) is not None
+
+    # Shared tier
+
+    def _shared_entry(self, value, timeout):
+        return SharedEntry(value, self.get_backend_timeout(timeout))
+
+    def _from_shared(self, local_key, entry):
+        """Unwrap a shared-tier value and copy it into process memory until it expires."""
+        if isinstance(entry, SharedEntry):
+            value, expires_at = entry
+        else:
+            value, expires_at = entry, None  # Not written through a TieredCache
+        if expires_at is None or expires_at > time.time():
+            self._local_set(local_key, value, expires_at)
+        return value
+
+    def _shared_call(self, method, *args, default=None, **kwargs):
+        shared = self.shared_tier
+        if shared is None:
+            return default
+        try:
+            return getattr(shared, method)(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"Shared cache '{self._shared_alias}' {method} failed: {str(e)}")
+            return default
+
+    # Cache API
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        entry = self._local_get(local_key)
+        if entry is not None:
+            return pickle.loads(entry[0])
+
+        missing = object()
+        entry = self._shared_call('get', key, missing, version=version, default=missing)
+        if entry is missing:
+            return default
+        return self._from_shared(local_key, entry)
+
+    def get_many(self, keys, version=None):
+        found = {}
+        remote_keys = []
+        for key in keys:
+            entry = self._local_get(self.make_and_validate_key(key, version=version))
+            if entry is not None:
+                found[key] = pickle.loads(entry[0])
+            else:
+                remote_keys.append(key)
+
+        if remote_keys:
+            shared_found = self._shared_call('get_many', remote_keys, version=version, default={})
+            for key, entry in shared_found.items():
+                found[key] = self._from_shared(self.make_and_validate_key(key, version=version), entry)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        entry = self._shared_entry(value, timeout)
+        self._local_set(self.make_and_validate_key(key, version=version), value, entry.expires_at)
+        self._shared_call('set', key, entry, timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        entries = {key: self._shared_entry(value, timeout) for key, value in data.items()}
+        for key, entry in entries.items():
+            self._local_set(self.make_and_validate_key(key, version=version), entry.value, entry.expires_at)
+        self._shared_call('set_many', entries, timeout, version=version, default=[])
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        if self._local_get(local_key) is not None:
+            return False
+        # The shared tier decides (atomically on Redis); None means it is unavailable
+        entry = self._shared_entry(value, timeout)
+        added = self._shared_call('add', key, entry, timeout, version=version)
+        if added is False:
+            return False
+        self._local_set(local_key, value, entry.expires_at)
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        expires_at = self.get_backend_timeout(timeout)
+        local_entry = self._local_get(local_key)
+        if local_entry is not None:
+            with self._lock:
+                self._store[local_key] = (local_entry[0], self._local_expiry(expires_at))
+        # The expiry stored with the shared value changes too, so the entry is rewritten (not atomically)
+        touched = False
+        entry = self._shared_call('get', key, version=version)
+        if entry is not None:
+            value = entry.value if isinstance(entry, SharedEntry) else entry
+            touched = self._shared_call(
+                'set', key, SharedEntry(value, expires_at), timeout, version=version, default=False
+            ) is not False
+        return touched or local_entry is not None
+
+    def delete(self, key, version=None):
+        deleted = self._local_delete(self.make_and_validate_key(key, version=version))
+        return self._shared_call('delete', key, version=version, default=False) or deleted
+
+    def has_key(self, key, version=None):
+        if self._local_get(self.make_and_validate_key(key, version=version)) is not None:
+            return True
+        return self._shared_call('has_key', key, version=version, default=False)
+
+    def clear(self):
+        with self._lock:
+            self._store.clear()
+        self._shared_call('clear')
@@ -0,0 +1,33 @@
+# System checks for the background report job configuration
+# Report jobs run on Celery. In eager mode they run synchronously inside the
+# request that started them, which is meant for development only; without
+# eager mode they need a real broker, since the in-process memory:// broker
+# never reaches a worker. Both mistakes would otherwise only show up as slow
+# or never-finishing report jobs in production.
+
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+# Brokers that only exist inside the current process
+IN_PROCESS_BROKERS = ('memory://',)
+
+
+@register(Tags.compatibility)
+def check_report_job_queue(app_configs, **kwargs):
+    """Flag eager report jobs outside DEBUG and queued jobs without a broker."""
+    eager = getattr(settings, 'CELERY_TASK_ALWAYS_EAGER', False)
+    broker_url = getattr(settings, 'CELERY_BROKER_URL', '') or ''
+
+    if eager and not settings.DEBUG:
+        return [Warning(
+            'Report jobs run synchronously inside the request (CELERY_TASK_ALWAYS_EAGER is on and DEBUG is off).',
+            hint='Point CELERY_BROKER_URL at Redis, set CELERY_TASK_ALWAYS_EAGER=False and start a Celery worker.',
+            id='bulkrep.W001',
+        )]
+    if not eager and (not broker_url or broker_url.startswith(IN_PROCESS_BROKERS)):
+        return [Error(
+            f"Report jobs are queued on an in-process broker ({broker_url or 'none'}) that no worker can read.",
+            hint='Set CELERY_BROKER_URL to a shared broker such as Redis, or CELERY_TASK_ALWAYS_EAGER=True in development.',
+            id='bulkrep.E001',
+        )]
+    return []
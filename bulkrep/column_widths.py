@@ -0,0 +1,205 @@
+# Incremental column widths for report worksheets
+# auto_size_columns used to rescan every row of every sheet once per column and,
+# for each non-empty cell, loop over every merged range. A ColumnWidthTracker is
+# attached to each worksheet when the template is loaded; the row writers feed it
+# each row as it is written, so sizing the columns at the end only looks at the
+# handful of template rows plus one running maximum per column.
+
+from openpyxl.utils import get_column_letter
+
+from .merged_ranges import find_merge_span, get_merged_index
+
+TRACKER_ATTRIBUTE = '_bulkrep_width_tracker'
+
+# Define minimum and maximum widths for specific columns
+MIN_WIDTHS = {
+    # Set minimum widths to prevent columns from being too narrow
+    5: 10,  # SubscriberName (E)
+    6: 10,  # SubscriberName (F)
+    7: 9,  # SystemUser (G)
+    8: 10,  # SystemUser (H)
+    9: 9,  # SystemUser (I)
+    10: 15, # SubscriberEnquiryDate (J)
+    11: 20, # ProductName (K)
+    12: 5, # DetailsViewedDate (L)
+    13: 10, # DetailsViewedDate (M)
+    14: 5, # DetailsViewedDate (N)
+    # Default minimum width for other columns
+    'default': 10
+}
+
+# Define maximum widths for specific columns that tend to get too wide
+MAX_WIDTHS = {
+    # DetailsViewedDate (columns L-N, 12-14)
+    12: 5, 13: 10, 14: 5,
+    # SearchOutput (columns O-Q, 15-17) - increased to allow more content to be visible
+    15: 40, 16: 40, 17: 40,
+    # Default max width for other columns
+    'default': 30
+}
+
+# Title rows whose merged range is shared 40/60 between its columns
+SPECIAL_MERGE_ROWS = (2, 6)
+
+
+def measure_value(col, value, merge_span=None):
+    """
+    Return the content length a value contributes to its column.
+
+    Args:
+        col: Column index the value is written to
+        value: Cell value
+        merge_span: (min_col, max_col) of the merged range anchored at the cell
+
+    Returns:
+        Approximate width in characters, or 0 for empty values
+    """
+    if not value:
+        return 0
+    try:
+        cell_length = len(str(value))
+    except Exception:
+        return 0
+
+    if merge_span is not None:
+        min_col, max_col = merge_span
+        merge_width = max_col - min_col + 1
+        if 15 <= min_col <= 17 and 15 <= max_col <= 17:
+            # SearchOutput is wrapped, so its first column takes half the text
+            if col == min_col:
+                cell_length = cell_length * 0.5
+            else:
+                cell_length = (cell_length * 0.5) / (merge_width - 1)
+        else:
+            # For other merged cells, divide by the number of columns
+            # but ensure a minimum reasonable length
+            cell_length = max(10, cell_length / merge_width)
+    return cell_length
+
+
+class ColumnWidthTracker:
+    """
+    Running maximum content length per column of one worksheet.
+
+    Rows that exist when the tracker is created (the template) are measured when
+    the widths are applied, so later edits to titles and the bill summary count.
+    Every other row must be passed to observe_row() once it is fully written.
+    """
+
+    def __init__(self, ws, min_col=1, max_col=17):
+        self.ws = ws
+        self.min_col = min_col
+        self.max_col = max_col
+        self.template_rows = ws.max_row
+        self.max_lengths = {}
+
+    def observe(self, row, col, value, merge_span=None):
+        """
+        Record one cell value.
+
+        Args:
+            row: Worksheet row the value is (or will be) written to
+            col: Column index
+            value: Cell value; empty values are ignored
+            merge_span: (min_col, max_col) of the merged range anchored at the cell
+        """
+        if not self.min_col <= col <= self.max_col:
+            return
+        cell_length = measure_value(col, value, merge_span)
+        if cell_length > self.max_lengths.get(col, 0):
+            self.max_lengths[col] = cell_length
+
+    def observe_row(self, row):
+        """Record every value of a written row, using the merges applied or planned for it."""
+        cells = self.ws._cells
+        for col in range(self.min_col, self.max_col + 1):
+            cell = cells.get((row, col))
+            if cell is None or not cell.value:
+                continue
+            self.observe(row, col, cell.value, find_merge_span(self.ws, row, col))
+
+    def observe_rows(self, start_row, end_row):
+        """Record rows start_row to end_row (inclusive)."""
+        for row in range(start_row, end_row + 1):
+            self.observe_row(row)
+
+    def _special_merges(self):
+        """Return {row: merged range} for the single-row title merges on rows 2 and 6."""
+        special = {}
+        merged_index = get_merged_index(self.ws)
+        for row in SPECIAL_MERGE_ROWS:
+            for merged_range in merged_index.ranges_in_row(row):
+                if merged_range.min_row == merged_range.max_row == row:
+                    special[row] = merged_range
+                    break
+        return special
+
+    def _template_lengths(self, special):
+        """Measure the template rows in their final state."""
+        lengths = dict(self.max_lengths)
+        cells = self.ws._cells
+        merged_index = get_merged_index(self.ws)
+        for row in range(1, self.template_rows + 1):
+            special_range = special.get(row)
+            for col in range(self.min_col, self.max_col + 1):
+                # Rows 2 and 6 only count towards the first column of their merge
+                if special_range is not None and col != special_range.min_col:
+                    continue
+                cell = cells.get((row, col))
+                if cell is None or not cell.value:
+                    continue
+                if special_range is not None and merged_index.find(row, col) is special_range:
+                    # Allocate 40% of the title to the first column of the merge
+                    cell_length = measure_value(col, cell.value) * 0.4
+                else:
+                    cell_length = measure_value(col, cell.value, find_merge_span(self.ws, row, col))
+                if cell_length > lengths.get(col, 0):
+                    lengths[col] = cell_length
+        return lengths
+
+    def apply(self):
+        """Set the column widths from the recorded lengths, respecting the min/max rules."""
+        special = self._special_merges()
+        lengths = self._template_lengths(special)
+
+        # Columns covered by the row 2/6 titles (other than their first column)
+        # keep their minimum width so the titles don't stretch the table
+        skipped = set()
+        for merged_range in special.values():
+            skipped.update(range(merged_range.min_col + 1, merged_range.max_col + 1))
+
+        for col_idx in range(self.min_col, self.max_col + 1):
+            column = self.ws.column_dimensions[get_column_letter(col_idx)]
+            max_length = 0 if col_idx in skipped else lengths.get(col_idx, 0)
+
+            if max_length > 0:
+                # SearchOutput columns wrap their text, so they get more padding
+                if 15 <= col_idx <= 17:
+                    calculated_width = max_length + 3
+                else:
+                    calculated_width = max_length + 2
+
+                column_min_width = MIN_WIDTHS.get(col_idx, MIN_WIDTHS['default'])
+                column_max_width = MAX_WIDTHS.get(col_idx, MAX_WIDTHS['default'])
+                column.width = max(column_min_width, min(calculated_width, column_max_width))
+            else:
+                # If no content, use the minimum width
+                column.width = MIN_WIDTHS.get(col_idx, MIN_WIDTHS['default'])
+
+
+def get_width_tracker(ws):
+    """
+    Return the width tracker attached to a worksheet, creating it if needed.
+    A tracker created after rows were written measures them all when applied.
+    """
+    tracker = getattr(ws, TRACKER_ATTRIBUTE, None)
+    if tracker is None:
+        tracker = ColumnWidthTracker(ws)
+        setattr(ws, TRACKER_ATTRIBUTE, tracker)
+    return tracker
+
+
+def track_column_widths(wb):
+    """Attach a width tracker to every sheet of a freshly loaded template workbook."""
+    for ws in wb.worksheets:
+        get_width_tracker(ws)
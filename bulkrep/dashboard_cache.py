@@ -0,0 +1,205 @@
+# Per-metric dashboard cache
+# The dashboard payload used to be cached as a whole under a hash of every
+# request parameter, so changing one chart filter recomputed every metric.
+# Each metric is now cached on its own, keyed only by the parameters its value
+# depends on (e.g. churn_data ignores usage_trends_days, the filter dropdown
+# lists ignore everything) and kept for its own TTL: values that rarely change
+# live for hours, range metrics for a few minutes. A request only computes the
+# metrics missing from the cache.
+# Entries go to the 'dashboard' cache alias (the two-tier TieredCache in
+# settings) when it is configured, and to the default cache otherwise. Large
+# entries that every process would otherwise copy into memory go to its shared
+# tier only (dashboard_shared_cache).
+# Stale-while-revalidate: an entry stays in the cache for DASHBOARD_MAX_STALENESS
+# seconds past its TTL. In that window it is still served (with its age) while
+# one background refresh per entry recomputes it; after it, the entry is gone
+# and the request computes the metric itself.
+# Entries also record the data version (data_version) they were computed under;
+# once the data changes, an entry from an older version is served as stale, so
+# a response tagged with the current version never carries values computed
+# before the change.
+
+import hashlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# CACHES alias used for dashboard data when settings define it
+DASHBOARD_CACHE_ALIAS = 'dashboard'
+
+# Seconds a metric stays cached unless listed below
+DEFAULT_METRIC_TTL = 300
+
+# Seconds past its TTL an entry may still be served while it is refreshed
+# (DASHBOARD_MAX_STALENESS in settings)
+DEFAULT_MAX_STALENESS = 60 * 60
+
+# Seconds a background refresh holds its claim on an entry
+REFRESH_CLAIM_TIMEOUT = 120
+
+# Per-metric TTLs; DASHBOARD_METRIC_CACHE_TTLS in settings overrides entries
+METRIC_TTLS = {
+    'unique_products': 6 * 60 * 60,
+    'unique_subscribers': 6 * 60 * 60,
+    # Keyed by yesterday's date, so a new day gets a new entry
+    'daily_comparison': 6 * 60 * 60,
+    'usage_trends': 60 * 60,
+    'new_subscribers': 60 * 60,
+    'three_month_usage': 60 * 60,
+}
+
+
+def dashboard_cache():
+    """Cache holding dashboard data: the 'dashboard' alias if configured, else the default cache."""
+    return caches[DASHBOARD_CACHE_ALIAS if DASHBOARD_CACHE_ALIAS in settings.CACHES else 'default']
+
+
+def dashboard_shared_cache():
+    """
+    Cache for large dashboard entries: the shared tier of the dashboard cache,
+    or the dashboard cache itself when it has no separate shared tier.
+    """
+    cache = dashboard_cache()
+    shared = getattr(cache, 'shared_tier', None)
+    return cache if shared is None else shared
+
+
+def metric_ttl(name):
+    """Seconds the named metric is cached for."""
+    ttls = {**METRIC_TTLS, **getattr(settings, 'DASHBOARD_METRIC_CACHE_TTLS', {})}
+    return ttls.get(name, DEFAULT_METRIC_TTL)
+
+
+def metric_cache_key(name, params):
+    """
+    Cache key for a metric value.
+
+    Args:
+        name: Payload key of the metric
+        params: {parameter: value} for the request parameters the metric depends on
+
+    Returns:
+        Key string unique to the metric and those parameter values
+    """
+    key_string = '|'.join(f"{k}:{v}" for k, v in sorted(params.items()))
+    return f"dashboard_metric_{name}_{hashlib.md5(key_string.encode()).hexdigest()}"
+
+
+def max_staleness():
+    """Seconds past its TTL a metric may be served while a refresh runs."""
+    return max(0, getattr(settings, 'DASHBOARD_MAX_STALENESS', DEFAULT_MAX_STALENESS))
+
+
+def lookup_metrics(metric_params, version=None):
+    """
+    Look up every metric in one cache round trip, including stale entries.
+
+    Args:
+        metric_params: {metric name: params} as passed to metric_cache_key()
+        version: Current data version; entries computed under another one are stale
+
+    Returns:
+        Tuple of ({metric name: value} for the metrics found in the cache,
+        {metric name: age in seconds} for those past their TTL)
+    """
+    keys = {metric_cache_key(name, params): name for name, params in metric_params.items()}
+    try:
+        found = dashboard_cache().get_many(list(keys))
+    except Exception as e:
+        logger.error(f"Error reading dashboard metric cache: {str(e)}")
+        return {}, {}
+
+    now = time.time()
+    values = {}
+    stale = {}
+    for key, entry in found.items():
+        name = keys[key]
+        value, computed_at = entry[:2]
+        values[name] = value
+        age = now - computed_at
+        outdated = version is not None and entry[2:] != (version,)
+        if age > metric_ttl(name) or outdated:
+            stale[name] = int(age)
+    return values, stale
+
+
+def get_cached_metrics(metric_params, version=None):
+    """Like lookup_metrics(), but only {metric name: value} for entries within their TTL."""
+    values, stale = lookup_metrics(metric_params, version)
+    return {name: value for name, value in values.items() if name not in stale}
+
+
+def cache_metrics(values, metric_params, version=None):
+    """
+    Store computed metric values, each under its own key and TTL.
+
+    Entries are kept max_staleness() seconds beyond their TTL so they can be
+    served while they are refreshed.
+
+    Args:
+        values: {metric name: value} to store
+        metric_params: {metric name: params} for (at least) those metrics
+        version: Data version read before the values were computed
+    """
+    computed_at = time.time()
+    by_ttl = {}
+    for name, value in values.items():
+        by_ttl.setdefault(metric_ttl(name), {})[metric_cache_key(name, metric_params[name])] = (
+            value, computed_at, version
+        )
+    try:
+        cache = dashboard_cache()
+        for ttl, entries in by_ttl.items():
+            cache.set_many(entries, ttl + max_staleness())
+    except Exception as e:
+        logger.error(f"Error writing dashboard metric cache: {str(e)}")
+
+
+def refresh_metrics_in_background(names, metric_params, compute, version=None):
+    """
+    Recompute stale metrics in a background thread and store the results.
+
+    Each entry is claimed in the cache first, so only one refresh per entry
+    runs at a time across threads and (with a shared cache tier) processes.
+
+    Args:
+        names: Stale metric names to refresh
+        metric_params: {metric name: params} for those metrics
+        compute: Function taking a list of names and returning ({name: value}, [timed out names])
+        version: Data version the refreshed values are stored under
+
+    Returns:
+        List of the names this call is refreshing
+    """
+    cache = dashboard_cache()
+    claims = {}
+    for name in names:
+        claim_key = f"{metric_cache_key(name, metric_params[name])}_refreshing"
+        try:
+            if cache.add(claim_key, True, REFRESH_CLAIM_TIMEOUT):
+                claims[name] = claim_key
+        except Exception as e:
+            logger.error(f"Error claiming dashboard metric refresh: {str(e)}")
+    if not claims:
+        return []
+
+    def refresh():
+        try:
+            values, timed_out = compute(list(claims))
+            cache_metrics(values, metric_params, version)
+            if timed_out:
+                logger.warning(f"Background dashboard refresh timed out for: {', '.join(timed_out)}")
+        except Exception as e:
+            logger.error(f"Error refreshing dashboard metrics in background: {str(e)}")
+        finally:
+            dashboard_cache().delete_many(list(claims.values()))
+            connections.close_all()
+
+    threading.Thread(target=refresh, name='dashboard-refresh', daemon=True).start()
+    return list(claims)
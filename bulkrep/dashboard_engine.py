@@ -0,0 +1,357 @@
+# Single-scan dashboard metrics
+# Each dashboard helper used to run its own queries (totals, top lists,
+# churn, retention, trends, revenue, daily comparison), dozens per uncached
+# load and most of them over the same days. DashboardSlice reads the
+# UsageDailyRollup rows for the range, its comparison periods and the daily
+# comparison days in one pass (closed months from the permanent month cache,
+# the open period in one query), keeps them as numpy columns (day ordinal,
+# subscriber code, product code, count) and derives every usage metric from
+# them in memory. Results keep the JSON shape of the helpers they replace.
+
+import calendar
+import logging
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.utils import timezone
+
+from .models import ENQUIRY_RATES
+from .period_cache import usage_rows
+from .product_classifier import match_rate_key
+
+logger = logging.getLogger(__name__)
+
+# Rows shown in the dashboard's top subscriber and top product lists
+TOP_LIST_SIZE = 10
+
+
+def previous_period(start_date, end_date):
+    """Return (start, end) of the equally long period before start_date."""
+    return start_date - timedelta(days=(end_date - start_date).days), start_date
+
+
+def churn_periods(start_date, end_date, churn_days=None):
+    """
+    Return (analysis_start, previous_start, previous_end) for churn analysis.
+
+    With churn_days the last churn_days days are compared against the
+    churn_days before them; otherwise the range is compared against
+    previous_period().
+    """
+    if churn_days and churn_days.isdigit():
+        days = int(churn_days)
+        analysis_start = end_date - timedelta(days=days)
+        return analysis_start, analysis_start - timedelta(days=days), analysis_start
+    previous_start, previous_end = previous_period(start_date, end_date)
+    return start_date, previous_start, previous_end
+
+
+def trends_start(start_date, end_date, trend_days=None):
+    """First day of a trend chart: end_date - trend_days when given, else start_date."""
+    if trend_days and trend_days.isdigit():
+        return end_date - timedelta(days=int(trend_days))
+    return start_date
+
+
+def daily_comparison_dates():
+    """
+    Return (yesterday, same day of the previous month). Days missing from the
+    previous month (e.g. the 31st) fall back to its last day.
+    """
+    yesterday = (timezone.now() - timedelta(days=1)).date()
+
+    if yesterday.month == 1:
+        prev_month_year = yesterday.year - 1
+        prev_month = 12
+    else:
+        prev_month_year = yesterday.year
+        prev_month = yesterday.month - 1
+
+    last_day_of_prev_month = calendar.monthrange(prev_month_year, prev_month)[1]
+    return yesterday, date(prev_month_year, prev_month, min(yesterday.day, last_day_of_prev_month))
+
+
+def price_usage_counts(usage_counts, subscriber_rates):
+    """
+    Price usage with subscriber-specific rates, falling back to ENQUIRY_RATES.
+
+    Args:
+        usage_counts: Iterable of (subscriber name, product name, usage count)
+        subscriber_rates: {subscriber: {lower-cased product name: rate}}
+
+    Returns:
+        List of {'product', 'revenue', 'count'} per ENQUIRY_RATES key, highest revenue first
+    """
+    revenue_by_product = defaultdict(lambda: {'revenue': Decimal('0.00'), 'count': 0})
+
+    for subscriber, product_name, count in usage_counts:
+        # Match the database product name to a key in ENQUIRY_RATES (memoized per name)
+        matched_key = match_rate_key(product_name)
+        if not matched_key:
+            continue
+
+        rate = subscriber_rates.get(subscriber, {}).get(
+            product_name.lower(),
+            Decimal(str(ENQUIRY_RATES[matched_key]))
+        )
+        product_title = matched_key.replace('_', ' ').title()
+        revenue_by_product[product_title]['revenue'] += Decimal(str(rate)) * Decimal(str(count))
+        revenue_by_product[product_title]['count'] += count
+
+    revenue_data = [
+        {'product': product, 'revenue': float(data['revenue']), 'count': data['count']}
+        for product, data in revenue_by_product.items()
+    ]
+    return sorted(revenue_data, key=lambda x: x['revenue'], reverse=True)
+
+
+def _ranked(labels, totals, present, limit=None):
+    """(label, total) for every present code, largest total first, ties by label."""
+    ranked = sorted(
+        ((labels[code], int(totals[code])) for code in np.flatnonzero(present)),
+        key=lambda item: (-item[1], item[0] is None, item[0] or '')
+    )
+    return ranked[:limit] if limit else ranked
+
+
+class DashboardSlice:
+    """
+    Daily rollup rows held as columns, with the dashboard metrics computed from them.
+
+    Subscriber and product names may be None; they are counted like any other
+    name, matching the GROUP BY queries the metrics replace.
+    """
+
+    def __init__(self, rows):
+        rows = list(rows)
+        subscriber_codes = {}
+        product_codes = {}
+        self.dates = np.fromiter((row[0].toordinal() for row in rows), dtype=np.int64, count=len(rows))
+        self.subscribers = np.fromiter(
+            (subscriber_codes.setdefault(row[1], len(subscriber_codes)) for row in rows),
+            dtype=np.int64, count=len(rows)
+        )
+        self.products = np.fromiter(
+            (product_codes.setdefault(row[2], len(product_codes)) for row in rows),
+            dtype=np.int64, count=len(rows)
+        )
+        self.counts = np.fromiter((row[3] for row in rows), dtype=np.int64, count=len(rows))
+        self.subscriber_codes = subscriber_codes
+        self.subscriber_labels = list(subscriber_codes)
+        self.product_labels = list(product_codes)
+
+    @classmethod
+    def load(cls, start_date, end_date, dates=()):
+        """
+        Read the rollup rows from start_date to end_date plus any extra days.
+
+        Closed months come from the permanent month cache (period_cache); the
+        open period is read in one query.
+
+        Args:
+            start_date: First day of the scanned range (inclusive)
+            end_date: Last day of the scanned range (inclusive)
+            dates: Individual days outside the range to include as well
+
+        Returns:
+            DashboardSlice over those rows
+        """
+        usage = cls(usage_rows(start_date, end_date, dates))
+        logger.info(f"Dashboard slice {start_date} to {end_date} (+{len(dates)} days): {len(usage.counts)} rollup rows")
+        return usage
+
+    @classmethod
+    def for_dashboard(cls, start_date, end_date, usage_trends_days=None, churn_days=None):
+        """
+        Load every day the dashboard metrics for a range read: the range, the
+        retention and churn comparison periods, the trend window and the daily
+        comparison days.
+        """
+        analysis_start, churn_previous_start, _ = churn_periods(start_date, end_date, churn_days)
+        scan_start = min(
+            start_date,
+            previous_period(start_date, end_date)[0],
+            churn_previous_start,
+            analysis_start - timedelta(days=1),
+            trends_start(start_date, end_date, usage_trends_days),
+        )
+        return cls.load(scan_start, end_date, daily_comparison_dates())
+
+    def _select(self, start_date, end_date, subscriber=None):
+        """Boolean row mask for a date range and, optionally, one subscriber."""
+        selected = (self.dates >= start_date.toordinal()) & (self.dates <= end_date.toordinal())
+        if subscriber is not None:
+            code = self.subscriber_codes.get(subscriber)
+            if code is None:
+                return np.zeros_like(selected)
+            selected &= self.subscribers == code
+        return selected
+
+    def _subscriber_set(self, start_date, end_date):
+        """Names of the subscribers with usage in the range."""
+        return {self.subscriber_labels[code] for code in np.unique(self.subscribers[self._select(start_date, end_date)])}
+
+    def _totals(self, codes, selected, size):
+        """Per-code usage totals and presence over the selected rows."""
+        totals = np.bincount(codes[selected], weights=self.counts[selected], minlength=size).astype(np.int64)
+        present = np.bincount(codes[selected], minlength=size) > 0
+        return totals, present
+
+    def total_usage(self, start_date, end_date, subscriber=None):
+        """Total usage entries for the range (for one subscriber when given)."""
+        return int(self.counts[self._select(start_date, end_date, subscriber)].sum())
+
+    def total_subscribers(self, start_date, end_date):
+        """Number of distinct subscribers with usage in the range."""
+        return len(np.unique(self.subscribers[self._select(start_date, end_date)]))
+
+    def top_subscribers(self, start_date, end_date, subscriber=None, limit=None):
+        """Subscribers by usage as [{'SubscriberName', 'usage_count'}], largest first."""
+        totals, present = self._totals(
+            self.subscribers, self._select(start_date, end_date, subscriber), len(self.subscriber_labels)
+        )
+        return [
+            {'SubscriberName': name, 'usage_count': count}
+            for name, count in _ranked(self.subscriber_labels, totals, present, limit)
+        ]
+
+    def top_subscriber(self, start_date, end_date):
+        """Name of the subscriber with the most usage, or 'N/A'."""
+        top = self.top_subscribers(start_date, end_date, limit=1)
+        return top[0]['SubscriberName'] if top else 'N/A'
+
+    def top_products(self, start_date, end_date, product_filter=None, limit=TOP_LIST_SIZE):
+        """
+        Products by usage as [{'ProductName', 'frequency'}], largest first.
+        product_filter keeps names containing it (case-insensitive).
+        """
+        selected = self._select(start_date, end_date)
+        if product_filter and product_filter != 'all':
+            needle = product_filter.lower()
+            matching = np.array(
+                [name is not None and needle in name.lower() for name in self.product_labels], dtype=bool
+            )
+            selected &= matching[self.products]
+        totals, present = self._totals(self.products, selected, len(self.product_labels))
+        return [
+            {'ProductName': name, 'frequency': count}
+            for name, count in _ranked(self.product_labels, totals, present, limit)
+        ]
+
+    def subscriber_top_products(self, start_date, end_date, subscriber):
+        """Products used by one subscriber as [{'product', 'count'}], largest first."""
+        if not subscriber:
+            return []
+        totals, present = self._totals(
+            self.products, self._select(start_date, end_date, subscriber), len(self.product_labels)
+        )
+        # Rows without a product name count as zero, as Count('ProductName') does
+        if None in self.product_labels:
+            totals[self.product_labels.index(None)] = 0
+        return [
+            {'product': name, 'count': count}
+            for name, count in _ranked(self.product_labels, totals, present, TOP_LIST_SIZE)
+        ]
+
+    def highest_product_by_transaction(self, start_date, end_date):
+        """Name of the product with the most usage entries, or 'N/A'."""
+        top = self.top_products(start_date, end_date, limit=1)
+        return top[0]['ProductName'] if top else 'N/A'
+
+    def usage_trends(self, start_date, end_date, usage_trends_days=None, subscriber=None):
+        """Daily usage as [{'date', 'count'}] for days with usage, oldest first."""
+        selected = self._select(trends_start(start_date, end_date, usage_trends_days), end_date, subscriber)
+        days, positions = np.unique(self.dates[selected], return_inverse=True)
+        counts = np.bincount(positions, weights=self.counts[selected], minlength=len(days)).astype(np.int64)
+        return [
+            {'date': date.fromordinal(int(day)), 'count': int(count)}
+            for day, count in zip(days, counts)
+        ]
+
+    def retention(self, start_date, end_date):
+        """Share of the previous period's subscribers still active in the range."""
+        previous_subscribers = self._subscriber_set(*previous_period(start_date, end_date))
+        retained_count = len(previous_subscribers & self._subscriber_set(start_date, end_date))
+        retention_rate = retained_count / len(previous_subscribers) * 100 if previous_subscribers else 0
+        return {
+            'retention_rate': round(retention_rate, 2),
+            'retained_count': retained_count,
+            'previous_count': len(previous_subscribers)
+        }
+
+    def churn(self, start_date, end_date, churn_days=None):
+        """Churn counts for the range plus a daily churn-rate trend."""
+        analysis_start, previous_start, previous_end = churn_periods(start_date, end_date, churn_days)
+        previous_subscribers = self._subscriber_set(previous_start, previous_end)
+        current_subscribers = self._subscriber_set(analysis_start, end_date)
+        churned_count = len({name for name in previous_subscribers - current_subscribers if name is not None})
+        churn_rate = churned_count / len(previous_subscribers) * 100 if previous_subscribers else 0
+
+        # Distinct named subscribers per day, from the day before the analysis period
+        trend_period_start = analysis_start - timedelta(days=1)
+        selected = self._select(trend_period_start, end_date)
+        if None in self.subscriber_codes:
+            selected &= self.subscribers != self.subscriber_codes[None]
+        day_subscribers = np.unique(
+            (self.dates[selected] - trend_period_start.toordinal()) * max(1, len(self.subscriber_labels))
+            + self.subscribers[selected]
+        )
+        daily_counts = np.bincount(
+            day_subscribers // max(1, len(self.subscriber_labels)),
+            minlength=max(0, (end_date - trend_period_start).days + 1)
+        )
+
+        trend_data = []
+        for offset in range(1, (end_date - trend_period_start).days + 1):
+            prev_day_subscribers = int(daily_counts[offset - 1])
+            curr_day_subscribers = int(daily_counts[offset])
+            if prev_day_subscribers > 0:
+                daily_churned = max(0, prev_day_subscribers - curr_day_subscribers)
+                daily_churn_rate = (daily_churned / prev_day_subscribers) * 100
+            else:
+                daily_churn_rate = 0
+            trend_data.append({
+                'date': (trend_period_start + timedelta(days=offset)).strftime('%Y-%m-%d'),
+                'churn_rate': round(daily_churn_rate, 2)
+            })
+
+        return {
+            'churned_count': churned_count,
+            'churn_rate': round(churn_rate, 2),
+            'previous_subscribers': len(previous_subscribers),
+            'current_subscribers': len(current_subscribers),
+            'trend_data': trend_data
+        }
+
+    def usage_counts(self, start_date, end_date, subscriber=None):
+        """Usage per (subscriber, product) pair in the range as [(subscriber, product, count)]."""
+        selected = self._select(start_date, end_date, subscriber)
+        width = max(1, len(self.product_labels))
+        pairs, positions = np.unique(
+            self.subscribers[selected] * width + self.products[selected], return_inverse=True
+        )
+        counts = np.bincount(positions, weights=self.counts[selected], minlength=len(pairs)).astype(np.int64)
+        return [
+            (self.subscriber_labels[pair // width], self.product_labels[pair % width], count)
+            for pair, count in zip(pairs.tolist(), counts.tolist())
+        ]
+
+    def revenue(self, start_date, end_date, subscriber_rates):
+        """Revenue per ENQUIRY_RATES product for the range (see price_usage_counts)."""
+        return price_usage_counts(self.usage_counts(start_date, end_date), subscriber_rates)
+
+    def daily_comparison(self, subscriber=None):
+        """Usage yesterday against the same day last month (for one subscriber when given)."""
+        yesterday, prev_month_day = daily_comparison_dates()
+        return {
+            'yesterday': {
+                'date': yesterday.strftime('%Y-%m-%d'),
+                'count': self.total_usage(yesterday, yesterday, subscriber),
+            },
+            'previous_month_same_day': {
+                'date': prev_month_day.strftime('%Y-%m-%d'),
+                'count': self.total_usage(prev_month_day, prev_month_day, subscriber),
+            }
+        }
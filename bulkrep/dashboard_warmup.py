@@ -0,0 +1,142 @@
+# Dashboard cache warm-up
+# The first dashboard loads of the day find every metric entry expired. The
+# views people open are predictable (this month, last month, the three-month
+# view, all time, and the key subscribers' dashboards), so warm_dashboard_cache
+# computes their metrics ahead of time and stores them under exactly the keys
+# dashboard_api reads (dashboard_metric_params). Run it from the
+# warm_dashboard_cache management command or the Celery task of the same name.
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from .dashboard_cache import cache_metrics, lookup_metrics
+from .data_version import data_version
+from .views import compute_dashboard_metrics, dashboard_metric_params, get_alltime_date_range
+
+logger = logging.getLogger(__name__)
+
+# Dashboards warmed at the same time
+DEFAULT_WARM_WORKERS = 2
+
+# Seconds each metric source may take while warming; far above the request
+# budget, since nobody is waiting and a timed-out metric is not cached
+DEFAULT_WARM_TIMEOUT = 600
+
+
+def key_subscribers():
+    """Subscribers whose dashboards are warmed (DASHBOARD_KEY_SUBSCRIBERS in settings)."""
+    return list(getattr(settings, 'DASHBOARD_KEY_SUBSCRIBERS', []))
+
+
+def _month_start(day, months_back=0):
+    month_index = day.year * 12 + day.month - 1 - months_back
+    return day.replace(year=month_index // 12, month=month_index % 12 + 1, day=1)
+
+
+def common_dashboard_views(subscribers=None):
+    """
+    The dashboard requests worth warming, as dashboard_api would receive them.
+
+    Month ranges run from the 1st to the 1st of the next month, like the
+    dashboard's default date inputs.
+
+    Args:
+        subscribers: Subscriber dashboards to include; defaults to key_subscribers()
+
+    Returns:
+        List of (label, keyword arguments for dashboard_metric_params)
+    """
+    today = timezone.now().date()
+    current_month = (_month_start(today), _month_start(today, -1))
+    previous_month = (_month_start(today, 1), _month_start(today))
+
+    views = [
+        ('current month', {'start_date': current_month[0], 'end_date': current_month[1]}),
+        ('previous month', {'start_date': previous_month[0], 'end_date': previous_month[1]}),
+        ('three-month view', {'start_date': _month_start(today, 2), 'end_date': current_month[1], 'three_month_view': True}),
+    ]
+    # The All Time preset sends time_range=alltime, which dashboard_api resolves the same way
+    alltime_start, alltime_end = get_alltime_date_range()
+    views.append(('all time', {'start_date': alltime_start, 'end_date': alltime_end}))
+
+    for subscriber in key_subscribers() if subscribers is None else subscribers:
+        views.append((
+            f"current month: {subscriber}",
+            {'start_date': current_month[0], 'end_date': current_month[1], 'subscriber_filter': subscriber},
+        ))
+    return views
+
+
+def warm_dashboard_view(view, force=False, timeout=None, version=None):
+    """
+    Compute and cache the metrics of one dashboard request.
+
+    Args:
+        view: Keyword arguments for dashboard_metric_params
+        force: Recompute every metric, not just the missing and stale ones
+        timeout: Seconds each metric source may take (default DEFAULT_WARM_TIMEOUT)
+        version: Data version to store the metrics under; defaults to the current one
+
+    Returns:
+        Dictionary with the number of metrics computed, those that timed out,
+        and the seconds taken
+    """
+    started = time.monotonic()
+    if version is None:
+        version = data_version(cached=False)
+    view = dict(view)
+    three_month_view = view.pop('three_month_view', False)
+    metric_params = dashboard_metric_params(three_month_view=three_month_view, **view)
+
+    if force:
+        names = list(metric_params)
+    else:
+        cached_data, stale = lookup_metrics(metric_params, version)
+        names = [name for name in metric_params if name not in cached_data or name in stale]
+
+    values, timed_out = {}, []
+    if names:
+        values, timed_out = compute_dashboard_metrics(names, timeout=timeout or DEFAULT_WARM_TIMEOUT, **view)
+        cache_metrics(values, metric_params, version)
+    return {'computed': len(values), 'timed_out': timed_out, 'seconds': time.monotonic() - started}
+
+
+def _warm_in_thread(label, view, force, timeout, version):
+    try:
+        result = warm_dashboard_view(view, force, timeout, version)
+        logger.info(f"Warmed dashboard cache for {label}: {result['computed']} metrics in {result['seconds']:.2f}s")
+        return {'label': label, **result}
+    except Exception as e:
+        logger.error(f"Error warming dashboard cache for {label}: {str(e)}")
+        return {'label': label, 'computed': 0, 'timed_out': [], 'seconds': None, 'error': str(e)}
+    finally:
+        connections.close_all()
+
+
+def warm_dashboard_cache(subscribers=None, workers=None, force=False, timeout=None):
+    """
+    Warm the dashboard cache for every common dashboard view.
+
+    Args:
+        subscribers: Subscriber dashboards to warm; defaults to key_subscribers()
+        workers: Dashboards warmed at the same time (default DEFAULT_WARM_WORKERS)
+        force: Recompute metrics that are still fresh
+        timeout: Seconds each metric source may take (default DEFAULT_WARM_TIMEOUT)
+
+    Returns:
+        List of {'label', 'computed', 'timed_out', 'seconds'} per view, in view
+        order; a view that failed has 'seconds' None and an 'error'
+    """
+    views = common_dashboard_views(subscribers)
+    # Read afresh: a warm-up often follows an aggregate refresh
+    version = data_version(cached=False)
+    with ThreadPoolExecutor(max_workers=max(1, workers or DEFAULT_WARM_WORKERS),
+                            thread_name_prefix='dashboard-warmup') as executor:
+        return list(executor.map(
+            lambda item: _warm_in_thread(item[0], item[1], force, timeout, version), views
+        ))
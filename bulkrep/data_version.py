@@ -0,0 +1,131 @@
+# Data-version token for conditional GETs on the dashboard JSON endpoints
+# dashboard_api and new_subscribers_trend_api used to compute and serialize the
+# full payload on every call, even when nothing behind it had changed. Their
+# metrics read the usage aggregates (the daily rollup, subscriber first-seen),
+# which only change when an aggregate is refreshed or rebuilt, and price usage
+# with SubscriberProductRate, so data_version() hashes the aggregate watermarks,
+# the last rollup rebuild and a rate checksum; raw usagereport loads only show
+# up once the aggregates absorb them. The token is memoized in the dashboard
+# cache for DASHBOARD_DATA_VERSION_TTL seconds, so most requests read it from
+# process memory instead of querying SQL Server.
+# The endpoints send it as an ETag and answer a matching If-None-Match with
+# 304 Not Modified before computing anything. Responses with stale or
+# timed-out metrics carry no ETag, so a client never revalidates a payload
+# that doesn't reflect the current version.
+
+import hashlib
+import logging
+
+from django.conf import settings
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, quote_etag
+
+from .dashboard_cache import dashboard_cache
+from .models import AggregateWatermark, SubscriberProductRate
+from .period_cache import rollup_rebuilt_at
+
+logger = logging.getLogger(__name__)
+
+# Cache key holding the memoized data version
+DATA_VERSION_KEY = 'dashboard_data_version'
+
+# Seconds the data version is reused before it is read again
+# (DASHBOARD_DATA_VERSION_TTL in settings)
+DEFAULT_DATA_VERSION_TTL = 10
+
+
+def rate_checksum():
+    """Row count, rate total and id-weighted rate total of SubscriberProductRate."""
+    return SubscriberProductRate.objects.aggregate(
+        rows=Count('id'),
+        total=Sum('rate'),
+        weighted=Sum(ExpressionWrapper(F('rate') * F('id'), output_field=DecimalField(max_digits=30, decimal_places=2))),
+    )
+
+
+def data_version_ttl():
+    """Seconds a memoized data version is reused."""
+    return max(0, getattr(settings, 'DASHBOARD_DATA_VERSION_TTL', DEFAULT_DATA_VERSION_TTL))
+
+
+def read_data_version():
+    """
+    Compute the data version from the database.
+
+    Built from today's date (default ranges and the daily comparison move with
+    it), every aggregate's watermark and refresh time, the last rollup rebuild,
+    and a checksum of SubscriberProductRate.
+
+    Returns:
+        Hex digest string, or None when it can't be read (no conditional responses then)
+    """
+    try:
+        parts = [
+            timezone.now().date(),
+            list(AggregateWatermark.objects.order_by('name').values_list(
+                'name', 'high_water_date', 'last_refreshed_at'
+            )),
+            rollup_rebuilt_at(),
+            sorted(rate_checksum().items()),
+        ]
+    except Exception as e:
+        logger.error(f"Error reading dashboard data version: {str(e)}")
+        return None
+    return hashlib.md5('|'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def data_version(cached=True):
+    """
+    Token that changes whenever the data behind the dashboard endpoints can change.
+
+    Args:
+        cached: Reuse the version memoized in the dashboard cache (up to
+            data_version_ttl() seconds old); False reads it from the database
+            and memoizes the result
+
+    Returns:
+        Hex digest string, or None when it can't be read
+    """
+    cache = dashboard_cache()
+    if cached:
+        try:
+            version = cache.get(DATA_VERSION_KEY)
+        except Exception as e:
+            logger.error(f"Error reading memoized dashboard data version: {str(e)}")
+            version = None
+        if version is not None:
+            return version
+
+    version = read_data_version()
+    if version is not None and data_version_ttl():
+        try:
+            cache.set(DATA_VERSION_KEY, version, data_version_ttl())
+        except Exception as e:
+            logger.error(f"Error memoizing dashboard data version: {str(e)}")
+    return version
+
+
+def data_version_etag(version):
+    """ETag header value for a data version."""
+    return quote_etag(version)
+
+
+def not_modified_response(request, version):
+    """
+    304 response when the request's If-None-Match matches the data version.
+
+    Args:
+        request: GET request to a dashboard JSON endpoint
+        version: Current data_version()
+
+    Returns:
+        HttpResponseNotModified carrying the ETag, or None when the client's copy is outdated
+    """
+    if version is None:
+        return None
+    etag = data_version_etag(version)
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        response['ETag'] = etag
+    return response
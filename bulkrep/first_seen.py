@@ -0,0 +1,78 @@
+# Subscriber first-seen maintenance
+# A subscriber's first usage date only changes when the subscriber first
+# appears (or older rows are back-filled), so SubscriberFirstSeen is kept up to
+# date from the days being refreshed instead of taking Min(DetailsViewedDate)
+# over the whole usage history on every dashboard request. It is registered in
+# bulkrep.aggregates and refreshed with the other usage aggregates.
+
+import logging
+
+from django.db import transaction
+from django.db.models import Count, Min
+
+from .models import SubscriberFirstSeen, Usagereport
+
+logger = logging.getLogger(__name__)
+
+
+def refresh_subscriber_first_seen(start_date, end_date):
+    """
+    Update SubscriberFirstSeen from the usage rows between start_date and end_date.
+
+    Subscribers seen earlier than their recorded date are moved back, new ones
+    are added, and any subscriber recorded inside the range whose rows there
+    are gone gets its first usage looked up again (or is removed).
+
+    Returns:
+        Tuple of (usage rows scanned, first-seen rows written)
+    """
+    window = Usagereport.objects.filter(
+        DetailsViewedDate__range=[start_date, end_date]
+    ).exclude(SubscriberName__isnull=True).values('SubscriberName').annotate(
+        first_usage=Min('DetailsViewedDate'), usage_count=Count('SearchIdentity')
+    ).order_by()
+
+    scanned = 0
+    window_first = {}
+    for row in window:
+        scanned += row['usage_count']
+        window_first[row['SubscriberName']] = row['first_usage']
+
+    with transaction.atomic():
+        recorded = dict(SubscriberFirstSeen.objects.filter(
+            subscriber_name__in=list(window_first)
+        ).values_list('subscriber_name', 'first_seen'))
+
+        # Subscribers recorded in this range but no longer starting here
+        stale = [
+            name for name, first_seen in SubscriberFirstSeen.objects.filter(
+                first_seen__range=[start_date, end_date]
+            ).values_list('subscriber_name', 'first_seen')
+            if window_first.get(name) != first_seen
+        ]
+        if stale:
+            history_first = dict(Usagereport.objects.filter(
+                SubscriberName__in=stale
+            ).values('SubscriberName').annotate(first_usage=Min('DetailsViewedDate')).values_list(
+                'SubscriberName', 'first_usage'
+            ))
+            for name in stale:
+                recorded.pop(name, None)
+                if name in history_first:
+                    window_first[name] = history_first[name]
+            SubscriberFirstSeen.objects.filter(subscriber_name__in=stale).delete()
+
+        new_rows = []
+        written = 0
+        for name, first_usage in window_first.items():
+            current = recorded.get(name)
+            if current is None:
+                new_rows.append(SubscriberFirstSeen(subscriber_name=name, first_seen=first_usage))
+            elif first_usage < current:
+                SubscriberFirstSeen.objects.filter(subscriber_name=name).update(first_seen=first_usage)
+                written += 1
+        SubscriberFirstSeen.objects.bulk_create(new_rows, batch_size=1000)
+        written += len(new_rows)
+
+    logger.info(f"Refreshed subscriber first-seen {start_date} to {end_date}: {scanned} usage rows, {written} rows written")
+    return scanned, written
@@ -0,0 +1,48 @@
+# Django Management Command for the daily usage rollup
+# Usage: python manage.py refresh_usage_rollup [--start-date YYYY-MM-DD] [--end-date YYYY-MM-DD]
+
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bulkrep.rollups import refresh_usage_rollup
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the UsageDailyRollup table the dashboard metrics read from usagereport'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start-date',
+            type=str,
+            help='First day to rebuild (YYYY-MM-DD); defaults to the first usage date'
+        )
+
+        parser.add_argument(
+            '--end-date',
+            type=str,
+            help='Last day to rebuild (YYYY-MM-DD); defaults to the last usage date'
+        )
+
+    def handle(self, *args, **options):
+        """Main command handler."""
+        start_date = self.parse_date(options['start_date'])
+        end_date = self.parse_date(options['end_date'])
+
+        started = time.time()
+        scanned, written = refresh_usage_rollup(start_date, end_date)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Rollup refreshed: {scanned} usage rows scanned, {written} rollup rows written '
+                f'in {time.time() - started:.2f}s'
+            )
+        )
+
+    def parse_date(self, value):
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'Invalid date {value!r}; use YYYY-MM-DD')
@@ -0,0 +1,53 @@
+# Django Management Command to precompute the dashboard cache
+# Usage: python manage.py warm_dashboard_cache [--subscriber NAME ...] [--workers N] [--force]
+
+from django.core.management.base import BaseCommand
+
+from bulkrep.dashboard_warmup import warm_dashboard_cache
+
+
+class Command(BaseCommand):
+    help = 'Compute and cache the dashboard metrics of the commonly opened dashboard views'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--subscriber',
+            action='append',
+            dest='subscribers',
+            help='Subscriber dashboard to warm (repeatable); defaults to DASHBOARD_KEY_SUBSCRIBERS'
+        )
+
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Dashboards to warm at the same time (default 2)'
+        )
+
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Recompute metrics that are still fresh in the cache'
+        )
+
+    def handle(self, *args, **options):
+        """Main command handler."""
+        summary = warm_dashboard_cache(
+            subscribers=options['subscribers'],
+            workers=options['workers'],
+            force=options['force'],
+        )
+
+        total_seconds = 0
+        for result in summary:
+            if result.get('error'):
+                self.stdout.write(self.style.ERROR(f"{result['label']}: failed - {result['error']}"))
+                continue
+            total_seconds += result['seconds']
+            line = f"{result['label']}: {result['computed']} metrics computed in {result['seconds']:.2f}s"
+            if result['timed_out']:
+                line += f" (timed out: {', '.join(result['timed_out'])})"
+            self.stdout.write(line)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Dashboard cache warmed for {len(summary)} views ({total_seconds:.2f}s of work)')
+        )
@@ -0,0 +1,271 @@
+# Merged-range index for report worksheets
+# openpyxl keeps merged ranges in an unordered set and answers "is this cell
+# merged?" with a linear scan, and its own merge_cells/unmerge_cells also scan
+# every range. Report rows each add several merges, so those scans made report
+# generation quadratic in the number of rows. This module keeps a row-keyed
+# index attached to the worksheet and merges/unmerges through it.
+# Merges that nothing reads back before saving (data rows, cloned product
+# headers, the signature line) are recorded in a MergePlan instead and applied
+# in one sorted pass just before the workbook is saved.
+
+import logging
+from collections import defaultdict
+
+from openpyxl.worksheet.cell_range import CellRange
+from openpyxl.worksheet.merge import MergedCellRange
+
+logger = logging.getLogger(__name__)
+
+INDEX_ATTRIBUTE = '_bulkrep_merged_index'
+PLAN_ATTRIBUTE = '_bulkrep_merge_plan'
+
+
+class MergedRangeIndex:
+    """
+    Maps each worksheet row to the merged ranges that span it.
+
+    Report merges are almost always single-row, so a row holds only a handful
+    of ranges and "which range covers (row, col)" is effectively O(1).
+    """
+
+    def __init__(self, ws):
+        self.ws = ws
+        self._by_row = defaultdict(list)
+        self._count = 0
+        self.rebuild()
+
+    def rebuild(self):
+        """Re-read every merged range from the worksheet."""
+        self._by_row.clear()
+        self._count = 0
+        for merged_range in self.ws.merged_cells.ranges:
+            self.register(merged_range)
+
+    def register(self, merged_range):
+        """Add a merged range to the index."""
+        for row in range(merged_range.min_row, merged_range.max_row + 1):
+            self._by_row[row].append(merged_range)
+        self._count += 1
+
+    def unregister(self, merged_range):
+        """Remove a merged range from the index."""
+        for row in range(merged_range.min_row, merged_range.max_row + 1):
+            row_ranges = self._by_row.get(row)
+            if not row_ranges:
+                continue
+            row_ranges[:] = [r for r in row_ranges if r.bounds != merged_range.bounds]
+            if not row_ranges:
+                del self._by_row[row]
+        self._count -= 1
+
+    def in_sync(self):
+        """Cheap check that no range was merged or unmerged behind the index's back."""
+        return self._count == len(self.ws.merged_cells.ranges)
+
+    def ranges_in_row(self, row):
+        """Return a copy of the merged ranges spanning a row."""
+        return list(self._by_row.get(row, ()))
+
+    def find(self, row, col):
+        """Return the merged range covering (row, col), or None."""
+        for merged_range in self._by_row.get(row, ()):
+            if merged_range.min_col <= col <= merged_range.max_col:
+                return merged_range
+        return None
+
+    def __len__(self):
+        return self._count
+
+
+def get_merged_index(ws):
+    """Return the merged-range index attached to a worksheet, building it if needed."""
+    index = getattr(ws, INDEX_ATTRIBUTE, None)
+    if index is None or not index.in_sync():
+        if index is not None:
+            logger.debug(f"Merged range index for {ws.title} was out of sync; rebuilding")
+        index = MergedRangeIndex(ws)
+        setattr(ws, INDEX_ATTRIBUTE, index)
+    return index
+
+
+def is_anchor(merged_range, row, col):
+    """True if (row, col) is the top-left (writable) cell of a merged range."""
+    return merged_range.min_row == row and merged_range.min_col == col
+
+
+def merge_range(ws, start_row, start_column, end_row, end_column, format_cells=True):
+    """
+    Merge a block of cells and record it in the worksheet's index.
+    Equivalent to ws.merge_cells() without its scan over every existing range.
+    Pass format_cells=False when the covered cells are already MergedCells with
+    their final styles (see RowStamp).
+    """
+    index = get_merged_index(ws)
+
+    # openpyxl ignores a merge that lies inside an existing one; do the same
+    existing = index.find(start_row, start_column)
+    if existing is not None and existing.max_row >= end_row and existing.max_col >= end_column \
+            and existing.min_row <= start_row and existing.min_col <= start_column:
+        return existing
+
+    coord = CellRange(min_col=start_column, min_row=start_row, max_col=end_column, max_row=end_row).coord
+    merged_range = MergedCellRange(ws, coord)
+    ws.merged_cells.ranges.add(merged_range)
+    if format_cells:
+        ws._clean_merge_range(merged_range)
+    index.register(merged_range)
+    return merged_range
+
+
+def unmerge_range(ws, merged_range):
+    """
+    Unmerge a range previously returned by the index or merge_range().
+    Equivalent to ws.unmerge_cells() without its scan over every existing range.
+    """
+    index = get_merged_index(ws)
+    ws.merged_cells.ranges.discard(merged_range)
+
+    cells = merged_range.cells
+    next(cells)  # The top-left cell keeps its value and style
+    for row, col in cells:
+        ws._cells.pop((row, col), None)
+    index.unregister(merged_range)
+
+
+class MergePlan:
+    """
+    Merges recorded while a worksheet is rendered and applied together by materialize().
+
+    Recording a merge is an append. Overlaps (with each other and with ranges
+    already on the sheet) are checked once, in a single pass over the sorted plan.
+    """
+
+    def __init__(self, ws):
+        self.ws = ws
+        self._pending = []
+        self._by_row = defaultdict(list)
+
+    def add(self, start_row, start_column, end_row, end_column, format_cells=True):
+        """
+        Record a merge to apply later.
+
+        Args:
+            start_row, start_column, end_row, end_column: Bounds of the range (inclusive)
+            format_cells: False when the covered cells are already MergedCells with
+                their final styles; otherwise they are replaced and bordered like
+                ws.merge_cells() does
+        """
+        planned = (start_row, start_column, end_row, end_column, format_cells)
+        self._pending.append(planned)
+        for row in range(start_row, end_row + 1):
+            self._by_row[row].append(planned)
+
+    def find(self, row, col):
+        """Return (min_row, min_col, max_row, max_col) of the planned merge covering (row, col), or None."""
+        for start_row, start_column, end_row, end_column, _ in self._by_row.get(row, ()):
+            if start_column <= col <= end_column:
+                return start_row, start_column, end_row, end_column
+        return None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _accepted(self):
+        """
+        Return the planned merges that can be applied, in sheet order.
+
+        A merge inside an earlier (or existing) one is dropped silently, as
+        openpyxl does; a partial overlap would corrupt the file, so it is
+        logged and dropped.
+        """
+        index = get_merged_index(self.ws)
+        # Sorted by top-left corner, larger ranges first so containers win
+        plan = sorted(self._pending, key=lambda p: (p[0], p[1], -p[2], -p[3]))
+        accepted = []
+        active = []  # Accepted ranges that still reach the current row
+
+        for planned in plan:
+            start_row, start_column, end_row, end_column, _ = planned
+            active = [a for a in active if a[2] >= start_row]
+
+            others = [(a[0], a[1], a[2], a[3]) for a in active]
+            for row in range(start_row, end_row + 1):
+                others.extend((r.min_row, r.min_col, r.max_row, r.max_col) for r in index.ranges_in_row(row))
+
+            conflict = None
+            for other in others:
+                other_min_row, other_min_col, other_max_row, other_max_col = other
+                if other_max_col < start_column or other_min_col > end_column or \
+                        other_max_row < start_row or other_min_row > end_row:
+                    continue
+                conflict = other
+                break
+
+            if conflict is None:
+                accepted.append(planned)
+                active.append(planned)
+            elif not (conflict[0] <= start_row and conflict[1] <= start_column and
+                      conflict[2] >= end_row and conflict[3] >= end_column):
+                logger.warning(
+                    f"Skipping merge {CellRange(min_col=start_column, min_row=start_row, max_col=end_column, max_row=end_row).coord} "
+                    f"on {self.ws.title}: overlaps "
+                    f"{CellRange(min_col=conflict[1], min_row=conflict[0], max_col=conflict[3], max_row=conflict[2]).coord}"
+                )
+        return accepted
+
+    def materialize(self):
+        """Apply every accepted planned merge to the worksheet and clear the plan. Returns the number applied."""
+        index = get_merged_index(self.ws)
+        ranges = self.ws.merged_cells.ranges
+        accepted = self._accepted()
+
+        for start_row, start_column, end_row, end_column, format_cells in accepted:
+            coord = CellRange(min_col=start_column, min_row=start_row, max_col=end_column, max_row=end_row).coord
+            merged_range = MergedCellRange(self.ws, coord)
+            ranges.add(merged_range)
+            if format_cells:
+                self.ws._clean_merge_range(merged_range)
+            index.register(merged_range)
+
+        self._pending = []
+        self._by_row.clear()
+        return len(accepted)
+
+
+def get_merge_plan(ws):
+    """Return the merge plan attached to a worksheet, creating it if needed."""
+    plan = getattr(ws, PLAN_ATTRIBUTE, None)
+    if plan is None:
+        plan = MergePlan(ws)
+        setattr(ws, PLAN_ATTRIBUTE, plan)
+    return plan
+
+
+def plan_merge(ws, start_row, start_column, end_row, end_column, format_cells=True):
+    """Record a merge in the worksheet's plan; it is applied by apply_merge_plans()."""
+    get_merge_plan(ws).add(start_row, start_column, end_row, end_column, format_cells)
+
+
+def find_merge_span(ws, row, col):
+    """
+    Return (min_col, max_col) of the merged range covering (row, col), whether it
+    is already on the sheet or only planned, or None.
+    """
+    merged_range = get_merged_index(ws).find(row, col)
+    if merged_range is not None:
+        return merged_range.min_col, merged_range.max_col
+    plan = getattr(ws, PLAN_ATTRIBUTE, None)
+    if plan is not None:
+        planned = plan.find(row, col)
+        if planned is not None:
+            return planned[1], planned[3]
+    return None
+
+
+def apply_merge_plans(wb):
+    """Materialise the planned merges of every worksheet. Call right before saving."""
+    for ws in wb.worksheets:
+        plan = getattr(ws, PLAN_ATTRIBUTE, None)
+        if plan is not None and len(plan):
+            applied = plan.materialize()
+            logger.debug(f"Applied {applied} planned merges to {ws.title}")
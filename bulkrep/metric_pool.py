@@ -0,0 +1,140 @@
+# Thread pool fan-out for dashboard metrics
+# The dashboard's metric sources (the rollup slice, custom rates, new-subscriber
+# counts, filter lists, filtered revenue) are independent queries, so they run
+# side by side in a thread pool and the payload waits for the slowest one rather
+# than the sum of all of them. Each metric thread uses its own database
+# connection (Django connections are per thread) and closes it when the metric
+# finishes.
+# The pool is created once per process and shared by every request, so
+# DASHBOARD_METRIC_WORKERS bounds the metric threads, and with them the
+# database connections, a process opens however many dashboards load at once.
+# Every metric gets DASHBOARD_METRIC_TIMEOUT seconds from the moment it starts
+# running, so time spent queued behind other requests' metrics doesn't eat its
+# budget. A metric still queued a full budget after dispatch is cancelled, and
+# one still running when its budget is spent finishes in its pool thread with
+# its result dropped; either way, and when a metric raises, it is reported as
+# missing so the caller can return a partial payload.
+
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Metric threads per process, shared by all requests (DASHBOARD_METRIC_WORKERS in settings)
+DEFAULT_METRIC_WORKERS = 8
+
+# Seconds each metric may take (DASHBOARD_METRIC_TIMEOUT in settings)
+DEFAULT_METRIC_TIMEOUT = 20
+
+# The process-wide metric pool, created on first use
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def metric_worker_count():
+    """Number of metric threads per process, or 0 when the pool is disabled."""
+    return max(0, getattr(settings, 'DASHBOARD_METRIC_WORKERS', DEFAULT_METRIC_WORKERS))
+
+
+def metric_executor():
+    """The process-wide thread pool dashboard metrics run in."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, metric_worker_count()), thread_name_prefix='dashboard-metric'
+            )
+        return _executor
+
+
+def metric_timeout():
+    """Seconds a metric may run before it is reported as timed out."""
+    return getattr(settings, 'DASHBOARD_METRIC_TIMEOUT', DEFAULT_METRIC_TIMEOUT)
+
+
+def _run_metric(func, args):
+    try:
+        return func(*args)
+    finally:
+        # The thread's connection is not reused by Django; don't leave it open
+        connections.close_all()
+
+
+def run_metrics(metrics, timeout=None):
+    """
+    Evaluate metrics concurrently in the process-wide pool, each within the time budget.
+
+    A metric's budget starts when a pool thread picks it up; one that is
+    still queued a budget after dispatch is cancelled. With the pool disabled
+    the metrics run one after another in the calling thread and are never
+    timed out. A metric that raises is logged and reported as missing.
+
+    Args:
+        metrics: Dictionary of {name: (func, args)}
+        timeout: Seconds per metric; defaults to metric_timeout()
+
+    Returns:
+        Tuple of ({name: result} for finished metrics, [names that timed out or failed])
+    """
+    if not metrics:
+        return {}, []
+    if timeout is None:
+        timeout = metric_timeout()
+
+    results = {}
+    missing = []
+
+    def collect(name, get_result):
+        try:
+            results[name] = get_result()
+        except Exception as e:
+            logger.error(f"Dashboard metric {name} failed: {str(e)}")
+            missing.append(name)
+
+    if metric_worker_count() <= 0:
+        for name, (func, args) in metrics.items():
+            collect(name, lambda: func(*args))
+        return results, missing
+
+    dispatched = time.monotonic()
+    started_at = {}
+
+    def run(name, func, args):
+        started_at[name] = time.monotonic()
+        return _run_metric(func, args)
+
+    executor = metric_executor()
+    names = {
+        executor.submit(run, name, func, args): name
+        for name, (func, args) in metrics.items()
+    }
+    pending = set(names)
+    timed_out = []
+    while pending:
+        # Queued metrics are measured from dispatch, running ones from their start
+        deadline = min(started_at.get(names[future], dispatched) for future in pending) + timeout
+        done, pending = wait(pending, timeout=max(0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+        for future in done:
+            collect(names[future], future.result)
+
+        now = time.monotonic()
+        for future in list(pending):
+            name = names[future]
+            start = started_at.get(name)
+            if start is None and now - dispatched >= timeout and future.cancel():
+                pending.discard(future)
+                timed_out.append(name)
+            elif start is not None and now - start >= timeout:
+                # Finishes in its pool thread; the result is dropped
+                pending.discard(future)
+                timed_out.append(name)
+
+    if timed_out:
+        logger.warning(f"Dashboard metrics timed out after {timeout}s: {', '.join(timed_out)}")
+    logger.info(f"Evaluated {len(results)} dashboard metrics in {time.monotonic() - dispatched:.2f}s")
+    return results, missing + timed_out
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bulkrep', '0006_subscriberproductrate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportgeneration',
+            name='download_url',
+            field=models.CharField(blank=True, help_text='Download link of the generated file once the job succeeds', max_length=500, null=True),
+        ),
+        migrations.AddField(
+            model_name='reportgeneration',
+            name='status_message',
+            field=models.TextField(blank=True, help_text='Summary shown to the user when the job finishes', null=True),
+        ),
+        migrations.AddField(
+            model_name='reportgeneration',
+            name='task_id',
+            field=models.CharField(blank=True, db_index=True, help_text='Celery task id of the background job generating the report', max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name='reportgeneration',
+            name='status',
+            field=models.CharField(choices=[('success', 'Success'), ('failed', 'Failed'), ('in_progress', 'In Progress'), ('queued', 'Queued')], default='success', help_text='Status of the report generation', max_length=15),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bulkrep', '0007_reportgeneration_job_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsageDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True, help_text='DetailsViewedDate of the aggregated usage rows')),
+                ('subscriber_name', models.CharField(blank=True, help_text='SubscriberName of the aggregated usage rows', max_length=255, null=True)),
+                ('product_name', models.CharField(blank=True, help_text='ProductName of the aggregated usage rows', max_length=255, null=True)),
+                ('usage_count', models.PositiveIntegerField(default=0, help_text='Number of usage rows for the day, subscriber and product')),
+            ],
+            options={
+                'verbose_name': 'Usage Daily Rollup',
+                'verbose_name_plural': 'Usage Daily Rollups',
+                'indexes': [models.Index(fields=['subscriber_name', 'date'], name='bulkrep_usa_subscri_8d4743_idx'), models.Index(fields=['product_name', 'date'], name='bulkrep_usa_product_bdca22_idx')],
+                'unique_together': {('date', 'subscriber_name', 'product_name')},
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bulkrep', '0008_usagedailyrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AggregateWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Aggregate the watermark belongs to', max_length=100, unique=True)),
+                ('high_water_date', models.DateField(blank=True, help_text='Latest DetailsViewedDate included in the aggregate', null=True)),
+                ('last_refreshed_at', models.DateTimeField(blank=True, help_text='When the aggregate was last refreshed', null=True)),
+                ('rows_scanned', models.PositiveBigIntegerField(default=0, help_text='Usage rows scanned by the last refresh')),
+            ],
+            options={
+                'verbose_name': 'Aggregate Watermark',
+                'verbose_name_plural': 'Aggregate Watermarks',
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bulkrep', '0009_aggregatewatermark'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubscriberFirstSeen',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subscriber_name', models.CharField(help_text='SubscriberName as stored in usagereport', max_length=255, unique=True)),
+                ('first_seen', models.DateField(help_text="Date of the subscriber's first usage")),
+            ],
+            options={
+                'verbose_name': 'Subscriber First Seen',
+                'verbose_name_plural': 'Subscribers First Seen',
+                'indexes': [models.Index(fields=['first_seen', 'subscriber_name'], name='bulkrep_sub_first_s_e4c4f0_idx')],
+            },
+        ),
+    ]
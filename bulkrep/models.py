@@ -54,6 +54,7 @@ class ReportGeneration(models.Model):
         ('success', 'Success'),
         ('failed', 'Failed'),
         ('in_progress', 'In Progress'),
+        ('queued', 'Queued'),
     ]
     
     user = models.ForeignKey(
@@ -146,6 +147,27 @@ class ReportGeneration(models.Model):
         blank=True,
         help_text='Error message if the report generation failed'
     )
+    
+    task_id = models.CharField(
+        max_length=255,
+        null=True,
+        blank=True,
+        help_text='Celery task id of the background job generating the report',
+        db_index=True
+    )
+    
+    download_url = models.CharField(
+        max_length=500,
+        null=True,
+        blank=True,
+        help_text='Download link of the generated file once the job succeeds'
+    )
+    
+    status_message = models.TextField(
+        null=True,
+        blank=True,
+        help_text='Summary shown to the user when the job finishes'
+    )
 
     class Meta:
         ordering = ['-generated_at']
@@ -181,6 +203,113 @@ class ReportGeneration(models.Model):
             return (self.completed_at - self.generated_at).total_seconds()
         return None
 
+class UsageDailyRollup(models.Model):
+    """
+    Usage counts per day, subscriber and product, aggregated from usagereport.
+    Dashboard metrics read this table instead of scanning raw usage rows; it is
+    rebuilt from usagereport by bulkrep.rollups.refresh_usage_rollup.
+    """
+    date = models.DateField(
+        help_text='DetailsViewedDate of the aggregated usage rows',
+        db_index=True
+    )
+    
+    subscriber_name = models.CharField(
+        max_length=255,
+        null=True,
+        blank=True,
+        help_text='SubscriberName of the aggregated usage rows'
+    )
+    
+    product_name = models.CharField(
+        max_length=255,
+        null=True,
+        blank=True,
+        help_text='ProductName of the aggregated usage rows'
+    )
+    
+    usage_count = models.PositiveIntegerField(
+        default=0,
+        help_text='Number of usage rows for the day, subscriber and product'
+    )
+
+    class Meta:
+        verbose_name = 'Usage Daily Rollup'
+        verbose_name_plural = 'Usage Daily Rollups'
+        unique_together = (('date', 'subscriber_name', 'product_name'),)
+        indexes = [
+            models.Index(fields=['subscriber_name', 'date']),
+            models.Index(fields=['product_name', 'date']),
+        ]
+
+    def __str__(self):
+        return f"{self.date} - {self.subscriber_name} - {self.product_name} - {self.usage_count}"
+
+
+class SubscriberFirstSeen(models.Model):
+    """
+    First DetailsViewedDate of every subscriber in usagereport. New-subscriber
+    analytics read this table instead of computing Min(DetailsViewedDate) over
+    the whole usage history; bulkrep.first_seen keeps it up to date.
+    """
+    subscriber_name = models.CharField(
+        max_length=255,
+        unique=True,
+        help_text='SubscriberName as stored in usagereport'
+    )
+    
+    first_seen = models.DateField(
+        help_text='Date of the subscriber\'s first usage'
+    )
+
+    class Meta:
+        verbose_name = 'Subscriber First Seen'
+        verbose_name_plural = 'Subscribers First Seen'
+        indexes = [
+            models.Index(fields=['first_seen', 'subscriber_name']),
+        ]
+
+    def __str__(self):
+        return f"{self.subscriber_name} - {self.first_seen}"
+
+
+class AggregateWatermark(models.Model):
+    """
+    How far each usage-derived aggregate has been refreshed. usagereport is
+    loaded externally, so bulkrep.aggregates compares these marks with the
+    newest DetailsViewedDate to find the days that need recomputing.
+    """
+    name = models.CharField(
+        max_length=100,
+        unique=True,
+        help_text='Aggregate the watermark belongs to'
+    )
+    
+    high_water_date = models.DateField(
+        null=True,
+        blank=True,
+        help_text='Latest DetailsViewedDate included in the aggregate'
+    )
+    
+    last_refreshed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text='When the aggregate was last refreshed'
+    )
+    
+    rows_scanned = models.PositiveBigIntegerField(
+        default=0,
+        help_text='Usage rows scanned by the last refresh'
+    )
+
+    class Meta:
+        verbose_name = 'Aggregate Watermark'
+        verbose_name_plural = 'Aggregate Watermarks'
+
+    def __str__(self):
+        return f"{self.name} - {self.high_water_date}"
+
+
 # Add this after the imports at the top of the file
 ENQUIRY_RATES = {
     'consumer_snap_check': Decimal('500.00'),
@@ -0,0 +1,195 @@
+# Permanent cache of closed-month usage
+# Usage for a month that has fully elapsed no longer changes, yet every
+# dashboard range reaching back into it (all time, the three-month view, the
+# revenue helpers) used to read its rollup rows again whenever the metric
+# cache expired. A month is closed once the daily rollup has absorbed it past
+# the late-arrival window: refresh_aggregates only recomputes days from the
+# watermark minus USAGE_LATE_ARRIVAL_DAYS onwards. The rollup rows of a closed
+# month are cached without a timeout and dropped only when the rollup is
+# rebuilt over that month (a backfill); usage_rows() serves any range from the
+# cached months plus one query for the open period.
+# Only usage counts are cached; revenue is priced from them on every request,
+# so a rate change takes effect without invalidating anything.
+# Months are kept in the shared tier of the dashboard cache only: every worker
+# process copying the whole usage history into its local tier would cost far
+# more memory than the round trip saves, and a backfill's invalidation reaches
+# every process at once.
+
+import logging
+import time
+from datetime import date, timedelta
+
+from django.db.models import Q
+
+from .dashboard_cache import dashboard_shared_cache
+from .models import AggregateWatermark, UsageDailyRollup
+
+logger = logging.getLogger(__name__)
+
+# AggregateWatermark of the table the cached months are read from
+ROLLUP_AGGREGATE = 'usage_daily_rollup'
+
+# Cache key holding the time of the last rollup rebuild (read by data_version)
+ROLLUP_REBUILT_KEY = 'usage_rollup_rebuilt_at'
+
+
+def month_start(day):
+    """First day of the month containing day."""
+    return day.replace(day=1)
+
+
+def next_month_start(day):
+    """First day of the month after the one containing day."""
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def months_between(start_date, end_date):
+    """First days of every month overlapping start_date to end_date (inclusive)."""
+    months = []
+    month = month_start(start_date)
+    while month <= end_date:
+        months.append(month)
+        month = next_month_start(month)
+    return months
+
+
+def month_cache_key(month):
+    """Cache key holding the rollup rows of a closed month."""
+    return f"closed_month_usage_{month.strftime('%Y-%m')}"
+
+
+def closed_through():
+    """
+    Last day whose rollup rows are final, or None when the rollup has no watermark.
+
+    Days before the rollup watermark minus the late-arrival window are never
+    recomputed by a scheduled refresh.
+    """
+    from .aggregates import late_arrival_days  # aggregates imports rollups, which imports this module
+
+    watermark = AggregateWatermark.objects.filter(name=ROLLUP_AGGREGATE).values_list(
+        'high_water_date', flat=True
+    ).first()
+    if watermark is None:
+        return None
+    return watermark - timedelta(days=late_arrival_days() + 1)
+
+
+def open_period_start():
+    """First day of the open period: the month after the last closed month (date.min when none is closed)."""
+    last_final_day = closed_through()
+    if last_final_day is None:
+        return date.min
+    return month_start(last_final_day + timedelta(days=1))
+
+
+def _query_rows(condition):
+    return list(
+        UsageDailyRollup.objects.filter(condition).values_list(
+            'date', 'subscriber_name', 'product_name', 'usage_count'
+        ).order_by().iterator(chunk_size=5000)
+    )
+
+
+def closed_month_rows(months):
+    """
+    Rollup rows of closed months, from the cache where possible.
+
+    Months missing from the cache are read in one query and cached without a timeout.
+
+    Args:
+        months: First days of closed months
+
+    Returns:
+        Dictionary of {month: [(date, subscriber_name, product_name, usage_count)]}
+    """
+    if not months:
+        return {}
+    keys = {month_cache_key(month): month for month in months}
+    cache = dashboard_shared_cache()
+    try:
+        found = cache.get_many(list(keys))
+    except Exception as e:
+        logger.error(f"Error reading closed-month usage cache: {str(e)}")
+        found = {}
+    rows_by_month = {keys[key]: rows for key, rows in found.items()}
+
+    missing = [month for month in months if month not in rows_by_month]
+    if missing:
+        condition = Q()
+        for month in missing:
+            condition |= Q(date__gte=month, date__lt=next_month_start(month))
+        loaded = {month: [] for month in missing}
+        for row in _query_rows(condition):
+            loaded[month_start(row[0])].append(row)
+        try:
+            cache.set_many({month_cache_key(month): rows for month, rows in loaded.items()}, None)
+        except Exception as e:
+            logger.error(f"Error writing closed-month usage cache: {str(e)}")
+        rows_by_month.update(loaded)
+        logger.info(f"Cached usage for closed months: {', '.join(month.strftime('%Y-%m') for month in missing)}")
+    return rows_by_month
+
+
+def usage_rows(start_date, end_date, dates=()):
+    """
+    Rollup rows from start_date to end_date plus any extra days.
+
+    Closed months come from closed_month_rows(); the open period is read in
+    one query.
+
+    Args:
+        start_date: First day of the range (inclusive)
+        end_date: Last day of the range (inclusive)
+        dates: Individual days outside the range to include as well
+
+    Returns:
+        List of (date, subscriber_name, product_name, usage_count)
+    """
+    extra_dates = {day for day in dates if not start_date <= day <= end_date}
+    open_start = open_period_start()
+
+    closed_months = {month_start(day) for day in extra_dates if day < open_start}
+    if start_date < open_start:
+        closed_months.update(months_between(start_date, min(end_date, open_start - timedelta(days=1))))
+
+    rows = []
+    for month_rows in closed_month_rows(sorted(closed_months)).values():
+        rows.extend(
+            row for row in month_rows
+            if start_date <= row[0] <= end_date or row[0] in extra_dates
+        )
+
+    open_dates = sorted(day for day in extra_dates if day >= open_start)
+    condition = Q(date__in=open_dates) if open_dates else Q()
+    if end_date >= open_start:
+        condition |= Q(date__range=[max(start_date, open_start), end_date])
+    if condition:
+        rows.extend(_query_rows(condition))
+    return rows
+
+
+def invalidate_closed_months(start_date, end_date):
+    """
+    Drop the cached rows of every month overlapping start_date to end_date.
+
+    Called whenever the rollup is rebuilt over a range, so a backfill of
+    closed months is picked up by the next request; the rebuild time is
+    recorded for rollup_rebuilt_at().
+    """
+    keys = [month_cache_key(month) for month in months_between(start_date, end_date)]
+    try:
+        cache = dashboard_shared_cache()
+        cache.delete_many(keys)
+        cache.set(ROLLUP_REBUILT_KEY, time.time(), None)
+    except Exception as e:
+        logger.error(f"Error invalidating closed-month usage cache: {str(e)}")
+
+
+def rollup_rebuilt_at():
+    """Time of the last rollup rebuild seen by this cache, or None."""
+    try:
+        return dashboard_shared_cache().get(ROLLUP_REBUILT_KEY)
+    except Exception as e:
+        logger.error(f"Error reading rollup rebuild time: {str(e)}")
+        return None
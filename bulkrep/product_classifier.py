@@ -0,0 +1,226 @@
+# Product classification for billing summaries and revenue dashboards
+# Maps raw usagereport ProductName values onto ENQUIRY_RATES keys so that
+# single reports, bulk reports and the revenue helpers share one set of rules.
+# There are only a few hundred distinct product names, so every classifier is
+# memoized per raw name in a bounded LRU cache; classify_many() and
+# precompute_classifications() fill it for many names at once.
+
+from functools import lru_cache
+
+from django.db.models import Case, Count, Q, Value, When, CharField
+
+from .models import ENQUIRY_RATES, Usagereport
+
+# Distinct names remembered per classifier (far more than usagereport holds)
+CLASSIFIER_CACHE_SIZE = 4096
+
+# Ordered (bucket, must_contain, must_not_contain) rules. The first matching rule
+# wins, like the original elif chain used by bulk_report, so every product lands
+# in exactly one bucket. The commercial and X-Score rules come before the
+# consumer rules whose text they contain ("Commercial Basic Trace" contains
+# "Basic Trace"), so commercial usage is billed at commercial rates. Matching is
+# case-insensitive, like the SQL Server collation the ORM queries run against.
+BILL_BUCKET_RULES = [
+    ('xscore_consumer_credit', 'X-SCore Consumer Detailed Credit', None),
+    ('commercial_basic_trace', 'Commercial Basic Trace', None),
+    ('commercial_detailed_credit', 'Commercial detailed Credit', None),
+    ('consumer_snap_check', 'Snap Check', None),
+    ('consumer_basic_trace', 'Basic Trace', None),
+    ('consumer_basic_credit', 'Basic Credit', None),
+    ('consumer_detailed_credit', 'Detailed Credit', 'X-SCore'),
+    ('enquiry_report', 'Enquiry Report', None),
+    ('consumer_dud_cheque', 'Consumer Dud Cheque', None),
+    ('commercial_dud_cheque', 'Commercial Dud Cheque', None),
+    ('director_basic_report', 'Director Basic Report', None),
+    ('director_detailed_report', 'Director Detailed Report', None),
+]
+
+BILL_BUCKETS = [bucket for bucket, _, _ in BILL_BUCKET_RULES]
+
+
+def empty_bill_summary():
+    """Return a summary dictionary with every bill bucket set to zero."""
+    return {bucket: 0 for bucket in BILL_BUCKETS}
+
+
+@lru_cache(maxsize=CLASSIFIER_CACHE_SIZE)
+def classify_bill_bucket(product_name):
+    """
+    Return the bill bucket key for a raw ProductName, or None if the product
+    is not billed in the summary section.
+    """
+    if not product_name:
+        return None
+
+    name = product_name.lower()
+    for bucket, must_contain, must_not_contain in BILL_BUCKET_RULES:
+        if must_contain.lower() not in name:
+            continue
+        if must_not_contain and must_not_contain.lower() in name:
+            continue
+        return bucket
+    return None
+
+
+def rate_key_variations(product_key):
+    """Spellings of an ENQUIRY_RATES key that appear in usagereport ProductName values."""
+    return [
+        product_key.replace('_', ' '),
+        product_key.replace('_', '-'),
+        product_key.title().replace('_', ' '),
+    ]
+
+
+def rate_key_filter(product_key, field='ProductName'):
+    """Q object matching rows whose field contains any spelling of product_key."""
+    condition = Q()
+    for variation in rate_key_variations(product_key):
+        condition |= Q(**{f'{field}__icontains': variation})
+    return condition
+
+
+@lru_cache(maxsize=CLASSIFIER_CACHE_SIZE)
+def rate_keys_for_product(product_name):
+    """
+    Return every ENQUIRY_RATES key whose rate_key_filter() would match product_name,
+    in ENQUIRY_RATES order. A name can match more than one key.
+    """
+    if not product_name:
+        return ()
+    name = product_name.lower()
+    return tuple(
+        product_key for product_key in ENQUIRY_RATES
+        if any(variation.lower() in name for variation in rate_key_variations(product_key))
+    )
+
+
+@lru_cache(maxsize=CLASSIFIER_CACHE_SIZE)
+def match_rate_key(product_name):
+    """
+    Return the first ENQUIRY_RATES key whose spaced name is contained in
+    product_name, or None. This is the revenue dashboard's pricing rule.
+    """
+    if not product_name:
+        return None
+    name = product_name.lower()
+    for product_key in ENQUIRY_RATES:
+        if product_key.replace('_', ' ').lower() in name:
+            return product_key
+    return None
+
+
+@lru_cache(maxsize=CLASSIFIER_CACHE_SIZE)
+def match_rate_key_for_filter(product_filter):
+    """
+    Return the ENQUIRY_RATES key selected by a dashboard product filter: the
+    first key with a spelling that contains, or is contained in, the filter.
+    """
+    if not product_filter:
+        return None
+    text = product_filter.lower()
+    for product_key in ENQUIRY_RATES:
+        for variation in rate_key_variations(product_key):
+            if text in variation.lower() or variation.lower() in text:
+                return product_key
+    return None
+
+
+def classify_many(product_names, classifier=classify_bill_bucket):
+    """
+    Classify many raw names at once, once per distinct name.
+
+    Args:
+        product_names: Iterable of raw ProductName values
+        classifier: classify_bill_bucket, match_rate_key or rate_keys_for_product
+
+    Returns:
+        Dictionary of {product_name: classification}
+    """
+    return {product_name: classifier(product_name) for product_name in set(product_names)}
+
+
+def precompute_classifications():
+    """
+    Warm every classifier cache with the distinct ProductName values in usagereport.
+
+    Returns:
+        Number of distinct product names classified
+    """
+    product_names = list(Usagereport.objects.values_list('ProductName', flat=True).distinct())
+    for classifier in (classify_bill_bucket, match_rate_key, rate_keys_for_product):
+        classify_many(product_names, classifier)
+    return len(product_names)
+
+
+def summarise_product_counts(product_counts):
+    """
+    Fold per-product row counts into a bill summary.
+
+    Each distinct ProductName is classified once, so the cost grows with the
+    number of distinct products rather than the number of usage rows.
+
+    Args:
+        product_counts: Dictionary of {ProductName: row count}
+
+    Returns:
+        Dictionary of {bucket: count} covering every bill bucket
+    """
+    summary = empty_bill_summary()
+    for product_name, count in product_counts.items():
+        bucket = classify_bill_bucket(product_name)
+        if bucket:
+            summary[bucket] += count
+    return summary
+
+
+def bill_bucket_expression(field='ProductName'):
+    """
+    Build a SQL CASE expression equivalent to classify_bill_bucket().
+    CASE evaluates its WHEN branches in order, so first-match semantics hold.
+    """
+    whens = []
+    for bucket, must_contain, must_not_contain in BILL_BUCKET_RULES:
+        condition = Q(**{f'{field}__icontains': must_contain})
+        if must_not_contain:
+            condition &= ~Q(**{f'{field}__icontains': must_not_contain})
+        whens.append(When(condition, then=Value(bucket)))
+    return Case(*whens, default=Value(''), output_field=CharField())
+
+
+def summarise_bill_counts(queryset):
+    """
+    Count usage rows per bill bucket with a single conditional-aggregate query.
+
+    Args:
+        queryset: Usagereport queryset already filtered by subscriber and date range
+
+    Returns:
+        Dictionary of {bucket: count} covering every key in ENQUIRY_RATES
+    """
+    aggregates = {
+        bucket: Count('SearchIdentity', filter=Q(bill_bucket=bucket))
+        for bucket in BILL_BUCKETS
+    }
+    counts = queryset.annotate(bill_bucket=bill_bucket_expression()).aggregate(**aggregates)
+
+    summary = empty_bill_summary()
+    for bucket in BILL_BUCKETS:
+        summary[bucket] = counts.get(bucket) or 0
+    return summary
+
+
+# Product names used for SubscriberProductRate lookups of each bill bucket
+BILL_PRODUCT_NAMES = {
+    'consumer_snap_check': 'Consumer Snap Check',
+    'consumer_basic_trace': 'Consumer Basic Trace',
+    'consumer_basic_credit': 'Consumer Basic Credit',
+    'consumer_detailed_credit': 'Consumer Detailed Credit',
+    'xscore_consumer_credit': 'X-Score Consumer Detailed Credit',
+    'commercial_basic_trace': 'Commercial Basic Trace',
+    'commercial_detailed_credit': 'Commercial Detailed Credit',
+    'enquiry_report': 'Enquiry Report',
+    'consumer_dud_cheque': 'Consumer Dud Cheque',
+    'commercial_dud_cheque': 'Commercial Dud Cheque',
+    'director_basic_report': 'Director Basic Report',
+    'director_detailed_report': 'Director Detailed Report',
+}
@@ -0,0 +1,90 @@
+# Subscriber rate lookups for report generation
+# Loads SubscriberProductRate rows once per report (or once per bulk run) and
+# answers every rate lookup from memory, falling back to the default rate maps.
+
+import logging
+from decimal import Decimal
+
+from .models import ENQUIRY_RATES, SubscriberProductRate
+from .product_classifier import BILL_PRODUCT_NAMES
+
+logger = logging.getLogger(__name__)
+
+
+def _to_decimal(value):
+    """Convert a stored or default rate to Decimal."""
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(str(value))
+
+
+class RateBook:
+    """
+    In-memory index of custom subscriber product rates.
+
+    Keys are lower-cased (subscriber, product) pairs so lookups behave like the
+    iexact queries they replace. When a pair has several rows the one with the
+    lowest id wins, matching the previous filter().first() behaviour.
+    """
+
+    def __init__(self, rates=None):
+        self._rates = rates or {}
+
+    @classmethod
+    def from_queryset(cls, queryset):
+        """Build a rate book from a SubscriberProductRate queryset in one query."""
+        rates = {}
+        try:
+            rows = queryset.order_by('id').values_list('subscriber_name', 'product_name', 'rate')
+            for subscriber_name, product_name, rate in rows:
+                if not subscriber_name or not product_name or rate is None:
+                    continue
+                key = (subscriber_name.strip().lower(), product_name.strip().lower())
+                rates.setdefault(key, _to_decimal(rate))
+        except Exception as e:
+            logger.error(f"Error loading subscriber product rates: {str(e)}")
+        return cls(rates)
+
+    @classmethod
+    def for_subscriber(cls, subscriber_name):
+        """Load every custom rate for a single subscriber."""
+        return cls.from_queryset(
+            SubscriberProductRate.objects.filter(subscriber_name__iexact=subscriber_name)
+        )
+
+    @classmethod
+    def for_subscribers(cls, subscriber_names):
+        """Load every custom rate for a list of subscribers (one query per bulk run)."""
+        return cls.from_queryset(
+            SubscriberProductRate.objects.filter(subscriber_name__in=list(subscriber_names))
+        )
+
+    def __len__(self):
+        return len(self._rates)
+
+    def subset(self, subscriber_name):
+        """Return a RateBook holding only one subscriber's rates (small enough to send to a worker process)."""
+        key = (subscriber_name or '').strip().lower()
+        return RateBook({pair: rate for pair, rate in self._rates.items() if pair[0] == key})
+
+    def custom_rate(self, subscriber_name, product_name):
+        """Return the custom rate for a subscriber/product pair, or None."""
+        if not subscriber_name or not product_name:
+            return None
+        return self._rates.get((subscriber_name.strip().lower(), product_name.strip().lower()))
+
+    def rate(self, subscriber_name, product_name, default_rate_map=ENQUIRY_RATES, default_rate_key=None):
+        """
+        Return the custom rate for a subscriber/product pair, falling back to
+        default_rate_map[default_rate_key] (or Decimal('0.00') if missing).
+        """
+        custom_rate = self.custom_rate(subscriber_name, product_name)
+        if custom_rate is not None:
+            return custom_rate
+        if default_rate_key is None:
+            default_rate_key = product_name
+        return _to_decimal(default_rate_map.get(default_rate_key, Decimal('0.00')))
+
+    def bill_rate(self, subscriber_name, bucket):
+        """Return the rate for a bill summary bucket, falling back to ENQUIRY_RATES."""
+        return self.rate(subscriber_name, BILL_PRODUCT_NAMES[bucket], ENQUIRY_RATES, bucket)
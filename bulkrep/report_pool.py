@@ -0,0 +1,127 @@
+# Process pool fan-out for bulk report rendering
+# Filling a subscriber's workbook is CPU-bound openpyxl work, so bulk runs spread
+# subscribers over worker processes. Workers only receive plain data (grouped
+# usage records, bill counts, that subscriber's rates) and write the workbook to
+# the scratch path they are given.
+# Results come back in submission order so zip entries are deterministic, and an
+# exception only fails the subscriber that raised it.
+# This module must not import models at import time: spawned workers import it
+# before Django is set up.
+
+import logging
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import billiard
+import billiard.pool
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def bulk_worker_count(job_count):
+    """
+    Number of worker processes for a bulk run.
+
+    Args:
+        job_count: Number of subscriber workbooks to render
+
+    Returns:
+        REPORT_BULK_WORKERS (0 means one per CPU core), capped at job_count
+    """
+    workers = getattr(settings, 'REPORT_BULK_WORKERS', 0)
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return max(1, min(workers, job_count))
+
+
+def _init_worker():
+    """Pool initializer: set up Django in workers that were spawned rather than forked."""
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def _run_serially(func, jobs):
+    for job in jobs:
+        try:
+            yield job, func(**job), None
+        except Exception as e:
+            yield job, None, e
+
+
+def _in_daemonic_process():
+    """True inside a daemonic process, e.g. a Celery prefork (billiard) pool worker."""
+    return multiprocessing.current_process().daemon or billiard.current_process().daemon
+
+
+def _run_bounded(submit, jobs, workers):
+    """Keep at most two jobs per worker in flight and yield their outcomes in job order."""
+    job_iter = iter(jobs)
+    pending = deque()
+
+    def submit_next():
+        job = next(job_iter, None)
+        if job is not None:
+            pending.append((job, submit(job)))
+
+    for _ in range(workers * 2):
+        submit_next()
+
+    while pending:
+        job, get_result = pending.popleft()
+        try:
+            result, error = get_result(), None
+        except Exception as e:
+            result, error = None, e
+        submit_next()
+        yield job, result, error
+
+
+def run_ordered(func, jobs, workers):
+    """
+    Call func(**job) for every job and yield (job, result, error) in job order.
+
+    With more than one worker the calls run in a process pool; at most two
+    jobs per worker are in flight, so finished results waiting for an earlier
+    job don't pile up in memory. jobs is consumed lazily, so a generator that
+    builds each job on demand keeps only the in-flight jobs resident.
+    func must be a module-level function.
+
+    The standard library refuses to start children from a daemonic process,
+    which is what every Celery prefork worker is, so there the pool is
+    billiard's (Celery's own multiprocessing fork), which allows it.
+
+    Args:
+        func: Function to call for each job
+        jobs: Iterable of keyword-argument dictionaries (picklable)
+        workers: Number of worker processes; 1 renders in this process
+
+    Yields:
+        (job, result, None) on success or (job, None, exception) on failure
+    """
+    if workers <= 1:
+        yield from _run_serially(func, jobs)
+        return
+
+    if _in_daemonic_process():
+        pool = billiard.pool.Pool(processes=workers, initializer=_init_worker)
+        try:
+            yield from _run_bounded(lambda job: pool.apply_async(func, kwds=job).get, jobs, workers)
+        except BaseException:
+            pool.terminate()  # Also reached when the caller stops iterating early
+            raise
+        else:
+            pool.close()
+        finally:
+            pool.join()
+        return
+
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+    try:
+        yield from _run_bounded(lambda job: executor.submit(func, **job).result, jobs, workers)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
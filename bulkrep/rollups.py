@@ -0,0 +1,92 @@
+# Daily usage rollup maintenance
+# Dashboard metrics only need usage counts per day, subscriber and product, so
+# UsageDailyRollup stores exactly that and the metric functions aggregate it
+# instead of the raw usagereport rows. A refresh replaces every rollup row in a
+# date range with a fresh GROUP BY over usagereport, one window of days per
+# transaction, so it is safe to re-run for any range at any time. Rebuilding a
+# range also drops the permanently cached usage of its months (period_cache).
+
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Max, Min
+
+from .models import UsageDailyRollup, Usagereport
+from .period_cache import invalidate_closed_months
+
+logger = logging.getLogger(__name__)
+
+# Days rebuilt per transaction, and rollup rows inserted per statement
+REFRESH_WINDOW_DAYS = 31
+INSERT_BATCH_SIZE = 1000
+
+
+def usage_date_bounds():
+    """Return (first, last) DetailsViewedDate in usagereport, or (None, None) when it is empty."""
+    bounds = Usagereport.objects.aggregate(first=Min('DetailsViewedDate'), last=Max('DetailsViewedDate'))
+    return bounds['first'], bounds['last']
+
+
+def _refresh_window(start_date, end_date):
+    """Replace the rollup rows of one window; returns (usage rows scanned, rollup rows written)."""
+    aggregated = Usagereport.objects.filter(
+        DetailsViewedDate__range=[start_date, end_date]
+    ).values('DetailsViewedDate', 'SubscriberName', 'ProductName').annotate(
+        usage_count=Count('SearchIdentity')
+    ).order_by()
+
+    scanned = 0
+    written = 0
+    with transaction.atomic():
+        UsageDailyRollup.objects.filter(date__range=[start_date, end_date]).delete()
+        batch = []
+        for row in aggregated.iterator(chunk_size=INSERT_BATCH_SIZE):
+            scanned += row['usage_count']
+            batch.append(UsageDailyRollup(
+                date=row['DetailsViewedDate'],
+                subscriber_name=row['SubscriberName'],
+                product_name=row['ProductName'],
+                usage_count=row['usage_count'],
+            ))
+            if len(batch) >= INSERT_BATCH_SIZE:
+                UsageDailyRollup.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            UsageDailyRollup.objects.bulk_create(batch)
+            written += len(batch)
+    return scanned, written
+
+
+def refresh_usage_rollup(start_date=None, end_date=None):
+    """
+    Rebuild UsageDailyRollup for every day from start_date to end_date (inclusive).
+
+    Args:
+        start_date: First day to rebuild; defaults to the first usage date
+        end_date: Last day to rebuild; defaults to the last usage date
+
+    Returns:
+        Tuple of (usage rows scanned, rollup rows written)
+    """
+    if start_date is None or end_date is None:
+        first, last = usage_date_bounds()
+        start_date = start_date or first
+        end_date = end_date or last
+    if start_date is None or end_date is None or start_date > end_date:
+        return 0, 0
+
+    scanned = 0
+    written = 0
+    window_start = start_date
+    while window_start <= end_date:
+        window_end = min(window_start + timedelta(days=REFRESH_WINDOW_DAYS - 1), end_date)
+        window_scanned, window_written = _refresh_window(window_start, window_end)
+        scanned += window_scanned
+        written += window_written
+        window_start = window_end + timedelta(days=1)
+
+    invalidate_closed_months(start_date, end_date)
+    logger.info(f"Refreshed usage rollup {start_date} to {end_date}: {scanned} usage rows, {written} rollup rows")
+    return scanned, written
@@ -0,0 +1,91 @@
+# Precompiled row formatting for report data rows
+# Every usage record used to run copy_row_format (17 style copies, fresh
+# Alignment objects, a merged-range scan) followed by merge_and_center_data_row
+# (more Alignments, four unmerge/merge round trips). A RowStamp captures the
+# end result once from the formatted template row - style ids, merged cells,
+# merge spans and row height - and applying it to a new row is a handful of
+# direct cell assignments.
+
+from copy import copy
+
+from openpyxl.cell.cell import Cell, MergedCell
+from openpyxl.styles.cell_style import StyleArray
+from openpyxl.styles.numbers import BUILTIN_FORMATS_MAX_SIZE, BUILTIN_FORMATS_REVERSE
+
+from .merged_ranges import get_merged_index, plan_merge, unmerge_range
+
+
+class RowStamp:
+    """
+    Compiled formatting of one template row.
+
+    cells holds (col, StyleArray, is_merged_cell) for every column up to max_col,
+    merge_spans the (min_col, max_col) of each single-row merge.
+    """
+
+    def __init__(self, cells, merge_spans, height=None):
+        self.cells = cells
+        self.merge_spans = merge_spans
+        self.height = height
+        self.styles = {col: style for col, style, _ in cells}
+
+    @classmethod
+    def from_row(cls, ws, row, max_col):
+        """Compile a stamp from a row that is already formatted the way data rows should look."""
+        cells = []
+        for col in range(1, max_col + 1):
+            cell = ws._cells.get((row, col))
+            if cell is None:
+                cells.append((col, StyleArray(), False))
+            else:
+                cells.append((col, copy(cell._style), isinstance(cell, MergedCell)))
+
+        merge_spans = [
+            (merged_range.min_col, merged_range.max_col)
+            for merged_range in get_merged_index(ws).ranges_in_row(row)
+            if merged_range.min_row == merged_range.max_row == row
+        ]
+
+        height = None
+        if row in ws.row_dimensions:
+            height = ws.row_dimensions[row].height
+        return cls(cells, merge_spans, height)
+
+    def apply(self, ws, row):
+        """
+        Stamp the compiled formatting (styles, merges, height) onto a worksheet row.
+        The merges go into the sheet's MergePlan, so call apply_merge_plans() before saving.
+        """
+        # Rows are normally fresh, but clear anything merged there already
+        for merged_range in get_merged_index(ws).ranges_in_row(row):
+            unmerge_range(ws, merged_range)
+
+        ws_cells = ws._cells
+        for col, style, is_merged_cell in self.cells:
+            existing = ws_cells.get((row, col))
+            if is_merged_cell:
+                cell = MergedCell(ws, row=row, column=col)
+                ws_cells[(row, col)] = cell
+            elif existing is not None:
+                cell = existing
+            else:
+                cell = Cell(ws, row=row, column=col)
+                ws_cells[(row, col)] = cell
+            cell._style = copy(style)
+
+        # Cells are already styled, so the merges are planned without re-formatting;
+        # they are applied with the rest of the sheet's merges before saving
+        for min_col, max_col in self.merge_spans:
+            plan_merge(ws, row, min_col, row, max_col, format_cells=False)
+
+        if self.height is not None:
+            ws.row_dimensions[row].height = self.height
+
+    def style_with_number_format(self, col, number_format, wb):
+        """Return a copy of a column's StyleArray with a different number format."""
+        style = copy(self.styles.get(col) or StyleArray())
+        if number_format in BUILTIN_FORMATS_REVERSE:
+            style.numFmtId = BUILTIN_FORMATS_REVERSE[number_format]
+        else:
+            style.numFmtId = wb._number_formats.add(number_format) + BUILTIN_FORMATS_MAX_SIZE
+        return style
@@ -0,0 +1,419 @@
+# Streaming (write-only) rendering for large reports
+# The static header of Templateuse.xlsx (rows 1-35) is copied into a
+# write-only workbook and every product section from row 36 onwards is
+# streamed straight to a temporary file, so memory stays flat however many
+# usage rows a subscriber has. Styles are pre-built once from the template and
+# the output has the same layout as the regular in-memory renderer.
+
+import logging
+from array import array
+from copy import copy
+
+from django.conf import settings
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font
+from openpyxl.utils import get_column_letter
+from openpyxl.utils.indexed_list import IndexedList
+from openpyxl.worksheet._writer import WorksheetWriter
+from openpyxl.xml.functions import Element
+
+from .merged_ranges import get_merged_index, is_anchor
+
+logger = logging.getLogger(__name__)
+
+# Reports with at least this many usage rows are streamed (REPORT_STREAMING_MIN_ROWS in settings)
+DEFAULT_STREAMING_MIN_ROWS = 5000
+
+HEADER_LAST_ROW = 35            # Last static template row copied as-is
+PRODUCT_HEADER_ROWS = (32, 35)  # Template rows cloned above each subsequent product
+TEMPLATE_DATA_ROW = 36          # Template row whose formatting every data row uses
+DATA_COLUMNS = 17               # Columns A-Q
+HEADER_COLUMNS = 15             # Columns A-O are copied from the header template
+TEXT_DATE_COLUMNS = (10, 12)    # SubscriberEnquiryDate (J) and DetailsViewedDate (L) are stored as text
+PRODUCT_SPACING = 4             # Blank rows between one product's data and the next header
+MAX_SHEET_ROW = 1000000         # Switch to Sheet2 after this row, like the VBA macro
+SHEET2_FIRST_DATA_ROW = 13
+SIGNATURE_ROW_HEIGHT = 26
+
+# Workbook style tables copied from the template so StyleArray ids stay valid
+STYLE_TABLES = ('_fonts', '_fills', '_borders', '_alignments', '_protections', '_number_formats', '_cell_styles')
+SHARED_STYLE_TABLES = ('_named_styles', '_differential_styles', '_table_styles', '_colors')
+
+
+def should_stream_report(row_count):
+    """Return True if a report with this many usage rows should use the streaming writer."""
+    threshold = getattr(settings, 'REPORT_STREAMING_MIN_ROWS', DEFAULT_STREAMING_MIN_ROWS)
+    if threshold is None or threshold < 0:
+        return False
+    return row_count >= threshold
+
+
+def find_product_name_cell(ws):
+    """Return (row, col) of the "Product Name" placeholder in the template header, or None."""
+    for row in range(PRODUCT_HEADER_ROWS[0], PRODUCT_HEADER_ROWS[1] + 1):
+        for col in range(1, HEADER_COLUMNS + 1):
+            cell_value = ws.cell(row=row, column=col).value
+            if cell_value and "product" in str(cell_value).lower():
+                return (row, col)
+    return None
+
+
+def format_date_text(value):
+    """
+    Format a usage date the way the report shows it (YYYY-MM-DD text), or return
+    None if there is no date.
+    """
+    if not value:
+        return None
+    if isinstance(value, str):
+        return value
+    # Convert to date object first to remove any time component
+    if hasattr(value, 'date'):
+        value = value.date()
+    return value.strftime('%Y-%m-%d')
+
+
+class _StreamedMerges:
+    """
+    Merged ranges of a streamed sheet. Data-row merges are stored as row numbers
+    only and expanded when the sheet is closed.
+    """
+
+    def __init__(self, data_row_spans):
+        self.data_row_spans = data_row_spans
+        self.ranges = []
+        self.data_rows = array('L')
+
+    def add(self, min_row, min_col, max_row, max_col):
+        self.ranges.append((min_row, min_col, max_row, max_col))
+
+    def add_data_row(self, row):
+        self.data_rows.append(row)
+
+    def __len__(self):
+        return len(self.ranges) + len(self.data_rows) * len(self.data_row_spans)
+
+    def __iter__(self):
+        for min_row, min_col, max_row, max_col in self.ranges:
+            yield f"{get_column_letter(min_col)}{min_row}:{get_column_letter(max_col)}{max_row}"
+        letters = [(get_column_letter(a), get_column_letter(b)) for a, b in self.data_row_spans]
+        for row in self.data_rows:
+            for start, end in letters:
+                yield f"{start}{row}:{end}{row}"
+
+
+class _StreamingSheetWriter(WorksheetWriter):
+    """Worksheet writer that streams <mergeCells> instead of building them in memory."""
+
+    def write_merged_cells(self):
+        merges = self.ws.stream_merges
+        if not len(merges):
+            return
+        xf = self.xf.send(True)
+        with xf.element("mergeCells", count=str(len(merges))):
+            for ref in merges:
+                xf.write(Element("mergeCell", ref=ref))
+        self.xf.send(None)
+
+
+class _StreamSheet:
+    """A write-only worksheet plus the template sheet it is rendered from."""
+
+    def __init__(self, wb, template_sheet, data_row_spans):
+        self.template = template_sheet
+        self.ws = wb.create_sheet(title=template_sheet.title)
+        self.ws.stream_merges = _StreamedMerges(data_row_spans)
+        self.next_row = 1
+        self.opened = False
+
+    def open(self, extra_widths=None):
+        """Copy sheet-level settings; must happen before the first row is written."""
+        ws, template = self.ws, self.template
+
+        for key, dim in template.column_dimensions.items():
+            new_dim = copy(dim)
+            new_dim.parent = ws
+            if extra_widths and extra_widths.get(key) and (new_dim.width or 0) < extra_widths[key]:
+                new_dim.width = extra_widths[key]
+            ws.column_dimensions[key] = new_dim
+
+        ws.sheet_properties = copy(template.sheet_properties)
+        ws.sheet_format = copy(template.sheet_format)
+        ws.views = copy(template.views)
+        ws.page_margins = copy(template.page_margins)
+        ws.print_options = copy(template.print_options)
+        ws.page_setup = copy(template.page_setup)
+        ws.page_setup._parent = ws
+        ws.HeaderFooter = copy(template.HeaderFooter)
+        ws.conditional_formatting = template.conditional_formatting
+        ws.data_validations = template.data_validations
+        ws.sheet_state = template.sheet_state
+        ws._print_rows = template._print_rows
+        ws._print_cols = template._print_cols
+        ws._print_area = template._print_area
+        for img in template._images:
+            ws.add_image(img)
+
+        writer = _StreamingSheetWriter(ws)
+        writer.write_top()
+        ws._writer = writer
+        self.opened = True
+
+    def append(self, cells, height=None):
+        """Write the next row. Row heights are dropped again once the row is written."""
+        row = self.next_row
+        if height is not None:
+            self.ws.row_dimensions[row].height = height
+        self.ws.append(cells)
+        if height is not None:
+            del self.ws.row_dimensions[row]
+        self.next_row += 1
+        return row
+
+    def skip_to(self, row):
+        """Write blank rows until the next row written is `row`."""
+        while self.next_row < row:
+            self.append([])
+
+    def copy_template_rows(self, first_row, last_row):
+        """Copy template rows (values, styles, heights and merges) unchanged."""
+        template = self.template
+        max_col = template.max_column
+        for row in range(first_row, last_row + 1):
+            self.skip_to(row)
+            cells = []
+            for col in range(1, max_col + 1):
+                source = template._cells.get((row, col))
+                if source is None:
+                    cells.append(None)
+                    continue
+                cell = WriteOnlyCell(self.ws, value=source.value)
+                cell._style = copy(source._style)
+                cells.append(cell)
+            height = None
+            if row in template.row_dimensions:
+                height = template.row_dimensions[row].height
+            self.append(cells, height)
+
+        for merged_range in template.merged_cells.ranges:
+            if first_row <= merged_range.min_row and merged_range.max_row <= last_row:
+                self.ws.stream_merges.add(merged_range.min_row, merged_range.min_col,
+                                          merged_range.max_row, merged_range.max_col)
+
+
+class StreamingReportWriter:
+    """
+    Renders the product detail sections of a report through a write-only workbook.
+
+    Create the writer before the first product name is written into the template
+    (cloned headers reuse the original header values), then call start() with the
+    compiled data row stamp once the template holds everything above row 36 and
+    has its column widths sized for the data being written.
+    """
+
+    def __init__(self, template_wb, product_name_cell=None):
+        self.template_wb = template_wb
+        self.template_ws = template_wb.active
+        self.wb = Workbook(write_only=True)
+
+        self.product_name_cell = product_name_cell or find_product_name_cell(self.template_ws)
+        self.header_values = {
+            (row, col): self.template_ws.cell(row=row, column=col).value
+            for row in range(PRODUCT_HEADER_ROWS[0], PRODUCT_HEADER_ROWS[1] + 1)
+            for col in range(1, HEADER_COLUMNS + 1)
+        }
+
+        self.products_written = 0
+        self.current_row_offset = TEMPLATE_DATA_ROW
+        self.serial_number_base = TEMPLATE_DATA_ROW - 1
+        self.rows_written = 0
+
+    def start(self, data_row_stamp):
+        """Take the data row styles from a RowStamp and write the static header rows 1-35."""
+        template_wb = self.template_wb
+        template_ws = self.template_ws
+        self._copy_workbook_styles()
+
+        self.data_row_stamp = data_row_stamp
+        self.data_row_spans = data_row_stamp.merge_spans
+        self.data_row_styles = data_row_stamp.styles
+        self.text_date_styles = {
+            col: data_row_stamp.style_with_number_format(col, '@', self.wb) for col in TEXT_DATE_COLUMNS
+        }
+
+        self.sheets = [_StreamSheet(self.wb, sheet, self.data_row_spans) for sheet in template_wb.worksheets]
+        self.main_sheet = self.sheets[template_wb.worksheets.index(template_ws)]
+        self.spill_sheet = next((sheet for sheet in self.sheets if sheet.template.title == "Sheet2"), None)
+        if self.spill_sheet is self.main_sheet:
+            self.spill_sheet = None
+
+        # Static header rows 1-35 go out first; data follows from row 36
+        self.current_sheet = self.main_sheet
+        self.main_sheet.open()
+        self.main_sheet.copy_template_rows(1, HEADER_LAST_ROW)
+
+    def _copy_workbook_styles(self):
+        """Share the template's style tables so copied _style arrays keep their meaning."""
+        for attr in STYLE_TABLES:
+            setattr(self.wb, attr, IndexedList(list(getattr(self.template_wb, attr))))
+        for attr in SHARED_STYLE_TABLES:
+            setattr(self.wb, attr, getattr(self.template_wb, attr))
+        self.wb.loaded_theme = self.template_wb.loaded_theme
+        self.wb.epoch = self.template_wb.epoch
+
+    def _styled_cell(self, ws, value, style):
+        cell = WriteOnlyCell(ws, value=value)
+        if style is not None:
+            cell._style = copy(style)
+        return cell
+
+    def _switch_to_spill_sheet(self, first_row):
+        """Move to Sheet2 once Sheet1 is full, copying its static rows first."""
+        sheet = self.spill_sheet
+        main_widths = {key: dim.width for key, dim in self.main_sheet.ws.column_dimensions.items()}
+        sheet.open(extra_widths=main_widths)
+        sheet.copy_template_rows(1, SHEET2_FIRST_DATA_ROW - 1)
+        sheet.skip_to(first_row)
+        self.current_sheet = sheet
+
+    def write_product(self, product_name, records):
+        """Write one product section: header (for every product but the first) then data rows."""
+        if self.products_written:
+            self.current_row_offset += PRODUCT_SPACING
+            header_start_row = self.current_row_offset
+            header_height = PRODUCT_HEADER_ROWS[1] - PRODUCT_HEADER_ROWS[0] + 1
+            if self.current_sheet is self.main_sheet and self.spill_sheet is not None \
+                    and header_start_row + header_height - 1 > MAX_SHEET_ROW:
+                header_start_row = SHEET2_FIRST_DATA_ROW
+                self._switch_to_spill_sheet(header_start_row)
+            self._write_product_header(header_start_row, product_name)
+            self.current_row_offset = header_start_row + header_height
+            self.serial_number_base = self.current_row_offset - 1
+
+        for record_idx, record in enumerate(records):
+            current_row = self.current_row_offset + record_idx
+
+            # Switch to Sheet2 when reaching max row (like VBA)
+            if current_row > MAX_SHEET_ROW and self.spill_sheet is not None \
+                    and self.current_sheet is not self.spill_sheet:
+                self.current_row_offset = SHEET2_FIRST_DATA_ROW
+                self.serial_number_base = SHEET2_FIRST_DATA_ROW - 1
+                current_row = self.current_row_offset + record_idx
+                self._switch_to_spill_sheet(current_row)
+
+            self._write_data_row(current_row, record)
+
+        self.current_row_offset += len(records)
+        self.products_written += 1
+        self.rows_written += len(records)
+
+    def _write_product_header(self, header_start_row, product_name):
+        """Clone template rows 32-35 with this product's name."""
+        sheet = self.current_sheet
+        template_ws = self.template_ws
+        index = get_merged_index(template_ws)
+        sheet.skip_to(header_start_row)
+
+        for template_row_idx, template_row in enumerate(range(PRODUCT_HEADER_ROWS[0], PRODUCT_HEADER_ROWS[1] + 1)):
+            target_row = header_start_row + template_row_idx
+
+            # Merges anchored in columns A-O are recreated; cells they cover keep the template styling
+            spans = []
+            for col in range(1, HEADER_COLUMNS + 1):
+                merged_range = index.find(template_row, col)
+                if merged_range is not None and is_anchor(merged_range, template_row, col):
+                    spans.append(merged_range)
+                    sheet.ws.stream_merges.add(
+                        target_row, col,
+                        target_row + merged_range.max_row - merged_range.min_row, merged_range.max_col
+                    )
+            last_col = max([HEADER_COLUMNS] + [merged_range.max_col for merged_range in spans])
+
+            cells = []
+            for col in range(1, last_col + 1):
+                source = template_ws._cells.get((template_row, col))
+                if col > HEADER_COLUMNS and not any(r.min_col <= col <= r.max_col for r in spans):
+                    source = None
+                if source is None:
+                    cells.append(None)
+                    continue
+                value = self.header_values.get((template_row, col))
+                if self.product_name_cell == (template_row, col):
+                    value = product_name
+                cells.append(self._styled_cell(sheet.ws, value, source._style))
+
+            # Header for the data section
+            if template_row == PRODUCT_HEADER_ROWS[1]:
+                merged_range = index.find(template_row, 4)
+                if merged_range is None or is_anchor(merged_range, template_row, 4):
+                    source = template_ws._cells.get((template_row, 4))
+                    cells[3] = self._styled_cell(sheet.ws, "Unique Tracking Number",
+                                                 source._style if source is not None else None)
+
+            sheet.append(cells)
+
+    def _write_data_row(self, current_row, record):
+        """Stamp one usage record onto a pre-styled data row."""
+        sheet = self.current_sheet
+        sheet.skip_to(current_row)
+        ws = sheet.ws
+        styles = self.data_row_styles
+
+        values = {
+            2: current_row - self.serial_number_base,  # Serial Number
+            3: "",  # Branch ID
+            4: "",  # Unique Tracking Number column left blank
+            5: record['SubscriberName'],
+            7: record['SystemUser'] if record['SystemUser'] else "",
+            10: format_date_text(record['SubscriberEnquiryDate']),
+            11: record['ProductName'],
+            12: format_date_text(record['DetailsViewedDate']),
+            15: record['SearchOutput'] if record['SearchOutput'] else "",
+        }
+
+        cells = []
+        for col in range(1, DATA_COLUMNS + 1):
+            style = styles[col]
+            if col in values:
+                value = values[col]
+                if col in TEXT_DATE_COLUMNS:
+                    if value is None:
+                        value = ""
+                    else:
+                        style = self.text_date_styles[col]
+                cells.append(self._styled_cell(ws, value, style))
+            elif style is not None:
+                cells.append(self._styled_cell(ws, None, style))
+            else:
+                cells.append(None)
+
+        sheet.append(cells, self.data_row_stamp.height)
+        ws.stream_merges.add_data_row(current_row)
+
+    def finish(self, username):
+        """Add the 'Report Generated by' line and close every sheet."""
+        # Two rows below the last data row. Rows already written cannot be revisited,
+        # so after a Sheet2 spill the line goes on Sheet2 rather than Sheet1.
+        sheet = self.current_sheet
+        signature_row = self.current_row_offset + 1
+        sheet.skip_to(signature_row)
+
+        cell = WriteOnlyCell(sheet.ws, value=f"Report Generated by: {username}")
+        cell.font = Font(name='Trebuchet MS', bold=True, italic=True, color='FF7F7F7F')
+        cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
+        sheet.append([None] * 14 + [cell], SIGNATURE_ROW_HEIGHT)
+        sheet.ws.stream_merges.add(signature_row, 15, signature_row, 17)
+
+        # Sheets that received no data are copied from the template unchanged
+        for other in self.sheets:
+            if not other.opened:
+                other.open()
+                other.copy_template_rows(1, other.template.max_row)
+
+        logger.info(f"Streamed {self.rows_written} usage rows across {self.products_written} products")
+        return signature_row
+
+    def save(self, target):
+        """Save the streamed workbook to a path or file-like object."""
+        self.wb.save(target)
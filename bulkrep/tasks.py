@@ -0,0 +1,127 @@
+# Background report generation jobs
+# single_report and bulk_report only validate the form and record a
+# ReportGeneration row; the query -> workbook -> file pipeline runs here on a
+# Celery worker so web workers stay free. The ReportGeneration row is the job
+# record: report_status serves it as JSON and download_ready.html polls it until
+# the file exists. With CELERY_TASK_ALWAYS_EAGER the jobs run in-process.
+
+import logging
+import uuid
+from datetime import datetime
+
+from celery import shared_task
+
+from . import views  # Module reference: views imports this module too
+from .models import ReportGeneration
+
+logger = logging.getLogger(__name__)
+
+
+def submit_report_job(task, report_gen, **kwargs):
+    """
+    Queue a report task for a ReportGeneration record.
+
+    The task id is stored before the task is sent, so an eager run (which
+    finishes inside apply_async) is never overwritten by this function.
+
+    Args:
+        task: generate_single_report or generate_bulk_report
+        report_gen: ReportGeneration row acting as the job record
+        **kwargs: JSON-serialisable task arguments
+
+    Returns:
+        The ReportGeneration row, refreshed after submission
+    """
+    report_gen.task_id = uuid.uuid4().hex
+    report_gen.status = 'queued'
+    report_gen.save()
+
+    try:
+        task.apply_async(kwargs={'report_id': report_gen.pk, **kwargs}, task_id=report_gen.task_id)
+    except Exception as e:
+        logger.error(f"Could not queue report job {report_gen.pk}: {str(e)}")
+        report_gen.refresh_from_db()
+        _finish_job(report_gen, 'failed', error_message=f"Could not start report generation: {str(e)}")
+
+    report_gen.refresh_from_db()
+    return report_gen
+
+
+def _start_job(report_id):
+    """Mark a job as running and return its record, or None if it no longer exists."""
+    report_gen = ReportGeneration.objects.filter(pk=report_id).select_related('user').first()
+    if report_gen is None:
+        logger.warning(f"Report job {report_id} was deleted before it ran")
+        return None
+    report_gen.status = 'in_progress'
+    report_gen.save()
+    return report_gen
+
+
+def _finish_job(report_gen, status, download_url=None, status_message=None, error_message=None):
+    """Record the outcome of a job; ReportGeneration.save() stamps completed_at."""
+    report_gen.status = status
+    report_gen.download_url = download_url
+    report_gen.status_message = status_message
+    report_gen.error_message = error_message[:500] if error_message else None  # Truncate to fit in the field
+    report_gen.save()
+
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+@shared_task(name='bulkrep.generate_single_report')
+def generate_single_report(report_id, subscriber_id, start_date, end_date, include_bills, include_products):
+    """Generate one subscriber's report for a ReportGeneration job."""
+    report_gen = _start_job(report_id)
+    if report_gen is None:
+        return
+
+    try:
+        download_url = views.generate_single_report_file(
+            subscriber_id, _parse_date(start_date), _parse_date(end_date),
+            include_bills, include_products, report_gen.user.username
+        )
+    except views.ReportJobError as e:
+        _finish_job(report_gen, 'failed', error_message=str(e))
+    except Exception as e:
+        logger.exception(f"Report job {report_id} failed")
+        _finish_job(report_gen, 'failed', error_message=f"Error generating report: {str(e)}")
+    else:
+        _finish_job(report_gen, 'success', download_url=download_url)
+
+
+@shared_task(name='bulkrep.generate_bulk_report')
+def generate_bulk_report(report_id, subscribers, start_date, end_date, include_bills, include_products):
+    """Generate the zipped per-subscriber reports for a ReportGeneration job."""
+    report_gen = _start_job(report_id)
+    if report_gen is None:
+        return
+
+    start = _parse_date(start_date)
+    end = _parse_date(end_date)
+    try:
+        download_url, processed_subscribers, notes = views.generate_bulk_report_file(
+            subscribers, start, end, include_bills, include_products, report_gen.user.username
+        )
+    except views.ReportJobError as e:
+        _finish_job(report_gen, 'failed', error_message=str(e))
+    except Exception as e:
+        logger.exception(f"Bulk report job {report_id} failed")
+        _finish_job(report_gen, 'failed', error_message=f"Error generating bulk reports: {str(e)}")
+    else:
+        success_msg = (
+            f"Successfully generated reports for {len(processed_subscribers)} out of {len(subscribers)} subscribers "
+            f"for the period {start.strftime('%d/%m/%Y')} to {end.strftime('%d/%m/%Y')}."
+        )
+        _finish_job(report_gen, 'success', download_url=download_url,
+                    status_message="\n".join([success_msg] + notes))
+
+
+@shared_task(name='bulkrep.warm_dashboard_cache')
+def warm_dashboard_cache():
+    """Precompute the common dashboard views (scheduled by CELERY_BEAT_SCHEDULE)."""
+    from .dashboard_warmup import warm_dashboard_cache as warm  # dashboard_warmup imports views
+
+    warm()
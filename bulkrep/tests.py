@@ -1,3 +1,731 @@
-from django.test import TestCase
+import io
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import openpyxl
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.db.models import Count, Min
+from django.test import RequestFactory, TestCase, override_settings
+
+from . import metric_pool, report_pool
+from .aggregates import refresh_aggregates
+from .cache_backends import TieredCache
+from .checks import check_report_job_queue
+from .dashboard_cache import dashboard_cache
+from .dashboard_engine import DashboardSlice
+from .data_version import data_version, data_version_etag, not_modified_response, read_data_version
+from .first_seen import refresh_subscriber_first_seen
+from .models import (
+    AggregateWatermark, SubscriberFirstSeen, SubscriberProductRate, UsageDailyRollup, Usagereport,
+)
+from .period_cache import month_cache_key
+from .product_classifier import (
+    BILL_BUCKETS, classify_bill_bucket, empty_bill_summary, summarise_bill_counts, summarise_product_counts,
+)
+from .rollups import refresh_usage_rollup
+from .views import build_report_workbook, dashboard_api
+
+# Every ProductName spelling seen in usagereport, with the one bucket it is billed in
+PRODUCT_SPELLINGS = {
+    'Consumer Snap Check': 'consumer_snap_check',
+    'Consumer Basic Trace': 'consumer_basic_trace',
+    'Consumer Basic Credit': 'consumer_basic_credit',
+    'Consumer Detailed Credit': 'consumer_detailed_credit',
+    'X-Score Consumer Detailed Credit': 'xscore_consumer_credit',
+    'X-SCore Consumer Detailed Credit': 'xscore_consumer_credit',
+    'Commercial Basic Trace': 'commercial_basic_trace',
+    'Commercial Detailed Credit': 'commercial_detailed_credit',
+    'Commercial detailed Credit': 'commercial_detailed_credit',
+    'Enquiry Report': 'enquiry_report',
+    'Consumer Dud Cheque': 'consumer_dud_cheque',
+    'Commercial Dud Cheque': 'commercial_dud_cheque',
+    'Director Basic Report': 'director_basic_report',
+    'Director Detailed Report': 'director_detailed_report',
+    'Consumer Prime Report': None,
+}
+
+def create_unmanaged_tables():
+    """Create usagereport and SubscriberProductRate, which migrations leave to the external database."""
+    existing = connection.introspection.table_names()
+    with connection.schema_editor() as editor:
+        for model in (Usagereport, SubscriberProductRate):
+            if model._meta.db_table not in existing:
+                editor.create_model(model)
+
+
+class UsageTestCase(TestCase):
+    """TestCase with the unmanaged usage tables available."""
+
+    @classmethod
+    def setUpClass(cls):
+        # Schema changes must happen before TestCase opens its class-wide transaction
+        create_unmanaged_tables()
+        super().setUpClass()
+
+    def add_usage(self, subscriber, product, day, count=1):
+        """Insert count usagereport rows for one subscriber, product and day."""
+        start = Usagereport.objects.count()
+        Usagereport.objects.bulk_create(
+            Usagereport(
+                SearchIdentity=f"S{start + i}", SubscriberName=subscriber,
+                ProductName=product, DetailsViewedDate=day,
+            )
+            for i in range(count)
+        )
+
+
+def expected_bill_counts(product_counts):
+    """Bill summary with each product's rows in its one bucket from PRODUCT_SPELLINGS."""
+    summary = empty_bill_summary()
+    for product_name, count in product_counts.items():
+        if PRODUCT_SPELLINGS[product_name]:
+            summary[PRODUCT_SPELLINGS[product_name]] += count
+    return summary
+
+
+class ProductClassifierTests(UsageTestCase):
+    """Every product spelling lands in exactly one bill bucket, in single and bulk reports alike."""
+
+    def test_classify_bill_bucket(self):
+        for product_name, bucket in PRODUCT_SPELLINGS.items():
+            with self.subTest(product_name=product_name):
+                self.assertEqual(classify_bill_bucket(product_name), bucket)
+                self.assertEqual(classify_bill_bucket(product_name.upper()), bucket)
+
+    def test_bills_per_product(self):
+        for i, product_name in enumerate(PRODUCT_SPELLINGS):
+            subscriber = f"Subscriber {i}"
+            self.add_usage(subscriber, product_name, date(2024, 5, 2), count=3)
+            queryset = Usagereport.objects.filter(SubscriberName=subscriber)
+            expected = expected_bill_counts({product_name: 3})
+            with self.subTest(product_name=product_name):
+                self.assertEqual(sum(expected.values()), 3 if PRODUCT_SPELLINGS[product_name] else 0)
+                self.assertEqual(summarise_bill_counts(queryset), expected)
+                self.assertEqual(summarise_product_counts({product_name: 3}), expected)
+
+    def test_bills_for_mixed_usage(self):
+        usage = {'Consumer Basic Trace': 4, 'Commercial Basic Trace': 2, 'Consumer Detailed Credit': 5,
+                 'Commercial detailed Credit': 7, 'X-Score Consumer Detailed Credit': 1}
+        for product_name, count in usage.items():
+            self.add_usage('Alpha Bank', product_name, date(2024, 5, 2), count=count)
+        queryset = Usagereport.objects.filter(SubscriberName='Alpha Bank')
+
+        expected = expected_bill_counts(usage)
+        self.assertEqual(
+            {bucket: count for bucket, count in expected.items() if count},
+            {'consumer_basic_trace': 4, 'commercial_basic_trace': 2, 'consumer_detailed_credit': 5,
+             'commercial_detailed_credit': 7, 'xscore_consumer_credit': 1}
+        )
+        self.assertEqual(summarise_bill_counts(queryset), expected)
+        self.assertEqual(summarise_product_counts(usage), expected)
+
+    def test_empty_summary_covers_every_bucket(self):
+        self.assertEqual(summarise_bill_counts(Usagereport.objects.none()), empty_bill_summary())
+        self.assertEqual(sorted(empty_bill_summary()), sorted(BILL_BUCKETS))
+
+
+def write_report_template(media_root):
+    """Save a minimal Templateuse.xlsx (title rows, bill summary rows 12-30, product header) under media_root."""
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = 'Sheet1'
+    ws['H2'] = 'FirstCentral NIGERIA - BILLING DETAILS'
+    ws.merge_cells('H2:P2')
+    ws['B6'] = 'REPORT GENERATED FOR RECORDS BETWEEN'
+    ws.merge_cells('B6:Q6')
+    for row in range(12, 31):
+        ws.cell(row, 2, f"Bill line {row}")
+    ws['D32'] = 'Product Name'
+    ws.cell(35, 2, 'S/N')
+    wb.create_sheet('Sheet2')
+    wb.save(f"{media_root}/Templateuse.xlsx")
+
+
+class ReportWorkbookBillTests(UsageTestCase):
+    """Bill summary written by build_report_workbook for a fixture subscriber."""
+
+    USAGE = {'Consumer Basic Trace': 4, 'Commercial Basic Trace': 2, 'Consumer Detailed Credit': 5,
+             'Commercial detailed Credit': 7, 'X-Score Consumer Detailed Credit': 1}
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        write_report_template(self.media_root)
+        for product_name, count in self.USAGE.items():
+            self.add_usage('Alpha Bank', product_name, date(2024, 5, 2), count=count)
+        self.add_usage('Beta Bank', 'Commercial Basic Trace', date(2024, 5, 2), count=9)
+        SubscriberProductRate.objects.create(
+            subscriber_name='Alpha Bank', product_name='Commercial Basic Trace', rate=Decimal('300.00')
+        )
+
+    def build_bill_sheet(self, summary_bills):
+        target = io.BytesIO()
+        with override_settings(MEDIA_ROOT=self.media_root):
+            build_report_workbook(
+                target, 'Alpha Bank', date(2024, 5, 1), date(2024, 5, 31), summary_bills,
+                {}, include_bills=True, include_products=False, username='tester',
+            )
+        target.seek(0)
+        return openpyxl.load_workbook(target).active
+
+    def test_bill_summary_matches_fixture(self):
+        queryset = Usagereport.objects.filter(SubscriberName='Alpha Bank')
+        ws = self.build_bill_sheet(summarise_bill_counts(queryset))
+
+        quantities = {row: ws.cell(row, 9).value for row in (13, 15, 16, 17, 18)}
+        self.assertEqual(quantities, {13: 4, 15: 5, 16: 1, 17: 2, 18: 7})
+        self.assertEqual(ws['M17'].value, '₦300.00')
+        self.assertEqual(ws['P13'].value, '₦680.00')
+        self.assertEqual(ws['P17'].value, '₦600.00')
+        self.assertEqual(ws['P18'].value, '₦3,500.00')
+        self.assertEqual(ws['P28'].value, '₦6,480.00')
+        self.assertEqual(ws['P29'].value, '₦486.00')
+        self.assertEqual(ws['P30'].value, '₦6,966.00')
+        self.assertIn('Alpha Bank', ws['H2'].value)
+        self.assertEqual(ws['B6'].value, 'REPORT GENERATED FOR RECORDS BETWEEN 01/05/2024 and 31/05/2024')
+        self.assertEqual(ws['O32'].value, 'Report Generated by: tester')
+
+    def test_single_and_bulk_bills_match(self):
+        queryset = Usagereport.objects.filter(SubscriberName='Alpha Bank')
+        single = self.build_bill_sheet(summarise_bill_counts(queryset))
+        bulk = self.build_bill_sheet(summarise_product_counts(self.USAGE))
+        for row in range(12, 31):
+            with self.subTest(row=row):
+                self.assertEqual(single.cell(row, 9).value, bulk.cell(row, 9).value)
+                self.assertEqual(single.cell(row, 16).value, bulk.cell(row, 16).value)
+
+
+class DashboardSliceTests(UsageTestCase):
+    """DashboardSlice metrics against the usagereport queries they replaced."""
+
+    SUBSCRIBERS = ['Alpha Bank', 'Beta Bank', 'Gamma Finance', 'Delta Loans']
+    PRODUCTS = ['Consumer Basic Trace', 'Commercial Basic Trace', 'Consumer Snap Check', 'Enquiry Report']
+
+    def setUp(self):
+        dashboard_cache().clear()
+        # Usage from March to May with a different volume per subscriber, product and day
+        day = date(2024, 3, 1)
+        while day <= date(2024, 5, 20):
+            for i, subscriber in enumerate(self.SUBSCRIBERS):
+                if (day.toordinal() + i) % (i + 2):
+                    continue
+                for j, product in enumerate(self.PRODUCTS[:i + 1]):
+                    self.add_usage(subscriber, product, day, count=(day.day + i + j) % 4 + 1)
+            day += timedelta(days=1)
+        refresh_aggregates()
+        self.usage = DashboardSlice.load(date(2024, 1, 1), date(2024, 5, 31))
+
+    def usage_in(self, start_date, end_date, subscriber=None):
+        queryset = Usagereport.objects.filter(DetailsViewedDate__range=[start_date, end_date])
+        if subscriber:
+            queryset = queryset.filter(SubscriberName=subscriber)
+        return queryset
+
+    def assert_metrics_match(self, start_date, end_date):
+        usage = self.usage
+        queryset = self.usage_in(start_date, end_date)
+        self.assertEqual(usage.total_usage(start_date, end_date), queryset.count())
+        self.assertEqual(
+            usage.total_subscribers(start_date, end_date),
+            queryset.values('SubscriberName').distinct().count()
+        )
+        self.assertEqual(
+            {row['SubscriberName']: row['usage_count'] for row in usage.top_subscribers(start_date, end_date)},
+            dict(queryset.values('SubscriberName').annotate(usage_count=Count('SearchIdentity')).values_list(
+                'SubscriberName', 'usage_count'
+            ))
+        )
+        self.assertEqual(
+            {row['ProductName']: row['frequency'] for row in usage.top_products(start_date, end_date, 'trace')},
+            dict(queryset.filter(ProductName__icontains='trace').values('ProductName').annotate(
+                frequency=Count('SearchIdentity')
+            ).values_list('ProductName', 'frequency'))
+        )
+        self.assertEqual(
+            sorted(usage.usage_counts(start_date, end_date)),
+            sorted(queryset.values('SubscriberName', 'ProductName').annotate(
+                usage_count=Count('SearchIdentity')
+            ).values_list('SubscriberName', 'ProductName', 'usage_count'))
+        )
+        self.assertEqual(
+            [(row['date'], row['count']) for row in usage.usage_trends(start_date, end_date)],
+            list(queryset.values('DetailsViewedDate').annotate(count=Count('SearchIdentity')).values_list(
+                'DetailsViewedDate', 'count'
+            ).order_by('DetailsViewedDate'))
+        )
+        for subscriber in self.SUBSCRIBERS:
+            with self.subTest(subscriber=subscriber):
+                self.assertEqual(
+                    usage.total_usage(start_date, end_date, subscriber),
+                    self.usage_in(start_date, end_date, subscriber).count()
+                )
+                self.assertEqual(
+                    {row['product']: row['count'] for row in usage.subscriber_top_products(start_date, end_date, subscriber)},
+                    dict(self.usage_in(start_date, end_date, subscriber).values('ProductName').annotate(
+                        usage_count=Count('ProductName')
+                    ).values_list('ProductName', 'usage_count'))
+                )
+
+    def test_metrics_match_usagereport_queries(self):
+        for start_date, end_date in [(date(2024, 3, 1), date(2024, 3, 31)),
+                                     (date(2024, 4, 10), date(2024, 5, 20)),
+                                     (date(2024, 1, 1), date(2024, 5, 31))]:
+            with self.subTest(start_date=start_date, end_date=end_date):
+                self.assert_metrics_match(start_date, end_date)
+
+    def test_retention_matches_usagereport_queries(self):
+        start_date, end_date = date(2024, 5, 1), date(2024, 5, 20)
+        previous_start = start_date - timedelta(days=(end_date - start_date).days)
+        previous = set(self.usage_in(previous_start, start_date).values_list('SubscriberName', flat=True))
+        current = set(self.usage_in(start_date, end_date).values_list('SubscriberName', flat=True))
+
+        retention = self.usage.retention(start_date, end_date)
+        self.assertEqual(retention['previous_count'], len(previous))
+        self.assertEqual(retention['retained_count'], len(previous & current))
+
+    def test_cached_closed_months_match_a_fresh_load(self):
+        cached = DashboardSlice.load(date(2024, 1, 1), date(2024, 5, 31))
+        self.assertEqual(
+            sorted(cached.usage_counts(date(2024, 1, 1), date(2024, 5, 31))),
+            sorted(self.usage.usage_counts(date(2024, 1, 1), date(2024, 5, 31)))
+        )
+
+
+class UsageRollupRefreshTests(UsageTestCase):
+    """Incremental rollup refreshes after usage rows arrive late."""
+
+    def setUp(self):
+        dashboard_cache().clear()
+        for day in range(1, 21):
+            self.add_usage('Alpha Bank', 'Consumer Basic Trace', date(2024, 4, day), count=2)
+        refresh_aggregates()
+
+    def assert_rollup_matches_usage(self):
+        self.assertEqual(
+            sorted(UsageDailyRollup.objects.values_list('date', 'subscriber_name', 'product_name', 'usage_count')),
+            sorted(Usagereport.objects.values('DetailsViewedDate', 'SubscriberName', 'ProductName').annotate(
+                usage_count=Count('SearchIdentity')
+            ).values_list('DetailsViewedDate', 'SubscriberName', 'ProductName', 'usage_count'))
+        )
+
+    def test_late_rows_inside_window_are_picked_up(self):
+        self.add_usage('Alpha Bank', 'Consumer Basic Trace', date(2024, 4, 19), count=3)
+        self.add_usage('Beta Bank', 'Enquiry Report', date(2024, 4, 18))
+        self.add_usage('Beta Bank', 'Enquiry Report', date(2024, 4, 22))
+
+        results = refresh_aggregates(names=['usage_daily_rollup'], late_days=3)
+        self.assertEqual(results[0]['start_date'], date(2024, 4, 17))
+        self.assert_rollup_matches_usage()
+        self.assertEqual(
+            AggregateWatermark.objects.get(name='usage_daily_rollup').high_water_date, date(2024, 4, 22)
+        )
+
+    def test_late_rows_before_window_need_a_rebuild(self):
+        self.add_usage('Alpha Bank', 'Consumer Basic Trace', date(2024, 4, 2), count=5)
+        refresh_aggregates(names=['usage_daily_rollup'], late_days=3)
+        self.assertEqual(UsageDailyRollup.objects.get(date=date(2024, 4, 2)).usage_count, 2)
+
+        refresh_usage_rollup(date(2024, 4, 1), date(2024, 4, 30))
+        self.assert_rollup_matches_usage()
+
+    def test_rebuild_reaches_cached_closed_months(self):
+        # March is closed once the watermark is past the late-arrival window
+        self.add_usage('Alpha Bank', 'Consumer Basic Trace', date(2024, 3, 10), count=1)
+        refresh_aggregates(full=True)
+        before = DashboardSlice.load(date(2024, 3, 1), date(2024, 3, 31)).total_usage(date(2024, 3, 1), date(2024, 3, 31))
+
+        self.add_usage('Alpha Bank', 'Consumer Basic Trace', date(2024, 3, 10), count=4)
+        refresh_usage_rollup(date(2024, 3, 1), date(2024, 3, 31))
+        after = DashboardSlice.load(date(2024, 3, 1), date(2024, 3, 31)).total_usage(date(2024, 3, 1), date(2024, 3, 31))
+        self.assertEqual((before, after), (1, 5))
+
+
+class SubscriberFirstSeenTests(UsageTestCase):
+    """SubscriberFirstSeen kept equal to Min(DetailsViewedDate) as late rows arrive."""
+
+    def setUp(self):
+        self.add_usage('Alpha Bank', 'Consumer Basic Trace', date(2024, 4, 10))
+        self.add_usage('Alpha Bank', 'Consumer Basic Trace', date(2024, 4, 20))
+        self.add_usage('Beta Bank', 'Enquiry Report', date(2024, 4, 18))
+        refresh_aggregates()
+
+    def assert_first_seen_matches_usage(self):
+        self.assertEqual(
+            dict(SubscriberFirstSeen.objects.values_list('subscriber_name', 'first_seen')),
+            dict(Usagereport.objects.values('SubscriberName').annotate(
+                first_usage=Min('DetailsViewedDate')
+            ).values_list('SubscriberName', 'first_usage'))
+        )
+
+    def test_late_rows_add_and_move_back_subscribers(self):
+        self.add_usage('Gamma Finance', 'Consumer Snap Check', date(2024, 4, 19))
+        self.add_usage('Beta Bank', 'Enquiry Report', date(2024, 4, 17))
+        refresh_aggregates(names=['subscriber_first_seen'], late_days=3)
+        self.assert_first_seen_matches_usage()
+        self.assertEqual(SubscriberFirstSeen.objects.get(subscriber_name='Beta Bank').first_seen, date(2024, 4, 17))
+
+    def test_backfilled_history_moves_first_seen_back(self):
+        self.add_usage('Alpha Bank', 'Consumer Basic Trace', date(2024, 2, 1))
+        refresh_subscriber_first_seen(date(2024, 2, 1), date(2024, 2, 29))
+        self.assert_first_seen_matches_usage()
+
+    def test_removed_rows_are_looked_up_again(self):
+        Usagereport.objects.filter(SubscriberName='Beta Bank').delete()
+        self.add_usage('Beta Bank', 'Enquiry Report', date(2024, 3, 5))
+        refresh_aggregates(names=['subscriber_first_seen'], late_days=3)
+        self.assertEqual(SubscriberFirstSeen.objects.get(subscriber_name='Beta Bank').first_seen, date(2024, 3, 5))
+
+        Usagereport.objects.filter(SubscriberName='Beta Bank').delete()
+        refresh_subscriber_first_seen(date(2024, 3, 1), date(2024, 3, 31))
+        self.assert_first_seen_matches_usage()
+        self.assertFalse(SubscriberFirstSeen.objects.filter(subscriber_name='Beta Bank').exists())
+
+
+# Dashboard cache as in settings, with in-memory tiers; 'unreachable' has a missing shared tier
+TIERED_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'default'},
+    'dashboard': {
+        'BACKEND': 'bulkrep.cache_backends.TieredCache',
+        'LOCATION': 'dashboard-tests',
+        'TIMEOUT': 300,
+        'OPTIONS': {'SHARED_CACHE': 'dashboard_shared', 'MAX_ENTRIES': 3, 'LOCAL_TIMEOUT': 60},
+    },
+    'dashboard_shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'shared'},
+    'unreachable': {
+        'BACKEND': 'bulkrep.cache_backends.TieredCache',
+        'LOCATION': 'unreachable-tests',
+        'OPTIONS': {'SHARED_CACHE': 'missing_table'},
+    },
+    'missing_table': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'missing_cache_table'},
+}
+
+
+@override_settings(CACHES=TIERED_CACHES)
+class TieredCacheTests(TestCase):
+    """TieredCache reads, writes, add and expiry across its two tiers."""
+
+    def setUp(self):
+        self.cache = caches['dashboard']
+        self.shared = caches['dashboard_shared']
+        self.cache.clear()
+
+    def other_process(self):
+        """A TieredCache over the same shared tier with an empty process memory."""
+        return TieredCache('dashboard-tests-other', TIERED_CACHES['dashboard'])
+
+    def test_set_writes_both_tiers(self):
+        self.cache.set('metric', {'total': 5})
+        self.assertEqual(self.cache.get('metric'), {'total': 5})
+        self.assertEqual(self.shared.get('metric').value, {'total': 5})
+        self.assertEqual(self.other_process().get('metric'), {'total': 5})
+
+    def test_get_falls_back_to_shared_tier(self):
+        self.shared.set('metric', 7)
+        self.assertEqual(self.cache.get('metric'), 7)
+        self.shared.delete('metric')
+        # Copied into process memory on the first read
+        self.assertEqual(self.cache.get('metric'), 7)
+        self.assertIsNone(self.cache.get('missing'))
+        self.assertEqual(self.cache.get('missing', 'default'), 'default')
+
+    def test_get_many_combines_tiers(self):
+        self.cache.set('a', 1)
+        self.shared.set('b', 2)
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']), {'a': 1, 'b': 2})
+
+    def test_local_copies_are_independent(self):
+        value = {'rows': [1, 2]}
+        self.cache.set('metric', value)
+        self.cache.get('metric')['rows'].append(3)
+        self.assertEqual(self.cache.get('metric'), value)
+
+    def test_add_only_when_missing_in_either_tier(self):
+        self.assertTrue(self.cache.add('lock', 1))
+        self.assertFalse(self.cache.add('lock', 2))
+        self.assertFalse(self.other_process().add('lock', 3))
+        self.assertEqual(self.shared.get('lock').value, 1)
+
+        self.shared.set('remote', 1)
+        self.assertFalse(self.cache.add('remote', 2))
+        self.assertIsNone(self.cache._local_get(self.cache.make_key('remote')))
+
+    def test_local_copies_expire(self):
+        now = 1_000_000.0
+        with mock.patch('time.time', return_value=now):
+            self.cache.set('short', 1, timeout=10)
+            self.cache.set('long', 2, timeout=600)
+            self.shared.delete('long')
+        with mock.patch('time.time', return_value=now + 11):
+            # Past its own timeout in both tiers
+            self.assertIsNone(self.cache.get('short'))
+            self.assertEqual(self.cache.get('long'), 2)
+        with mock.patch('time.time', return_value=now + 61):
+            # Past LOCAL_TIMEOUT: the local copy goes and the shared tier no longer has it
+            self.assertIsNone(self.cache.get('long'))
+
+    def test_copies_from_shared_tier_keep_their_expiry(self):
+        now = 1_000_000.0
+        with mock.patch('time.time', return_value=now):
+            self.other_process().set_many({'version': 'v1', 'memo': 'm1'}, timeout=10)
+        with mock.patch('time.time', return_value=now + 5):
+            self.assertEqual(self.cache.get('version'), 'v1')
+            self.assertEqual(self.cache.get_many(['memo']), {'memo': 'm1'})
+            self.shared.delete_many(['version', 'memo'])
+        with mock.patch('time.time', return_value=now + 9):
+            # Served from process memory
+            self.assertEqual(self.cache.get_many(['version', 'memo']), {'version': 'v1', 'memo': 'm1'})
+        with mock.patch('time.time', return_value=now + 11):
+            # Gone locally when the shared entry expired, not LOCAL_TIMEOUT after the read
+            self.assertEqual(self.cache.get_many(['version', 'memo']), {})
+
+    def test_local_tier_is_bounded(self):
+        for key in ('a', 'b', 'c', 'd'):
+            self.cache.set(key, key)
+        self.shared.clear()
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(self.cache.get_many(['b', 'c', 'd']), {'b': 'b', 'c': 'c', 'd': 'd'})
+
+    def test_delete_and_clear(self):
+        self.cache.set('metric', 1)
+        self.assertTrue(self.cache.delete('metric'))
+        self.assertIsNone(self.cache.get('metric'))
+        self.cache.set('metric', 1)
+        self.cache.clear()
+        self.assertFalse(self.cache.has_key('metric'))
+
+    def test_unreachable_shared_tier_is_a_miss(self):
+        cache = caches['unreachable']
+        with self.assertLogs('bulkrep.cache_backends', 'ERROR'):
+            self.assertIsNone(cache.get('unreachable-metric'))
+        with self.assertLogs('bulkrep.cache_backends', 'ERROR'):
+            cache.set('unreachable-metric', 1)
+        # Still served from process memory
+        self.assertEqual(cache.get('unreachable-metric'), 1)
+
+
+@override_settings(CACHES=TIERED_CACHES)
+class ClosedMonthCacheTests(UsageTestCase):
+    """Closed-month usage lives in the shared tier of the dashboard cache only."""
+
+    def setUp(self):
+        caches['dashboard'].clear()
+        for day in (date(2024, 3, 5), date(2024, 4, 5), date(2024, 5, 5), date(2024, 5, 20)):
+            self.add_usage('Alpha Bank', 'Consumer Basic Trace', day, count=2)
+        refresh_aggregates()
+
+    def test_closed_months_skip_the_local_tier(self):
+        usage = DashboardSlice.load(date(2024, 3, 1), date(2024, 5, 31))
+        self.assertEqual(usage.total_usage(date(2024, 3, 1), date(2024, 5, 31)), 8)
+
+        dashboard = caches['dashboard']
+        for month in (date(2024, 3, 1), date(2024, 4, 1)):
+            key = month_cache_key(month)
+            self.assertEqual(len(caches['dashboard_shared'].get(key)), 1)
+            self.assertIsNone(dashboard._local_get(dashboard.make_key(key)))
+        # May is still open
+        self.assertIsNone(caches['dashboard_shared'].get(month_cache_key(date(2024, 5, 1))))
+
+    def test_rebuild_drops_cached_months(self):
+        DashboardSlice.load(date(2024, 3, 1), date(2024, 5, 31))
+        self.add_usage('Alpha Bank', 'Enquiry Report', date(2024, 3, 6))
+        refresh_usage_rollup(date(2024, 3, 1), date(2024, 3, 31))
+
+        self.assertIsNone(caches['dashboard_shared'].get(month_cache_key(date(2024, 3, 1))))
+        usage = DashboardSlice.load(date(2024, 3, 1), date(2024, 3, 31))
+        self.assertEqual(usage.total_usage(date(2024, 3, 1), date(2024, 3, 31)), 3)
+
+
+@override_settings(CACHES=TIERED_CACHES, DASHBOARD_METRIC_WORKERS=0)
+class ConditionalDashboardTests(UsageTestCase):
+    """Data version ETags and 304 responses of the dashboard JSON endpoints."""
+
+    def setUp(self):
+        caches['dashboard'].clear()
+        self.user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        today = date.today()
+        for days_back in range(1, 40, 3):
+            self.add_usage('Alpha Bank', 'Consumer Basic Trace', today - timedelta(days=days_back), count=2)
+        refresh_aggregates()
+        self.factory = RequestFactory()
+
+    def get(self, view, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        request = self.factory.get('/api/dashboard/', **headers)
+        request.user = self.user
+        return view(request)
+
+    def test_not_modified_response(self):
+        version = 'abc123'
+        etag = data_version_etag(version)
+        response = not_modified_response(self.factory.get('/', HTTP_IF_NONE_MATCH=etag), version)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(not_modified_response(self.factory.get('/', HTTP_IF_NONE_MATCH='*'), version).status_code, 304)
+
+        self.assertIsNone(not_modified_response(self.factory.get('/', HTTP_IF_NONE_MATCH='"other"'), version))
+        self.assertIsNone(not_modified_response(self.factory.get('/'), version))
+        self.assertIsNone(not_modified_response(self.factory.get('/', HTTP_IF_NONE_MATCH=etag), None))
+
+    def test_dashboard_api_answers_304_without_computing(self):
+        response = self.get(dashboard_api)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertEqual(etag, data_version_etag(data_version()))
+
+        with mock.patch('bulkrep.views.compute_dashboard_metrics') as compute:
+            response = self.get(dashboard_api, etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        compute.assert_not_called()
+
+        self.assertEqual(self.get(dashboard_api, '"outdated"').status_code, 200)
+
+    def test_data_version_is_memoized(self):
+        version = data_version()
+        SubscriberProductRate.objects.create(
+            subscriber_name='Alpha Bank', product_name='Consumer Basic Trace', rate=Decimal('100.00')
+        )
+        with mock.patch('bulkrep.data_version.read_data_version') as read:
+            self.assertEqual(data_version(), version)
+        read.assert_not_called()
+
+        fresh = data_version(cached=False)
+        self.assertNotEqual(fresh, version)
+        self.assertEqual(data_version(), fresh)
+
+    def test_version_follows_aggregates_not_raw_usage(self):
+        version = read_data_version()
+        self.add_usage('Alpha Bank', 'Enquiry Report', date.today())
+        self.assertEqual(read_data_version(), version)
+
+        refresh_aggregates()
+        self.assertNotEqual(read_data_version(), version)
+
+
+class MetricPoolTests(TestCase):
+    """run_metrics on the process-wide metric pool."""
+
+    def setUp(self):
+        # A pool sized by the test's settings, shut down afterwards
+        patcher = mock.patch.object(metric_pool, '_executor', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(lambda: metric_pool._executor and metric_pool._executor.shutdown(wait=True))
+
+    @override_settings(DASHBOARD_METRIC_WORKERS=2)
+    def test_requests_share_one_pool(self):
+        results, timed_out = metric_pool.run_metrics({'a': (abs, (-1,)), 'b': (max, (2, 3))})
+        self.assertEqual((results, timed_out), ({'a': 1, 'b': 3}, []))
+        executor = metric_pool.metric_executor()
+        metric_pool.run_metrics({'c': (abs, (-2,))})
+        self.assertIs(metric_pool.metric_executor(), executor)
+        self.assertEqual(executor._max_workers, 2)
+
+    @override_settings(DASHBOARD_METRIC_WORKERS=1)
+    def test_timeout_cancels_queued_metrics(self):
+        release = threading.Event()
+        started = []
+
+        def slow():
+            started.append('slow')
+            release.wait(5)
+            return 'slow'
+
+        def queued():
+            started.append('queued')
+            return 'queued'
+
+        results, timed_out = metric_pool.run_metrics({'slow': (slow, ()), 'queued': (queued, ())}, timeout=0.2)
+        release.set()
+        metric_pool.metric_executor().submit(int).result(5)
+
+        self.assertEqual(results, {})
+        self.assertEqual(sorted(timed_out), ['queued', 'slow'])
+        self.assertEqual(started, ['slow'])
+
+    @override_settings(DASHBOARD_METRIC_WORKERS=1)
+    def test_budget_starts_when_a_metric_runs(self):
+        # 'second' waits for 'first' and finishes after 0.6s, within 0.5s of its own start
+        metrics = {'first': (time.sleep, (0.3,)), 'second': (time.sleep, (0.3,))}
+        results, timed_out = metric_pool.run_metrics(metrics, timeout=0.5)
+        self.assertEqual((results, timed_out), ({'first': None, 'second': None}, []))
+
+    @override_settings(DASHBOARD_METRIC_WORKERS=2)
+    def test_failing_metric_is_reported_missing(self):
+        with self.assertLogs('bulkrep.metric_pool', 'ERROR'):
+            results, missing = metric_pool.run_metrics({'ok': (abs, (-1,)), 'bad': (int, ('x',))})
+        self.assertEqual((results, missing), ({'ok': 1}, ['bad']))
+
+    @override_settings(DASHBOARD_METRIC_WORKERS=0)
+    def test_failing_metric_without_pool_is_reported_missing(self):
+        with self.assertLogs('bulkrep.metric_pool', 'ERROR'):
+            results, missing = metric_pool.run_metrics({'bad': (int, ('x',)), 'ok': (abs, (-1,))})
+        self.assertEqual((results, missing), ({'ok': 1}, ['bad']))
+
+    @override_settings(DASHBOARD_METRIC_WORKERS=0)
+    def test_disabled_pool_runs_in_turn(self):
+        results, timed_out = metric_pool.run_metrics({'a': (abs, (-1,))}, timeout=0)
+        self.assertEqual((results, timed_out), ({'a': 1}, []))
+        self.assertIsNone(metric_pool._executor)
+
+
+def job_pid(delay):
+    """run_ordered job: the id of the process that ran it."""
+    time.sleep(delay)
+    return os.getpid()
+
+
+def run_ordered_in_daemon(results):
+    """Body of a daemonic process: its own pid and the outcome of every run_ordered job."""
+    outcomes = report_pool.run_ordered(job_pid, [{'delay': 0.2}] * 6, workers=3)
+    results.put((os.getpid(), [(result, error) for _, result, error in outcomes]))
+
+
+class ReportPoolTests(TestCase):
+    """run_ordered fan-out for bulk reports."""
+
+    def test_daemonic_process_uses_worker_processes(self):
+        # Celery prefork workers are daemonic; the stdlib pool cannot start children there
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        process = context.Process(target=run_ordered_in_daemon, args=(results,), daemon=True)
+        process.start()
+        daemon_pid, outcomes = results.get(timeout=30)
+        process.join(10)
+
+        self.assertEqual([error for _, error in outcomes], [None] * 6)
+        worker_pids = {pid for pid, _ in outcomes}
+        self.assertGreater(len(worker_pids), 1)
+        self.assertNotIn(daemon_pid, worker_pids)
+
+
+class ReportJobQueueCheckTests(TestCase):
+    """System checks on the Celery report job configuration."""
+
+    def check_ids(self):
+        return [message.id for message in check_report_job_queue(None)]
+
+    @override_settings(DEBUG=False, CELERY_TASK_ALWAYS_EAGER=True, CELERY_BROKER_URL='memory://')
+    def test_eager_jobs_outside_debug_warn(self):
+        self.assertEqual(self.check_ids(), ['bulkrep.W001'])
+
+    @override_settings(DEBUG=True, CELERY_TASK_ALWAYS_EAGER=True, CELERY_BROKER_URL='memory://')
+    def test_eager_jobs_in_debug_pass(self):
+        self.assertEqual(self.check_ids(), [])
+
+    @override_settings(DEBUG=False, CELERY_TASK_ALWAYS_EAGER=False, CELERY_BROKER_URL='memory://')
+    def test_queued_jobs_need_a_shared_broker(self):
+        self.assertEqual(self.check_ids(), ['bulkrep.E001'])
+
+    @override_settings(DEBUG=False, CELERY_TASK_ALWAYS_EAGER=False, CELERY_BROKER_URL='redis://localhost:6379/0')
+    def test_queued_jobs_with_redis_pass(self):
+        self.assertEqual(self.check_ids(), [])
@@ -8,6 +8,7 @@ urlpatterns = [
     path('', views.home, name='home'),
     path('single-report/', views.single_report, name='single_report'),
     path('bulk-report/', views.bulk_report, name='bulk_report'),
+    path('report-status/<int:report_id>/', views.report_status, name='report_status'),
     path('dashboard/', views.dashboard, name='dashboard'),
     path('dashboard-api/', views.dashboard_api, name='dashboard_api'),
     path('download-churned-subscribers/', views.download_churned_subscribers, name='download_churned_subscribers'),
@@ -0,0 +1,64 @@
+# Streaming fetch of usage rows for bulk reports
+# A month of usage (including the large SearchOutput text) for every selected
+# subscriber is too much to hold in one Python list. Rows are read in chunks
+# ordered by (SubscriberName, ProductName, DetailsViewedDate), so each
+# subscriber's rows arrive together and are handed on as soon as the next
+# subscriber starts, as a columnar UsageBatch. Resident rows are bounded by the
+# largest subscriber rather than the whole month.
+
+import logging
+
+from django.conf import settings
+
+from .models import Usagereport
+from .usage_batch import USAGE_FIELDS, UsageBatch
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched from the database cursor at a time (REPORT_USAGE_CHUNK_SIZE in settings)
+DEFAULT_USAGE_CHUNK_SIZE = 2000
+
+
+def usage_chunk_size():
+    """Number of usage rows fetched per database round trip."""
+    return max(1, getattr(settings, 'REPORT_USAGE_CHUNK_SIZE', DEFAULT_USAGE_CHUNK_SIZE))
+
+
+def iter_subscriber_usage(subscribers, start_date, end_date, chunk_size=None):
+    """
+    Stream usage rows for the period grouped by subscriber.
+
+    Args:
+        subscribers: Subscriber names to include
+        start_date: First DetailsViewedDate (inclusive)
+        end_date: Last DetailsViewedDate (inclusive)
+        chunk_size: Rows per fetch; defaults to usage_chunk_size()
+
+    Yields:
+        (subscriber_name, UsageBatch) for every subscriber with usage in the
+        period, in SubscriberName order. Batch rows are ordered by ProductName
+        then DetailsViewedDate.
+    """
+    queryset = Usagereport.objects.filter(
+        DetailsViewedDate__gte=start_date,
+        DetailsViewedDate__lte=end_date,
+        SubscriberName__in=list(subscribers)
+    ).order_by(
+        'SubscriberName', 'ProductName', 'DetailsViewedDate', 'SearchIdentity'
+    ).values_list(*USAGE_FIELDS)
+
+    # Rows arrive as tuples and are converted to columns once per subscriber
+    name_position = USAGE_FIELDS.index('SubscriberName')
+    current_name = None
+    current_rows = []
+    for row in queryset.iterator(chunk_size=chunk_size or usage_chunk_size()):
+        subscriber_name = row[name_position]
+        if subscriber_name != current_name:
+            if current_rows:
+                yield current_name, UsageBatch.from_rows(current_rows)
+            current_name = subscriber_name
+            current_rows = []
+        current_rows.append(row)
+
+    if current_rows:
+        yield current_name, UsageBatch.from_rows(current_rows)
@@ -2,16 +2,35 @@ from collections import defaultdict
 from django.shortcuts import render
 from django.contrib import messages
 from django.http import HttpResponse, FileResponse, JsonResponse
-from django.db.models import Q, Count, Case, When, IntegerField, Sum, Min
+from django.db.models import Q, Count, Case, When, IntegerField, Sum, Min, F
 from django.conf import settings
 from django.utils import timezone
 from django.shortcuts import render
-from .models import Usagereport, ReportGeneration, ENQUIRY_RATES, SubscriberProductRate
+from .models import Usagereport, ReportGeneration, ENQUIRY_RATES, SubscriberProductRate, UsageDailyRollup, SubscriberFirstSeen
+from .product_classifier import (
+    match_rate_key, match_rate_key_for_filter, rate_key_variations, rate_keys_for_product,
+    summarise_bill_counts, summarise_product_counts,
+)
+from .rates import RateBook
+from .merged_ranges import apply_merge_plans, get_merged_index, is_anchor, merge_range, plan_merge, unmerge_range
+from .row_stamp import RowStamp
+from .column_widths import get_width_tracker, track_column_widths
+from .streaming import StreamingReportWriter, find_product_name_cell, format_date_text, should_stream_report
+from .report_pool import bulk_worker_count, run_ordered
+from .dashboard_engine import DashboardSlice, daily_comparison_dates, price_usage_counts
+from .metric_pool import run_metrics
+from .dashboard_cache import cache_metrics, get_cached_metrics, lookup_metrics, refresh_metrics_in_background
+from .data_version import data_version, data_version_etag, not_modified_response
+from .usage_batch import UsageBatch
+from .usage_stream import iter_subscriber_usage
+from . import tasks
 from datetime import date, timedelta, datetime
 import calendar
 import io
 import os
 import re
+import shutil
+import tempfile
 import zipfile
 from copy import copy
 import openpyxl
@@ -24,8 +43,6 @@ from django.urls import reverse
 from django.contrib.auth.decorators import login_required,user_passes_test
 from decimal import Decimal, ROUND_HALF_UP
 import logging
-from django.core.cache import cache
-import hashlib
 from django.db.models import DateField
 from django.db.models.functions import Cast
 from django.db.models import Exists, OuterRef
@@ -45,9 +62,9 @@ def write_to_cell(ws, row, col, value):
     
     When using the direct cell assignment approach like in VBA, we need to 
     handle merged cells specially as they are read-only in openpyxl.
+    Only the non-anchor cells of a merged range are read-only, so the anchor
+    (top-left) cell is written in place without unmerging.
     """
-    coordinate = ws.cell(row=row, column=col).coordinate
-    is_merged = False
     merged_range_to_restore = None
     
     # Store the original cell style before unmerging
@@ -64,13 +81,11 @@ def write_to_cell(ws, row, col, value):
             except:
                 pass
     
-    # Check if the cell is in a merged range
-    for merged_range in list(ws.merged_cells.ranges):
-        if coordinate in merged_range:
-            is_merged = True
-            merged_range_to_restore = str(merged_range)
-            ws.unmerge_cells(merged_range_to_restore)
-            break
+    # Check if the cell is in a merged range using the worksheet's row index
+    merged_range = get_merged_index(ws).find(row, col)
+    if merged_range is not None and not is_anchor(merged_range, row, col):
+        merged_range_to_restore = merged_range
+        unmerge_range(ws, merged_range)
     
     # Now we can safely set the value
     target_cell = ws.cell(row=row, column=col)
@@ -82,8 +97,9 @@ def write_to_cell(ws, row, col, value):
         target_cell.number_format = original_number_format
     
     # Restore the merge if needed
-    if is_merged and merged_range_to_restore:
-        ws.merge_cells(merged_range_to_restore)
+    if merged_range_to_restore is not None:
+        merge_range(ws, merged_range_to_restore.min_row, merged_range_to_restore.min_col,
+                    merged_range_to_restore.max_row, merged_range_to_restore.max_col)
 
 # Function to safely populate direct assignments by checking for merged cells first
 def safe_cell_assignment(ws, row, col, value):
@@ -178,42 +194,24 @@ def single_report(request):
         include_bills = request.POST.get('include_bills') == 'on'
         include_products = request.POST.get('include_products') == 'on'
         
-        # Get subscriber name for tracking
-        subscriber_name = next((sub for sub in subscribers if sub == subscriber_id), None)
-        
-        # Create report generation record at the start
-        if subscriber_name:
-            report_gen = ReportGeneration.objects.create(
-                user=request.user,
-                generator=request.user.username,  # Add the generator field
-                report_type='single',
-                status='in_progress',
-                subscriber_name=subscriber_name,
-                from_date=start_date_str if start_date_str else None,
-                to_date=end_date_str if end_date_str else None
-            )
-            print(f"Started tracking single report generation for {subscriber_name} by {request.user.username}")
-        
-        if not subscriber_id:
-            messages.error(request, "Please select a subscriber.")
-            if report_gen:
-                report_gen.status = 'failed'
-                report_gen.error_message = 'No subscriber selected'
-                report_gen.save()
-            return render(request, 'bulkrep/single_report.html', context)
-            
-        # Continue with report generation...
-    
-    if request.method == 'POST':
-        subscriber_id = request.POST.get('subscriber_id')
-        start_date_str = request.POST.get('start_date')
-        end_date_str = request.POST.get('end_date')
-        include_bills = request.POST.get('include_bills') == 'on'
-        include_products = request.POST.get('include_products') == 'on'
-
         if not subscriber_id:
             messages.error(request, "Please select a subscriber.")
             return render(request, 'bulkrep/single_report.html', context)
+        
+        # Get subscriber name for tracking
+        subscriber_name = next((sub for sub in subscribers if sub == subscriber_id), None)
+        
+        # Create report generation record at the start; it is also the job record
+        report_gen = ReportGeneration.objects.create(
+            user=request.user,
+            generator=request.user.username,  # Add the generator field
+            report_type='single',
+            status='in_progress',
+            subscriber_name=subscriber_name or subscriber_id,
+            from_date=start_date_str if start_date_str else None,
+            to_date=end_date_str if end_date_str else None
+        )
+        print(f"Started tracking single report generation for {subscriber_id} by {request.user.username}")
 
         # Convert date strings to date objects - this is critical for display formatting later
         try:
@@ -221,969 +219,51 @@ def single_report(request):
             start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
             end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
             
-            # Format the dates for display in the report (DD/MM/YYYY)
-            start_date_display = start_date.strftime('%d/%m/%Y')
-            end_date_display = end_date.strftime('%d/%m/%Y')
-            
             # Log the date processing for debugging
-            print(f"Date processing: {start_date_str} -> {start_date} -> {start_date_display}")
-            print(f"Date processing: {end_date_str} -> {end_date} -> {end_date_display}")
+            print(f"Date processing: {start_date_str} -> {start_date} -> {start_date.strftime('%d/%m/%Y')}")
+            print(f"Date processing: {end_date_str} -> {end_date} -> {end_date.strftime('%d/%m/%Y')}")
         except (ValueError, TypeError) as e:
             messages.error(request, f"Invalid date format: {str(e)}")
+            report_gen.status = 'failed'
+            report_gen.error_message = f"Invalid date format: {str(e)}"[:500]
+            report_gen.save()
             return render(request, 'bulkrep/single_report.html', context)
 
-        # Fetch data using Django ORM
-        if include_bills:
-            # Query for summary bills using Django ORM
-            queryset = Usagereport.objects.filter(
-                DetailsViewedDate__gte=start_date,
-                DetailsViewedDate__lte=end_date,
-                SubscriberName=subscriber_id
-            )
-            
-            # Initialize summary dictionary with all possible keys
-            summary_bills = {
-                'consumer_snap_check': 0,
-                'consumer_basic_trace': 0,
-                'consumer_basic_credit': 0,
-                'consumer_detailed_credit': 0,
-                'xscore_consumer_credit': 0,
-                'commercial_basic_trace': 0,
-                'commercial_detailed_credit': 0,
-                'enquiry_report': 0,
-                'consumer_dud_cheque': 0,
-                'commercial_dud_cheque': 0,
-                'director_basic_report': 0,
-                'director_detailed_report': 0
-            }
-            
-            # Count each product type using Django ORM's Q objects for case-insensitive contains
-            summary_bills['consumer_snap_check'] = queryset.filter(ProductName__icontains='Snap Check').count()
-            summary_bills['consumer_basic_trace'] = queryset.filter(ProductName__icontains='Basic Trace').count()
-            summary_bills['consumer_basic_credit'] = queryset.filter(ProductName__icontains='Basic Credit').count()
-            summary_bills['consumer_detailed_credit'] = queryset.filter(ProductName__icontains='Detailed Credit').exclude(ProductName__icontains='X-SCore').count()
-            summary_bills['xscore_consumer_credit'] = queryset.filter(ProductName__icontains='X-SCore Consumer Detailed Credit').count()
-            summary_bills['commercial_basic_trace'] = queryset.filter(ProductName__icontains='Commercial Basic Trace').count()
-            summary_bills['commercial_detailed_credit'] = queryset.filter(ProductName__icontains='Commercial detailed Credit').count()
-            summary_bills['enquiry_report'] = queryset.filter(ProductName__icontains='Enquiry Report').count()
-            summary_bills['consumer_dud_cheque'] = queryset.filter(ProductName__icontains='Consumer Dud Cheque').count()
-            summary_bills['commercial_dud_cheque'] = queryset.filter(ProductName__icontains='Commercial Dud Cheque').count()
-            summary_bills['director_basic_report'] = queryset.filter(ProductName__icontains='Director Basic Report').count()
-            summary_bills['director_detailed_report'] = queryset.filter(ProductName__icontains='Director Detailed Report').count()
-        else:
-            summary_bills = {}
-
-        # Query for product details using Django ORM
-        if include_products:
-            product_data = Usagereport.objects.filter(
-                DetailsViewedDate__gte=start_date,
-                DetailsViewedDate__lte=end_date,
-                SubscriberName=subscriber_id
-            ).order_by('ProductName', 'DetailsViewedDate').values(
-                'SubscriberName', 'SystemUser', 'SearchIdentity', 'SubscriberEnquiryDate',
-                'SearchOutput', 'DetailsViewedDate', 'ProductInputed', 'ProductName'
-            )
-            
-            # Group by ProductName
-            product_sections = {}
-            for record in product_data:
-                product_name = record['ProductName']
-                if product_name not in product_sections:
-                    product_sections[product_name] = []
-                product_sections[product_name].append(record)
-            
-            product_data = list(product_data)  # Convert to list for compatibility
-        else:
-            product_sections = {}
-            product_data = []
-
-        if not product_data and include_products:
-            messages.warning(request, f"No data found for subscriber {subscriber_id} between {start_date_display} and {end_date_display}.")
-            return render(request, 'bulkrep/single_report.html', context)
-
-        # Generate Excel report
-        try:
-            template_path = os.path.join(settings.MEDIA_ROOT, 'Templateuse.xlsx')
-            buffer = io.BytesIO()
-            wb = openpyxl.load_workbook(template_path)
-            ws = wb.active
-        except Exception as e:
-            logger.error(f"Error loading Excel template: {str(e)}")
-            messages.error(request, f"Error loading Excel template: {str(e)}")
-            return render(request, 'bulkrep/single_report.html', context)
-        try:
-            # Look for "Productname" cell to identify where to put the dynamic product name
-            product_name_cell = None
-            for row in range(30, 35):  # Search rows 30-34
-                for col in range(1, 10):  # Search columns A-I
-                    cell_value = ws.cell(row=row, column=col).value
-                    if cell_value and "product" in str(cell_value).lower():
-                        try:
-                            product_name_cell = (row, col)
-                        except Exception as e:
-                            logger.error(f"Error finding product name cell: {str(e)}")
-                            messages.error(request, f"Error finding product name cell: {str(e)}")
-                            return render(request, 'bulkrep/single_report.html', context)
-                        break
-                if product_name_cell:
-                    break
-            
-            # Write subscriber info directly to cells using the safe method
-            # For row 2, which is merged from H to P, we need to set the value to the first cell in the merged range
-            # First, find the merged range that contains row 2
-            row2_merged_range = None
-            for merged_range in list(ws.merged_cells.ranges):
-                if merged_range.min_row == 2 and merged_range.max_row == 2:
-                    row2_merged_range = merged_range
-                    break
-            
-            # If we found a merged range for row 2, unmerge it, set the value with the required format, and remerge it
-            if row2_merged_range:
-                merged_range_str = str(row2_merged_range)
-                ws.unmerge_cells(merged_range_str)
-                # Set the value to the first cell in the merged range with the required format
-                original_cell = ws.cell(row=2, column=row2_merged_range.min_col)
-                new_content = f"FirstCentral NIGERIA - BILLING DETAILS - {subscriber_id}"
-                original_cell.value = new_content
-                
-                # Remerge the cells
-                ws.merge_cells(merged_range_str)
-            else:
-                # Fallback to the original method if no merged range is found
-                safe_cell_assignment(ws, 2, 5, subscriber_id)  # E2
-            
-            safe_cell_assignment(ws, 5, 4, f"BILLING DETAILS - {subscriber_id}")  # D5
-            
-            # For row 6, which is merged from B to Q, we need to set the value to the first cell in the merged range
-            # First, find the merged range that contains row 6
-            row6_merged_range = None
-            for merged_range in list(ws.merged_cells.ranges):
-                if merged_range.min_row == 6 and merged_range.max_row == 6:
-                    row6_merged_range = merged_range
-                    break
-            
-            # If we found a merged range for row 6, unmerge it, set the value, and remerge it
-            date_range_text = f"REPORT GENERATED FOR RECORDS BETWEEN {start_date_display} and {end_date_display}"
-            if row6_merged_range:
-                merged_range_str = str(row6_merged_range)
-                ws.unmerge_cells(merged_range_str)
-                # Set the value to the first cell in the merged range (column B = 2)
-                ws.cell(row=6, column=2).value = date_range_text
-                # Remerge the cells
-                ws.merge_cells(merged_range_str)
-            else:
-                # Fallback to the original method if no merged range is found
-                safe_cell_assignment(ws, 6, 4, date_range_text)  # D6
-                
-               
-            
-            if include_bills:
-                # Set quantities in column I (existing code)
-                safe_cell_assignment(ws, 12, 9, summary_bills.get('consumer_snap_check', 0) or 0)  # I12
-                safe_cell_assignment(ws, 13, 9, summary_bills.get('consumer_basic_trace', 0) or 0)  # I13
-                safe_cell_assignment(ws, 14, 9, summary_bills.get('consumer_basic_credit', 0) or 0)  # I14
-                safe_cell_assignment(ws, 15, 9, summary_bills.get('consumer_detailed_credit', 0) or 0)  # I15
-                safe_cell_assignment(ws, 16, 9, summary_bills.get('xscore_consumer_credit', 0) or 0)  # I16
-                safe_cell_assignment(ws, 17, 9, summary_bills.get('commercial_basic_trace', 0) or 0)  # I17
-                safe_cell_assignment(ws, 18, 9, summary_bills.get('commercial_detailed_credit', 0) or 0)  # I18
-                safe_cell_assignment(ws, 20, 9, summary_bills.get('enquiry_report', 0) or 0)  # I20
-                safe_cell_assignment(ws, 22, 9, summary_bills.get('consumer_dud_cheque', 0) or 0)  # I22
-                safe_cell_assignment(ws, 23, 9, summary_bills.get('commercial_dud_cheque', 0) or 0)  # I23
-                safe_cell_assignment(ws, 25, 9, summary_bills.get('director_basic_report', 0) or 0)  # I25
-                safe_cell_assignment(ws, 26, 9, summary_bills.get('director_detailed_report', 0) or 0)  # I26
-                
-                # Set rates in column M (13) - merged from M to O with Naira formatting
-                # Check for custom subscriber rates with fallback to ENQUIRY_RATES
-                
-                # Consumer Snap Check (row 12)
-                try:
-                    custom_rate_obj = SubscriberProductRate.objects.filter(
-                        subscriber_name__iexact=subscriber_id, 
-                        product_name__iexact='Consumer Snap Check'
-                    ).first()
-                    
-                    if custom_rate_obj and hasattr(custom_rate_obj, 'rate'):
-                        custom_rate = Decimal(str(custom_rate_obj.rate))
-                    else:
-                        custom_rate = Decimal(str(ENQUIRY_RATES['consumer_snap_check']))
-                except Exception as e:
-                    custom_rate = Decimal(str(ENQUIRY_RATES['consumer_snap_check']))
-                safe_cell_assignment(ws, 12, 13, f"₦{custom_rate:,.2f}")  # M12
-                
-                # Consumer Basic Trace (row 13)
-                try:
-                    custom_rate_obj = SubscriberProductRate.objects.filter(
-                        subscriber_name__iexact=subscriber_id, 
-                        product_name__iexact='Consumer Basic Trace'
-                    ).first()
-                    if custom_rate_obj and hasattr(custom_rate_obj, 'rate'):
-                        custom_rate = Decimal(str(custom_rate_obj.rate))
-                    else:
-                        custom_rate = Decimal(str(ENQUIRY_RATES['consumer_basic_trace']))
-                except SubscriberProductRate.DoesNotExist:
-                    custom_rate = Decimal(str(ENQUIRY_RATES['consumer_basic_trace']))
-                safe_cell_assignment(ws, 13, 13, f"₦{custom_rate:,.2f}")  # M13
-                
-                # Consumer Basic Credit (row 14)
-                try:
-                    custom_rate_obj = SubscriberProductRate.objects.filter(
-                        subscriber_name__iexact=subscriber_id, 
-                        product_name__iexact='Consumer Basic Credit'
-                    ).first()
-                    if custom_rate_obj and hasattr(custom_rate_obj, 'rate'):
-                        custom_rate = Decimal(str(custom_rate_obj.rate))
-                    else:
-                        custom_rate = Decimal(str(ENQUIRY_RATES['consumer_basic_credit']))
-                except SubscriberProductRate.DoesNotExist:
-                    custom_rate = Decimal(str(ENQUIRY_RATES['consumer_basic_credit']))
-                safe_cell_assignment(ws, 14, 13, f"₦{custom_rate:,.2f}")  # M14
-                
-                # Consumer Detailed Credit (row 15)
-                try:
-                    custom_rate_obj = SubscriberProductRate.objects.filter(
-                        subscriber_name__iexact=subscriber_id, 
-                        product_name__iexact='Consumer Detailed Credit'
-                    ).first()
-                    if custom_rate_obj and hasattr(custom_rate_obj, 'rate'):
-                        custom_rate = Decimal(str(custom_rate_obj.rate))
-                    else:
-                        custom_rate = Decimal(str(ENQUIRY_RATES['consumer_detailed_credit']))
-                except SubscriberProductRate.DoesNotExist:
-                    custom_rate = Decimal(str(ENQUIRY_RATES['consumer_detailed_credit']))
-                safe_cell_assignment(ws, 15, 13, f"₦{custom_rate:,.2f}")  # M15
-                
-                # X-Score Consumer Credit (row 16)
-                try:
-                    custom_rate_obj = SubscriberProductRate.objects.filter(
-                        subscriber_name__iexact=subscriber_id, 
-                        product_name__iexact='X-Score Consumer Detailed Credit'
-                    ).first()
-                    if custom_rate_obj and hasattr(custom_rate_obj, 'rate'):
-                        custom_rate = Decimal(str(custom_rate_obj.rate))
-                    else:
-                        custom_rate = Decimal(str(ENQUIRY_RATES['xscore_consumer_credit']))
-                except SubscriberProductRate.DoesNotExist:
-                    custom_rate = Decimal(str(ENQUIRY_RATES['xscore_consumer_credit']))
-                safe_cell_assignment(ws, 16, 13, f"₦{custom_rate:,.2f}")  # M16
-                
-                # Commercial Basic Trace (row 17)
-                try:
-                    custom_rate_obj = SubscriberProductRate.objects.filter(
-                        subscriber_name__iexact=subscriber_id, 
-                        product_name__iexact='Commercial Basic Trace'
-                    ).first()
-                    if custom_rate_obj and hasattr(custom_rate_obj, 'rate'):
-                        custom_rate = Decimal(str(custom_rate_obj.rate))
-                    else:
-                        custom_rate = Decimal(str(ENQUIRY_RATES['commercial_basic_trace']))
-                except SubscriberProductRate.DoesNotExist:
-                    custom_rate = Decimal(str(ENQUIRY_RATES['commercial_basic_trace']))
-                safe_cell_assignment(ws, 17, 13, f"₦{custom_rate:,.2f}")  # M17
-                
-                # Commercial Detailed Credit (row 18)
-                try:
-                    custom_rate_obj = SubscriberProductRate.objects.filter(
-                        subscriber_name__iexact=subscriber_id, 
-                        product_name__iexact='Commercial Detailed Credit'
-                    ).first()
-                    if custom_rate_obj and hasattr(custom_rate_obj, 'rate'):
-                        custom_rate = Decimal(str(custom_rate_obj.rate))
-                    else:
-                        custom_rate = Decimal(str(ENQUIRY_RATES['commercial_detailed_credit']))
-                except SubscriberProductRate.DoesNotExist:
-                    custom_rate = Decimal(str(ENQUIRY_RATES['commercial_detailed_credit']))
-                safe_cell_assignment(ws, 18, 13, f"₦{custom_rate:,.2f}")  # M18
-                
-                # Enquiry Report (row 20)
-                try:
-                    custom_rate_obj = SubscriberProductRate.objects.filter(
-                        subscriber_name__iexact=subscriber_id, 
-                        product_name__iexact='Enquiry Report'
-                    ).first()
-                    if custom_rate_obj and hasattr(custom_rate_obj, 'rate'):
-                        custom_rate = Decimal(str(custom_rate_obj.rate))
-                    else:
-                        custom_rate = Decimal(str(ENQUIRY_RATES['enquiry_report']))
-                except SubscriberProductRate.DoesNotExist:
-                    custom_rate = Decimal(str(ENQUIRY_RATES['enquiry_report']))
-                safe_cell_assignment(ws, 20, 13, f"₦{custom_rate:,.2f}")  # M20
-                
-                # Consumer Dud Cheque (row 22)
-                try:
-                    custom_rate_obj = SubscriberProductRate.objects.filter(
-                        subscriber_name__iexact=subscriber_id, 
-                        product_name__iexact='Consumer Dud Cheque'
-                    ).first()
-                    if custom_rate_obj and hasattr(custom_rate_obj, 'rate'):
-                        custom_rate = Decimal(str(custom_rate_obj.rate))
-                    else:
-                        custom_rate = Decimal(str(ENQUIRY_RATES['consumer_dud_cheque']))
-                except SubscriberProductRate.DoesNotExist:
-                    custom_rate = Decimal(str(ENQUIRY_RATES['consumer_dud_cheque']))
-                safe_cell_assignment(ws, 22, 13, f"₦{custom_rate:,.2f}")  # M22
-                
-                # Commercial Dud Cheque (row 23)
-                try:
-                    custom_rate_obj = SubscriberProductRate.objects.filter(
-                        subscriber_name__iexact=subscriber_id, 
-                        product_name__iexact='Commercial Dud Cheque'
-                    ).first()
-                    if custom_rate_obj and hasattr(custom_rate_obj, 'rate'):
-                        custom_rate = Decimal(str(custom_rate_obj.rate))
-                    else:
-                        custom_rate = Decimal(str(ENQUIRY_RATES['commercial_dud_cheque']))
-                except SubscriberProductRate.DoesNotExist:
-                    custom_rate = Decimal(str(ENQUIRY_RATES['commercial_dud_cheque']))
-                safe_cell_assignment(ws, 23, 13, f"₦{custom_rate:,.2f}")  # M23
-                
-                # Director Basic Report (row 25)
-                try:
-                    custom_rate_obj = SubscriberProductRate.objects.filter(
-                        subscriber_name__iexact=subscriber_id, 
-                        product_name__iexact='Director Basic Report'
-                    ).first()
-                    if custom_rate_obj and hasattr(custom_rate_obj, 'rate'):
-                        custom_rate = Decimal(str(custom_rate_obj.rate))
-                    else:
-                        custom_rate = Decimal(str(ENQUIRY_RATES['director_basic_report']))
-                except SubscriberProductRate.DoesNotExist:
-                    custom_rate = Decimal(str(ENQUIRY_RATES['director_basic_report']))
-                safe_cell_assignment(ws, 25, 13, f"₦{custom_rate:,.2f}")  # M25
-                
-                # Director Detailed Report (row 26)
-                try:
-                    custom_rate_obj = SubscriberProductRate.objects.filter(
-                        subscriber_name__iexact=subscriber_id, 
-                        product_name__iexact='Director Detailed Report'
-                    ).first()
-                    if custom_rate_obj and hasattr(custom_rate_obj, 'rate'):
-                        custom_rate = Decimal(str(custom_rate_obj.rate))
-                    else:
-                        custom_rate = Decimal(str(ENQUIRY_RATES['director_detailed_report']))
-                except SubscriberProductRate.DoesNotExist:
-                    custom_rate = Decimal(str(ENQUIRY_RATES['director_detailed_report']))
-                safe_cell_assignment(ws, 26, 13, f"₦{custom_rate:,.2f}")  # M26
-                               # Calculate and set amounts in column P (16) - merged from P to Q
-                total_amount = 0
-                
-                # Store custom rates in a dictionary for easier reference
-                custom_rates = {}
-                
-                # Calculate amounts (quantity × rate) and populate column P with Naira formatting
-                # Use the custom rates we already looked up, not the default ENQUIRY_RATES
-                
-                # Consumer Snap Check
-                try:
-                    rate = SubscriberProductRate.objects.filter(
-                        subscriber_name__iexact=subscriber_id, 
-                        product_name__iexact='Consumer Snap Check'
-                    ).first()
-                    if rate and hasattr(rate, 'rate'):
-                        custom_rates['consumer_snap_check'] = Decimal(str(rate.rate))
-                    else:
-                        custom_rates['consumer_snap_check'] = Decimal(str(ENQUIRY_RATES['consumer_snap_check']))
-                    logger.debug(f"Using custom rate for {subscriber_id} - Consumer Snap Check: {custom_rates['consumer_snap_check']}")
-                except SubscriberProductRate.DoesNotExist:
-                    custom_rates['consumer_snap_check'] = Decimal(str(ENQUIRY_RATES['consumer_snap_check']))
-                    logger.debug(f"Using default rate for Consumer Snap Check: {custom_rates['consumer_snap_check']}")
-                
-                consumer_snap_amount = Decimal(str(summary_bills.get('consumer_snap_check', 0) or 0)) * custom_rates['consumer_snap_check']
-                safe_cell_assignment(ws, 12, 16, f"₦{consumer_snap_amount:,.2f}")  # P12
-                total_amount += consumer_snap_amount
-                
-                # Consumer Basic Trace
-                try:
-                    rate = SubscriberProductRate.objects.filter(
-                        subscriber_name__iexact=subscriber_id, 
-                        product_name__iexact='Consumer Basic Trace'
-                    ).first()
-                    if rate and hasattr(rate, 'rate'):
-                        custom_rates['consumer_basic_trace'] = Decimal(str(rate.rate))
-                    else:
-                        custom_rates['consumer_basic_trace'] = Decimal(str(ENQUIRY_RATES['consumer_basic_trace']))
-                except SubscriberProductRate.DoesNotExist:
-                    custom_rates['consumer_basic_trace'] = Decimal(str(ENQUIRY_RATES['consumer_basic_trace']))
-                
-                consumer_basic_trace_amount = Decimal(str(summary_bills.get('consumer_basic_trace', 0) or 0)) * custom_rates['consumer_basic_trace']
-                safe_cell_assignment(ws, 13, 16, f"₦{consumer_basic_trace_amount:,.2f}")  # P13
-                total_amount += consumer_basic_trace_amount
-                
-                # Consumer Basic Credit
-                try:
-                    rate = SubscriberProductRate.objects.filter(
-                        subscriber_name__iexact=subscriber_id, 
-                        product_name__iexact='Consumer Basic Credit'
-                    ).first()
-                    if rate and hasattr(rate, 'rate'):
-                        custom_rates['consumer_basic_credit'] = Decimal(str(rate.rate))
-                    else:
-                        custom_rates['consumer_basic_credit'] = Decimal(str(ENQUIRY_RATES['consumer_basic_credit']))
-                except SubscriberProductRate.DoesNotExist:
-                    custom_rates['consumer_basic_credit'] = Decimal(str(ENQUIRY_RATES['consumer_basic_credit']))
-                
-                consumer_basic_credit_amount = Decimal(str(summary_bills.get('consumer_basic_credit', 0) or 0)) * custom_rates['consumer_basic_credit']
-                safe_cell_assignment(ws, 14, 16, f"₦{consumer_basic_credit_amount:,.2f}")  # P14
-                total_amount += consumer_basic_credit_amount
-                
-                # Consumer Detailed Credit
-                try:
-                    rate = SubscriberProductRate.objects.filter(
-                        subscriber_name__iexact=subscriber_id, 
-                        product_name__iexact='Consumer Detailed Credit'
-                    ).first()
-                    if rate and hasattr(rate, 'rate'):
-                        custom_rates['consumer_detailed_credit'] = Decimal(str(rate.rate))
-                    else:
-                        custom_rates['consumer_detailed_credit'] = Decimal(str(ENQUIRY_RATES['consumer_detailed_credit']))
-                except SubscriberProductRate.DoesNotExist:
-                    custom_rates['consumer_detailed_credit'] = Decimal(str(ENQUIRY_RATES['consumer_detailed_credit']))
-                
-                consumer_detailed_credit_amount = Decimal(str(summary_bills.get('consumer_detailed_credit', 0) or 0)) * custom_rates['consumer_detailed_credit']
-                safe_cell_assignment(ws, 15, 16, f"₦{consumer_detailed_credit_amount:,.2f}")  # P15
-                total_amount += consumer_detailed_credit_amount
-                
-                # X-Score Consumer Credit
-                try:
-                    rate = SubscriberProductRate.objects.filter(
-                        subscriber_name__iexact=subscriber_id, 
-                        product_name__iexact='X-Score Consumer Detailed Credit'
-                    ).first()
-                    if rate and hasattr(rate, 'rate'):
-                        custom_rates['xscore_consumer_credit'] = Decimal(str(rate.rate))
-                    else:
-                        custom_rates['xscore_consumer_credit'] = Decimal(str(ENQUIRY_RATES['xscore_consumer_credit']))
-                except SubscriberProductRate.DoesNotExist:
-                    custom_rates['xscore_consumer_credit'] = Decimal(str(ENQUIRY_RATES['xscore_consumer_credit']))
-                
-                xscore_consumer_amount = Decimal(str(summary_bills.get('xscore_consumer_credit', 0) or 0)) * custom_rates['xscore_consumer_credit']
-                safe_cell_assignment(ws, 16, 16, f"₦{xscore_consumer_amount:,.2f}")  # P16
-                total_amount += xscore_consumer_amount
-                
-                # Commercial Basic Trace
-                try:
-                    rate = SubscriberProductRate.objects.filter(
-                        subscriber_name__iexact=subscriber_id, 
-                        product_name__iexact='Commercial Basic Trace'
-                    ).first()
-                    if rate and hasattr(rate, 'rate'):
-                        custom_rates['commercial_basic_trace'] = Decimal(str(rate.rate))
-                    else:
-                        custom_rates['commercial_basic_trace'] = Decimal(str(ENQUIRY_RATES['commercial_basic_trace']))
-                except SubscriberProductRate.DoesNotExist:
-                    custom_rates['commercial_basic_trace'] = Decimal(str(ENQUIRY_RATES['commercial_basic_trace']))
-                
-                commercial_basic_trace_amount = Decimal(str(summary_bills.get('commercial_basic_trace', 0) or 0)) * custom_rates['commercial_basic_trace']
-                safe_cell_assignment(ws, 17, 16, f"₦{commercial_basic_trace_amount:,.2f}")  # P17
-                total_amount += commercial_basic_trace_amount
-                
-                # Commercial Detailed Credit
-                try:
-                    rate = SubscriberProductRate.objects.filter(
-                        subscriber_name__iexact=subscriber_id, 
-                        product_name__iexact='Commercial Detailed Credit'
-                    ).first()
-                    if rate and hasattr(rate, 'rate'):
-                        custom_rates['commercial_detailed_credit'] = Decimal(str(rate.rate))
-                    else:
-                        custom_rates['commercial_detailed_credit'] = Decimal(str(ENQUIRY_RATES['commercial_detailed_credit']))
-                except SubscriberProductRate.DoesNotExist:
-                    custom_rates['commercial_detailed_credit'] = Decimal(str(ENQUIRY_RATES['commercial_detailed_credit']))
-                
-                commercial_detailed_credit_amount = Decimal(str(summary_bills.get('commercial_detailed_credit', 0) or 0)) * custom_rates['commercial_detailed_credit']
-                safe_cell_assignment(ws, 18, 16, f"₦{commercial_detailed_credit_amount:,.2f}")  # P18
-                total_amount += commercial_detailed_credit_amount
-                
-                # Enquiry Report
-                try:
-                    rate = SubscriberProductRate.objects.filter(
-                        subscriber_name__iexact=subscriber_id, 
-                        product_name__iexact='Enquiry Report'
-                    ).first()
-                    if rate and hasattr(rate, 'rate'):
-                        custom_rates['enquiry_report'] = Decimal(str(rate.rate))
-                    else:
-                        custom_rates['enquiry_report'] = Decimal(str(ENQUIRY_RATES['enquiry_report']))
-                except SubscriberProductRate.DoesNotExist:
-                    custom_rates['enquiry_report'] = Decimal(str(ENQUIRY_RATES['enquiry_report']))
-                
-                enquiry_report_amount = Decimal(str(summary_bills.get('enquiry_report', 0) or 0)) * custom_rates['enquiry_report']
-                safe_cell_assignment(ws, 20, 16, f"₦{enquiry_report_amount:,.2f}")  # P20
-                total_amount += enquiry_report_amount
-                
-                # Consumer Dud Cheque
-                try:
-                    rate = SubscriberProductRate.objects.filter(
-                        subscriber_name__iexact=subscriber_id, 
-                        product_name__iexact='Consumer Dud Cheque'
-                    ).first()
-                    if rate and hasattr(rate, 'rate'):
-                        custom_rates['consumer_dud_cheque'] = Decimal(str(rate.rate))
-                    else:
-                        custom_rates['consumer_dud_cheque'] = Decimal(str(ENQUIRY_RATES['consumer_dud_cheque']))
-                except SubscriberProductRate.DoesNotExist:
-                    custom_rates['consumer_dud_cheque'] = Decimal(str(ENQUIRY_RATES['consumer_dud_cheque']))
-                
-                consumer_dud_amount = Decimal(str(summary_bills.get('consumer_dud_cheque', 0) or 0)) * custom_rates['consumer_dud_cheque']
-                safe_cell_assignment(ws, 22, 16, f"₦{consumer_dud_amount:,.2f}")  # P22
-                total_amount += consumer_dud_amount
-                
-                # Commercial Dud Cheque
-                try:
-                    rate = SubscriberProductRate.objects.filter(
-                        subscriber_name__iexact=subscriber_id, 
-                        product_name__iexact='Commercial Dud Cheque'
-                    ).first()
-                    if rate and hasattr(rate, 'rate'):
-                        custom_rates['commercial_dud_cheque'] = Decimal(str(rate.rate))
-                    else:
-                        custom_rates['commercial_dud_cheque'] = Decimal(str(ENQUIRY_RATES['commercial_dud_cheque']))
-                except SubscriberProductRate.DoesNotExist:
-                    custom_rates['commercial_dud_cheque'] = Decimal(str(ENQUIRY_RATES['commercial_dud_cheque']))
-                
-                commercial_dud_amount = Decimal(str(summary_bills.get('commercial_dud_cheque', 0) or 0)) * custom_rates['commercial_dud_cheque']
-                safe_cell_assignment(ws, 23, 16, f"₦{commercial_dud_amount:,.2f}")  # P23
-                total_amount += commercial_dud_amount
-                
-                # Director Basic Report
-                try:
-                    rate = SubscriberProductRate.objects.filter(
-                        subscriber_name__iexact=subscriber_id, 
-                        product_name__iexact='Director Basic Report'
-                    ).first()
-                    if rate and hasattr(rate, 'rate'):
-                        custom_rates['director_basic_report'] = Decimal(str(rate.rate))
-                    else:
-                        custom_rates['director_basic_report'] = Decimal(str(ENQUIRY_RATES['director_basic_report']))
-                except SubscriberProductRate.DoesNotExist:
-                    custom_rates['director_basic_report'] = Decimal(str(ENQUIRY_RATES['director_basic_report']))
-                
-                director_basic_amount = Decimal(str(summary_bills.get('director_basic_report', 0) or 0)) * custom_rates['director_basic_report']
-                safe_cell_assignment(ws, 25, 16, f"₦{director_basic_amount:,.2f}")  # P25
-                total_amount += director_basic_amount
-                
-                # Director Detailed Report
-                try:
-                    rate = SubscriberProductRate.objects.filter(
-                        subscriber_name__iexact=subscriber_id, 
-                        product_name__iexact='Director Detailed Report'
-                    ).first()
-                    if rate and hasattr(rate, 'rate'):
-                        custom_rates['director_detailed_report'] = Decimal(str(rate.rate))
-                    else:
-                        custom_rates['director_detailed_report'] = Decimal(str(ENQUIRY_RATES['director_detailed_report']))
-                except SubscriberProductRate.DoesNotExist:
-                    custom_rates['director_detailed_report'] = Decimal(str(ENQUIRY_RATES['director_detailed_report']))
-                
-                director_detailed_amount = Decimal(str(summary_bills.get('director_detailed_report', 0) or 0)) * custom_rates['director_detailed_report']
-                safe_cell_assignment(ws, 26, 16, f"₦{director_detailed_amount:,.2f}")  # P26
-                total_amount += director_detailed_amount
-                
-                # Set total amount with Naira formatting
-                safe_cell_assignment(ws, 28, 16, f"₦{total_amount:,.2f}")  # P28 for total
-                
-                # Calculate 7.5% VAT amount
-                vat_amount = total_amount * Decimal(str(0.075))
-                safe_cell_assignment(ws, 29, 16, f"₦{vat_amount:,.2f}")  # P29 for VAT amount
-                
-                # Calculate amount due (total + VAT)
-                amount_due = total_amount + vat_amount
-                safe_cell_assignment(ws, 30, 16, f"₦{amount_due:,.2f}")  # P30 for amount due
-                
-
-            
-            if include_products:
-                start_row_offset = 36  # Initial start row for product sections on Sheet1
-                current_sheet = ws
-                sheet2 = wb["Sheet2"] if "Sheet2" in wb.sheetnames else None
-                
-                # Sort product_sections by product_name
-                sorted_product_names = sorted(product_sections.keys())
-                
-                # First, find the original product name cell in the template (rows 32-35)
-                product_name_cell = None
-                for row in range(32, 36):  # Rows 32-35 (inclusive)
-                    for col in range(1, 16):  # Assuming columns A-O are important
-                        cell_value = ws.cell(row=row, column=col).value
-                        if cell_value and "product" in str(cell_value).lower():
-                            product_name_cell = (row, col)
-                            break
-                    if product_name_cell:
-                        break
-                        
-                # Save the template header structure (rows 32-35) for subsequent products
-                header_template = []
-                header_rows = (32, 35)  # Range of rows to copy for the header template
-                for row in range(header_rows[0], header_rows[1] + 1):
-                    row_data = []
-                    for col in range(1, 16):  # Assuming columns A-O are important
-                        cell = ws.cell(row=row, column=col)
-                        # Store cell value and position only - we'll copy styles directly later
-                        cell_info = {
-                            'value': cell.value,
-                            'position': (row, col)
-                        }
-                        # Check if cell is part of merged range
-                        for m_range in ws.merged_cells.ranges:
-                            if (row, col) == (m_range.min_row, m_range.min_col):
-                                cell_info['merged'] = (m_range.max_row - m_range.min_row + 1, 
-                                                      m_range.max_col - m_range.min_col + 1)
-                                break
-                        row_data.append(cell_info)
-                    header_template.append(row_data)
-                
-                # Set data row start - will be used for first product                
-                data_start_row = 36  # Initial start for data rows after template header
-                lastProduct = ""
-                
-                # For each product, use appropriate header section
-                for product_idx, product_name in enumerate(sorted_product_names):
-                    product_records = product_sections[product_name]
-                    
-                    if product_idx == 0:
-                        # For first product, use the existing template header
-                        if product_name_cell:
-                            row, col = product_name_cell
-                            # Replace "Product Name" with actual first product name in template
-                            safe_cell_assignment(ws, row, col, product_name)
-                        current_sheet = ws
-                        current_row_offset = data_start_row  # Start data at row 36
-                        serial_number_base = data_start_row - 1
-                    else:
-                        # Add space between different products (extra spacing)
-                        current_row_offset += 4  # Add significant spacing between products
-                            
-                        # Create new header for subsequent products
-                        header_start_row = current_row_offset
-                        
-                        # Clone the header section for this product
-                        for template_row_idx, template_row in enumerate(header_template):
-                            target_row = header_start_row + template_row_idx
-                        
-                            # Ensure we're not past row limits
-                            if current_sheet == ws and target_row > 1000000 and sheet2:
-                                current_sheet = sheet2
-                                # Reset for Sheet2
-                                header_start_row = 13
-                                target_row = header_start_row + template_row_idx
-                        
-                            # Unmerge any existing merged cells in the target area
-                            for m_range in list(current_sheet.merged_cells.ranges):
-                                if m_range.min_row <= target_row <= m_range.max_row:
-                                    current_sheet.unmerge_cells(
-                                        start_row=m_range.min_row, 
-                                        start_column=m_range.min_col,
-                                        end_row=m_range.max_row, 
-                                        end_column=m_range.max_col
-                                    )
-                        
-                            # Copy each cell from the template to the target area
-                            for col_idx, cell_info in enumerate(template_row):
-                                target_col = col_idx + 1
-                                target_cell = current_sheet.cell(row=target_row, column=target_col)
-                                
-                                # Copy styles directly from the original cell
-                                original_row, original_col = cell_info['position']
-                                original_cell = ws.cell(row=original_row, column=original_col)
-                                
-                                # Copy cell format using openpyxl's built-in method
-                                target_cell._style = copy(original_cell._style)
-                                
-                                # Set value using safe_cell_assignment to handle merged cells properly
-                                if template_row_idx == product_name_cell[0] - header_rows[0] and \
-                                   col_idx == product_name_cell[1] - 1:
-                                    # For the product name cell, use the safe assignment method
-                                    safe_cell_assignment(current_sheet, target_row, target_col, product_name)
-                                elif cell_info['value'] is not None:
-                                    # For other cells with values, use the safe assignment method
-                                    safe_cell_assignment(current_sheet, target_row, target_col, cell_info['value'])
-                                
-                                # Recreate merged cells
-                                if 'merged' in cell_info:
-                                    rows, cols = cell_info['merged']
-                                    current_sheet.merge_cells(
-                                        start_row=target_row, 
-                                        start_column=target_col,
-                                        end_row=target_row + rows - 1, 
-                                        end_column=target_col + cols - 1
-                                    )
-                        
-                        # Update data start row to be after this new header
-                        current_row_offset = header_start_row + (header_rows[1] - header_rows[0] + 1)
-                        serial_number_base = current_row_offset - 1
-                        
-                        # Add header for the data section
-                        safe_cell_assignment(current_sheet, current_row_offset - 1, 4, "Unique Tracking Number")
-
-                    # Process data records for this product
-                    for record_idx, record in enumerate(product_records):
-                        current_row = current_row_offset + record_idx
-                        
-                        # Switch to Sheet2 when reaching max row (like VBA)
-                        if current_row > 1000000 and sheet2 and current_sheet != sheet2:
-                            current_sheet = sheet2
-                            current_row_offset = 13  # Reset row offset for Sheet2 as per VBA
-                            serial_number_base = 12  # Reset serial number base for Sheet2
-                            current_row = current_row_offset + record_idx  # Recalculate current_row for Sheet2
-                        
-                        # Copy row format from template data row
-                        template_data_row = 36
-                        max_col = 17  # Extend to include all columns that need formatting
-                        copy_row_format(current_sheet, template_data_row, current_row, max_col)
-                        
-                        # Now assign values as before
-                        safe_cell_assignment(current_sheet, current_row, 2, current_row - serial_number_base)  # Serial Number
-                        safe_cell_assignment(current_sheet, current_row, 3, "")  # Branch ID
-                        safe_cell_assignment(current_sheet, current_row, 4, "")  # Unique Tracking Number column left blank
-                        safe_cell_assignment(current_sheet, current_row, 5, record['SubscriberName'])
-                        safe_cell_assignment(current_sheet, current_row, 7, record['SystemUser'] if record['SystemUser'] else "")
-                        # Format SubscriberEnquiryDate
-                        subscriber_enquiry_date = record['SubscriberEnquiryDate']
-                        if subscriber_enquiry_date:
-
-                            if isinstance(subscriber_enquiry_date, str):
-                                date_str = subscriber_enquiry_date
-                            else:
-                                # Convert to date object first to remove any time component
-                                if hasattr(subscriber_enquiry_date, 'date'):
-                                    date_only = subscriber_enquiry_date.date()
-                                else:
-                                    date_only = subscriber_enquiry_date
-                                date_str = date_only.strftime('%Y-%m-%d')
-                            # Set cell format to text BEFORE assignment to prevent Excel from adding time component
-                            current_sheet.cell(row=current_row, column=10).number_format = '@'
-                            safe_cell_assignment(current_sheet, current_row, 10, date_str)
-                            # Ensure the format stays as text after assignment
-                            current_sheet.cell(row=current_row, column=10).number_format = '@'
-                        else:
-                            safe_cell_assignment(current_sheet, current_row, 10, "")
-                        safe_cell_assignment(current_sheet, current_row, 11, record['ProductName'])
-                        # Format DetailsViewedDate to match SubscriberEnquiryDate format
-                        details_viewed_date = record['DetailsViewedDate']
-                        if details_viewed_date:
-                            if isinstance(details_viewed_date, str):
-                                date_str = details_viewed_date
-                            else:
-                                # Convert to date object first to remove any time component
-                                if hasattr(details_viewed_date, 'date'):
-                                    date_only = details_viewed_date.date()
-                                else:
-                                    date_only = details_viewed_date
-                                date_str = date_only.strftime('%Y-%m-%d')
-                            # Set cell format to text BEFORE assignment to prevent Excel from adding time component
-                            current_sheet.cell(row=current_row, column=12).number_format = '@'
-                            safe_cell_assignment(current_sheet, current_row, 12, date_str)
-                            # Ensure the format stays as text after assignment
-                            current_sheet.cell(row=current_row, column=12).number_format = '@'
-                        else:
-                            safe_cell_assignment(current_sheet, current_row, 12, "")
-                        safe_cell_assignment(current_sheet, current_row, 15, record['SearchOutput'] if record['SearchOutput'] else "")
-                        
-                        # Apply merge and center formatting to this data row
-                        merge_and_center_data_row(current_sheet, current_row)
-                    
-                    # Move offset to after this product's data for next product
-                    current_row_offset += len(product_records)
-                    
-                    # Set lastProduct for the next iteration
-                    lastProduct = product_name
-
-            # Auto-size columns for better readability
-            for sheet in wb.worksheets:
-                auto_size_columns(sheet)
-
-            # Add 'Generated by: <username>' to the first available merged O-Q row, or row 8 if none, with bold and italic formatting
-            add_generated_by(ws, request.user.username, current_row_offset - 1)
-
-            # Save workbook to buffer
-            wb.save(buffer)
-            buffer.seek(0)
-            
-            # Generate filename and create directory if it doesn't exist
-            month_year = start_date.strftime('%B%Y')
-            clean_subscriber = clean_filename(subscriber_id)
-            filename = f"{clean_subscriber}_{month_year}_{uuid.uuid4().hex[:8]}.xlsx"
-            single_reports_dir = os.path.join(settings.MEDIA_ROOT, 'reports', 'single')
-            os.makedirs(single_reports_dir, exist_ok=True)
-            file_path = os.path.join(single_reports_dir, filename)
-            
-            # Write buffer contents to file using getvalue() to get entire content regardless of position
-            with open(file_path, 'wb') as f:
-                f.write(buffer.getvalue())
-            download_url = settings.MEDIA_URL + f'reports/single/{filename}'
-            
-            # Update report generation status to success
-            if 'report_gen' in locals() and report_gen:
-                report_gen.status = 'success'
-                report_gen.completed_at = timezone.now()
-                report_gen.save()
-                
-            return render(request, 'bulkrep/download_ready.html', {
-                'download_url': download_url
-            })
-            
-        except Exception as e:
-            error_msg = f"Error generating report: {str(e)}"
-            messages.error(request, error_msg)
-            if 'report_gen' in locals() and report_gen:
-                report_gen.status = 'failed'
-                report_gen.error_message = error_msg[:500]  # Truncate to fit in the field
-                report_gen.completed_at = timezone.now()
-                report_gen.save()
-            return render(request, 'bulkrep/single_report.html', context)
+        # Query -> workbook -> file runs as a background job; the download page polls it
+        report_gen = tasks.submit_report_job(
+            tasks.generate_single_report, report_gen,
+            subscriber_id=subscriber_id,
+            start_date=start_date.isoformat(),
+            end_date=end_date.isoformat(),
+            include_bills=include_bills,
+            include_products=include_products,
+        )
+        return render(request, 'bulkrep/download_ready.html', report_job_context(report_gen))
 
     return render(request, 'bulkrep/single_report.html', context)
 
 # Helper function to auto-size columns for better readability
-def auto_size_columns(worksheet, min_col=1, max_col=17):
+def auto_size_columns(worksheet):
     """
     Auto-size columns in the worksheet to fit their contents with reasonable widths.
     Applies modest adjustments to prevent columns from being too wide.
     Handles merged cells properly, especially for rows 2 and 6.
-    """
-    # Define minimum and maximum widths for specific columns
-    min_widths = {
-        # Set minimum widths to prevent columns from being too narrow
-        5: 10,  # SubscriberName (E)
-        6: 10,  # SubscriberName (F)
-        7: 9,  # SystemUser (G)
-        8: 10,  # SystemUser (H)
-        9: 9,  # SystemUser (I)
-        10: 15, # SubscriberEnquiryDate (J)
-        11: 20, # ProductName (K)
-        12: 5, # DetailsViewedDate (L)
-        13: 10, # DetailsViewedDate (M)
-        14: 5, # DetailsViewedDate (N)
-        # Default minimum width for other columns
-        'default': 10
-    }
-
-
     
-    # Define maximum widths for specific columns that tend to get too wide
-    max_widths = {
-        # DetailsViewedDate (columns L-N, 12-14)
-        12: 5, 13: 10, 14: 5,
-        # SearchOutput (columns O-Q, 15-17) - increased to allow more content to be visible
-        15: 40, 16: 40, 17: 40,
-        # Default max width for other columns
-        'default': 30
-    }
-    
-    # Store merged ranges for special handling
-    merged_ranges = list(worksheet.merged_cells.ranges)
-    
-    # Special handling for rows 2 and 6 which have specific merged ranges
-    row2_merged_range = None
-    row6_merged_range = None
-    
-    for merged_range in merged_ranges:
-        if merged_range.min_row == 2 and merged_range.max_row == 2:
-            row2_merged_range = merged_range
-        elif merged_range.min_row == 6 and merged_range.max_row == 6:
-            row6_merged_range = merged_range
-    
-    for col_idx in range(min_col, max_col + 1):
-        # Get the maximum content width in the column
-        max_length = 0
-        column = worksheet.column_dimensions[get_column_letter(col_idx)]
-        
-        # Skip columns that are part of the merged ranges for rows 2 and 6
-        # This prevents these merged cells from affecting column widths
-        skip_column = False
-        if row2_merged_range and col_idx >= row2_merged_range.min_col and col_idx <= row2_merged_range.max_col:
-            # For row 2 merged range, only consider the first column in the range
-            if col_idx > row2_merged_range.min_col:
-                skip_column = True
-        
-        if row6_merged_range and col_idx >= row6_merged_range.min_col and col_idx <= row6_merged_range.max_col:
-            # For row 6 merged range, only consider the first column in the range
-            if col_idx > row6_merged_range.min_col:
-                skip_column = True
-        
-        if not skip_column:
-            # Check all cells in this column
-            for row_idx, row in enumerate(worksheet.rows, 1):
-                # Skip rows 2 and 6 for all columns except the first column in their merged ranges
-                if (row_idx == 2 and row2_merged_range and col_idx != row2_merged_range.min_col) or \
-                   (row_idx == 6 and row6_merged_range and col_idx != row6_merged_range.min_col):
-                    continue
-                
-                if len(row) >= col_idx:
-                    cell = row[col_idx-1]  # 0-based index
-                    if cell.value:
-                        # Calculate the approximate width based on content
-                        try:
-                            cell_length = len(str(cell.value))
-                            # Adjust for merged cells
-                            is_in_merge = False
-                            for merged_range in merged_ranges:
-                                if cell.coordinate in merged_range:
-                                    # Special handling for different types of merged cells
-                                    merge_width = merged_range.max_col - merged_range.min_col + 1
-                                    
-                                    # For rows 2 and 6, handle specially
-                                    if (row_idx == 2 and merged_range == row2_merged_range) or \
-                                       (row_idx == 6 and merged_range == row6_merged_range):
-                                        # For the first column in the merge, allocate more space
-                                        if col_idx == merged_range.min_col:
-                                            # Allocate more space to first column but not all
-                                            cell_length = cell_length * 0.4  # 40% to first column
-                                        else:
-                                            # Distribute remaining 60% evenly among other columns
-                                            cell_length = (cell_length * 0.6) / (merge_width - 1)
-                                    
-                                    # Special handling for SearchOutput columns (O-Q, 15-17)
-                                    elif 15 <= merged_range.min_col <= 17 and 15 <= merged_range.max_col <= 17:
-                                        # For SearchOutput with wrap_text, distribute more evenly
-                                        # Give more width to first column for better readability
-                                        if col_idx == merged_range.min_col:
-                                            cell_length = cell_length * 0.5  # 50% to first column
-                                        else:
-                                            # Distribute remaining 50% evenly
-                                            cell_length = (cell_length * 0.5) / (merge_width - 1)
-                                    else:
-                                        # For other merged cells, divide by the number of columns
-                                        # but ensure a minimum reasonable length
-                                        cell_length = max(10, cell_length / merge_width)
-                                    
-                                    is_in_merge = True
-                                    break
-                            
-                            # Update max_length regardless of merge status
-                            # This ensures all cells contribute to column width calculation
-                            max_length = max(max_length, cell_length)
-                        except:
-                            pass
-        
-        # Set column width with appropriate padding and respect minimum/maximum widths
-        if max_length > 0:
-            # Add padding based on content type - more padding for text columns
-            if col_idx >= 15 and col_idx <= 17:  # SearchOutput columns
-                # For SearchOutput columns with wrap_text, use more generous padding
-                calculated_width = max_length + 3
-            else:
-                # For other columns, use standard padding
-                calculated_width = max_length + 2
-            
-            # Apply column-specific minimum and maximum width constraints
-            column_min_width = min_widths.get(col_idx, min_widths['default'])
-            column_max_width = max_widths.get(col_idx, max_widths['default'])
-            
-            # Set the width to be between minimum and maximum constraints
-            column.width = max(column_min_width, min(calculated_width, column_max_width))
-        else:
-            # If no content, use the minimum width
-            column.width = min_widths.get(col_idx, min_widths['default'])
+    Widths come from the sheet's ColumnWidthTracker, which the row writers feed
+    as rows are written, so the sheet itself is not rescanned here.
+    """
+    get_width_tracker(worksheet).apply()
 
 def copy_row_format(ws, template_row_idx, target_row_idx, max_col=15):
     """
     Copy cell styles (and optionally values) from a template row to a target row.
     Also handles merged cells and maintains their formatting.
     """
+    merged_index = get_merged_index(ws)
+    
     # First, check and unmerge any existing merged cells in the target row
-    for merged_range in list(ws.merged_cells.ranges):
-        if merged_range.min_row <= target_row_idx <= merged_range.max_row:
-            ws.unmerge_cells(str(merged_range))
+    for merged_range in merged_index.ranges_in_row(target_row_idx):
+        unmerge_range(ws, merged_range)
     
     # Copy format and check for merged cells in template
     template_merged_ranges = []
@@ -1203,14 +283,13 @@ def copy_row_format(ws, template_row_idx, target_row_idx, max_col=15):
             target_cell.alignment = Alignment(horizontal=h_align, vertical=v_align)
         
         # Check if this cell is part of a merged range in the template
-        for merged_range in ws.merged_cells.ranges:
-            if merged_range.min_row == template_row_idx and merged_range.min_col <= col <= merged_range.max_col:
-                template_merged_ranges.append((
-                    merged_range.min_col,
-                    merged_range.max_col,
-                    merged_range.max_col - merged_range.min_col + 1
-                ))
-                break
+        merged_range = merged_index.find(template_row_idx, col)
+        if merged_range is not None and merged_range.min_row == template_row_idx:
+            template_merged_ranges.append((
+                merged_range.min_col,
+                merged_range.max_col,
+                merged_range.max_col - merged_range.min_col + 1
+            ))
     
     # Recreate merged ranges in the target row
     for min_col, max_col, span in set(template_merged_ranges):
@@ -1233,12 +312,7 @@ def copy_row_format(ws, template_row_idx, target_row_idx, max_col=15):
             target_cell.alignment = Alignment(horizontal=h_align, vertical=v_align)
         
         # Now merge the cells
-        ws.merge_cells(
-            start_row=target_row_idx,
-            start_column=min_col,
-            end_row=target_row_idx,
-            end_column=max_col
-        )
+        merge_range(ws, target_row_idx, min_col, target_row_idx, max_col)
         
         # Ensure the merged cell has proper alignment
         merged_cell = ws.cell(row=target_row_idx, column=min_col)
@@ -1254,8 +328,7 @@ def copy_merged_and_center(ws, template_ws, template_row_start, template_row_end
             row_offset = target_row_start - template_row_start
             new_min_row = m_range.min_row + row_offset
             new_max_row = m_range.max_row + row_offset
-            ws.merge_cells(start_row=new_min_row, start_column=m_range.min_col,
-                           end_row=new_max_row, end_column=m_range.max_col)
+            merge_range(ws, new_min_row, m_range.min_col, new_max_row, m_range.max_col)
     # 2. Copy center alignment for header cells
     for row in range(template_row_start, template_row_end + 1):
         for col in range(1, ws.max_column + 1):
@@ -1273,28 +346,27 @@ def merge_and_center_header_columns(sheet, start_row, end_row):
         sheet.row_dimensions[row].height = 25
         
         # Unmerge any existing merged cells in this row
-        for merged_range in list(sheet.merged_cells.ranges):
-            if merged_range.min_row <= row <= merged_range.max_row:
-                if ((5 <= merged_range.min_col <= 6) or  # SubscriberName (E-F)
-                    (7 <= merged_range.min_col <= 9) or  # SystemUser (G-I)
-                    (12 <= merged_range.min_col <= 14) or  # DetailsViewedDate (L-N)
-                    (15 <= merged_range.min_col <= 17)):  # SearchOutput (O-Q)
-                    sheet.unmerge_cells(str(merged_range))
+        for merged_range in get_merged_index(sheet).ranges_in_row(row):
+            if ((5 <= merged_range.min_col <= 6) or  # SubscriberName (E-F)
+                (7 <= merged_range.min_col <= 9) or  # SystemUser (G-I)
+                (12 <= merged_range.min_col <= 14) or  # DetailsViewedDate (L-N)
+                (15 <= merged_range.min_col <= 17)):  # SearchOutput (O-Q)
+                unmerge_range(sheet, merged_range)
         
         # Merge SubscriberName (E-F)
-        sheet.merge_cells(start_row=row, start_column=5, end_row=row, end_column=6)
+        merge_range(sheet, row, 5, row, 6)
         sheet.cell(row=row, column=5).alignment = Alignment(horizontal='center', vertical='center',wrap_text=True)
         
         # Merge SystemUser (G-I)
-        sheet.merge_cells(start_row=row, start_column=7, end_row=row, end_column=9)
+        merge_range(sheet, row, 7, row, 9)
         sheet.cell(row=row, column=7).alignment = Alignment(horizontal='center', vertical='center')
         
         # Merge DetailsViewedDate (L-N)
-        sheet.merge_cells(start_row=row, start_column=12, end_row=row, end_column=14)
+        merge_range(sheet, row, 12, row, 14)
         sheet.cell(row=row, column=12).alignment = Alignment(horizontal='center', vertical='center')
         
         # Merge SearchOutput (O-Q) with wrap text
-        sheet.merge_cells(start_row=row, start_column=15, end_row=row, end_column=17)
+        merge_range(sheet, row, 15, row, 17)
         sheet.cell(row=row, column=15).alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
 
 # Helper function to merge and center data row columns
@@ -1307,14 +379,13 @@ def merge_and_center_data_row(sheet, row):
     sheet.row_dimensions[row].height = 25
     
     # Check for existing merged cells in the target row and unmerge them
-    for merged_range in list(sheet.merged_cells.ranges):
-        if merged_range.min_row <= row <= merged_range.max_row:
-            # Columns for DetailsViewedDate (L-N), SearchOutput (O-Q), SubscriberName (E-F), SystemUser (G-I)
-            if (12 <= merged_range.min_col <= 14) or \
-                (15 <= merged_range.min_col <= 17) or \
-                (5 <= merged_range.min_col <= 6) or \
-                (7 <= merged_range.min_col <= 9):
-                sheet.unmerge_cells(str(merged_range))
+    for merged_range in get_merged_index(sheet).ranges_in_row(row):
+        # Columns for DetailsViewedDate (L-N), SearchOutput (O-Q), SubscriberName (E-F), SystemUser (G-I)
+        if (12 <= merged_range.min_col <= 14) or \
+            (15 <= merged_range.min_col <= 17) or \
+            (5 <= merged_range.min_col <= 6) or \
+            (7 <= merged_range.min_col <= 9):
+            unmerge_range(sheet, merged_range)
     
     # Set alignment for SubscriberName (E-F)
     for col in range(5, 7):
@@ -1340,13 +411,13 @@ def merge_and_center_data_row(sheet, row):
     
     # Now merge the cells
     # Merge SubscriberName (E-F)
-    sheet.merge_cells(start_row=row, start_column=5, end_row=row, end_column=6)
+    merge_range(sheet, row, 5, row, 6)
     # Merge SystemUser (G-I)
-    sheet.merge_cells(start_row=row, start_column=7, end_row=row, end_column=9)
+    merge_range(sheet, row, 7, row, 9)
     # Merge DetailsViewedDate (L-N)
-    sheet.merge_cells(start_row=row, start_column=12, end_row=row, end_column=14)
+    merge_range(sheet, row, 12, row, 14)
     # Merge SearchOutput (O-Q)
-    sheet.merge_cells(start_row=row, start_column=15, end_row=row, end_column=17)
+    merge_range(sheet, row, 15, row, 17)
     
     # Ensure the merged cells have proper alignment
     # SubscriberName
@@ -1366,6 +437,15 @@ def merge_and_center_data_row(sheet, row):
     # Use top vertical alignment for better readability with wrapped text
     cell_O.alignment = Alignment(horizontal='center', vertical='top', wrap_text=True)
 
+def compile_data_row_stamp(ws, template_row_idx=36, max_col=17):
+    """
+    Format the template data row once (copy_row_format + merge_and_center_data_row)
+    and compile it into a RowStamp that every data row is stamped with.
+    """
+    copy_row_format(ws, template_row_idx, template_row_idx, max_col)
+    merge_and_center_data_row(ws, template_row_idx)
+    return RowStamp.from_row(ws, template_row_idx, max_col)
+
 # Define product rates mapping
 PRODUCT_RATES = {
     'Consumer Snap Check': Decimal('500.00'),
@@ -1382,7 +462,62 @@ PRODUCT_RATES = {
     'Director Detailed Report': Decimal('0.00'),
 }
 
-def populate_rate_and_amount(ws, start_row, end_row, subscriber_id):
+# Template rows holding each bill bucket in the summary section (quantity I, rate M, amount P)
+BILL_SUMMARY_ROWS = {
+    'consumer_snap_check': 12,
+    'consumer_basic_trace': 13,
+    'consumer_basic_credit': 14,
+    'consumer_detailed_credit': 15,
+    'xscore_consumer_credit': 16,
+    'commercial_basic_trace': 17,
+    'commercial_detailed_credit': 18,
+    'enquiry_report': 20,
+    'consumer_dud_cheque': 22,
+    'commercial_dud_cheque': 23,
+    'director_basic_report': 25,
+    'director_detailed_report': 26,
+}
+
+def populate_bill_summary(ws, summary_bills, rate_book, subscriber_name):
+    """
+    Populate the billing summary section (rows 12-30) of a report worksheet.
+    
+    Args:
+        ws: Worksheet object
+        summary_bills: Dictionary of {bill bucket: quantity}
+        rate_book: RateBook holding the subscriber's custom rates
+        subscriber_name: The subscriber the report is generated for
+    """
+    # Set quantities in column I
+    for bucket, row in BILL_SUMMARY_ROWS.items():
+        safe_cell_assignment(ws, row, 9, summary_bills.get(bucket, 0) or 0)
+    
+    # Set rates in column M (13) - merged from M to O with Naira formatting
+    # Custom subscriber rates fall back to ENQUIRY_RATES
+    rates = {}
+    for bucket, row in BILL_SUMMARY_ROWS.items():
+        rates[bucket] = rate_book.bill_rate(subscriber_name, bucket)
+        safe_cell_assignment(ws, row, 13, f"₦{rates[bucket]:,.2f}")
+    
+    # Calculate amounts (quantity × rate) and populate column P (16) - merged from P to Q
+    total_amount = 0
+    for bucket, row in BILL_SUMMARY_ROWS.items():
+        amount = Decimal(str(summary_bills.get(bucket, 0) or 0)) * rates[bucket]
+        safe_cell_assignment(ws, row, 16, f"₦{amount:,.2f}")
+        total_amount += amount
+    
+    # Set total amount with Naira formatting
+    safe_cell_assignment(ws, 28, 16, f"₦{total_amount:,.2f}")  # P28 for total
+    
+    # Calculate 7.5% VAT amount
+    vat_amount = total_amount * Decimal(str(0.075))
+    safe_cell_assignment(ws, 29, 16, f"₦{vat_amount:,.2f}")  # P29 for VAT amount
+    
+    # Calculate amount due (total + VAT)
+    amount_due = total_amount + vat_amount
+    safe_cell_assignment(ws, 30, 16, f"₦{amount_due:,.2f}")  # P30 for amount due
+
+def populate_rate_and_amount(ws, start_row, end_row, subscriber_id, rate_book=None):
     """
     Populate rate (columns M-O) and calculate amount (columns P-Q) based on product name (column D).
     
@@ -1391,7 +526,10 @@ def populate_rate_and_amount(ws, start_row, end_row, subscriber_id):
         start_row: First data row (1-based)
         end_row: Last data row (inclusive)
         subscriber_id: The ID/Name of the subscriber to check for custom rates
+        rate_book: Optional pre-loaded RateBook; loaded once for the subscriber if omitted
     """
+    if rate_book is None:
+        rate_book = RateBook.for_subscriber(subscriber_id)
     
     for row in range(start_row, end_row + 1):
         # Get product name from column D (4th column)
@@ -1405,11 +543,12 @@ def populate_rate_and_amount(ws, start_row, end_row, subscriber_id):
             
         # Use the safe helper function to get the rate
         rate = get_subscriber_product_rate_safe(
-            subscriber_id=subscriber_id,
+            subscriber_name=subscriber_id,
             product_name=product_name_cleaned,
             default_rate_map=PRODUCT_RATES,
             default_rate_key=product_name_cleaned,
-            logger=logger
+            logger=logger,
+            rate_book=rate_book
         )
         
         # Populate rate in columns M-O (merged)
@@ -1432,8 +571,8 @@ def add_generated_by(ws, username, last_data_row=None):
     # Add two rows below the last data row
     signature_row = last_data_row + 2
     
-    # Merge cells O-Q for the signature line
-    ws.merge_cells(start_row=signature_row, start_column=15, end_row=signature_row, end_column=17)
+    # Merge cells O-Q for the signature line (applied with the other planned merges)
+    plan_merge(ws, signature_row, 15, signature_row, 17)
     
     # Set the value and formatting for the signature line
     cell = ws.cell(row=signature_row, column=15)
@@ -1443,6 +582,618 @@ def add_generated_by(ws, username, last_data_row=None):
     ws.row_dimensions[signature_row].height = 26
     return signature_row
 
+def stream_product_sections(wb, product_sections, username, target):
+    """
+    Render the product detail sections of a report through the streaming
+    (write-only) writer and save the finished workbook to target.
+    
+    Rows 1-35 of the template (titles, bill summary) must already be populated.
+    Memory stays flat regardless of the number of records.
+    """
+    ws = wb.active
+    sorted_product_names = sorted(product_sections.keys())
+    product_name_cell = find_product_name_cell(ws)
+    writer = StreamingReportWriter(wb, product_name_cell)
+    
+    # For first product, use the existing template header
+    if product_name_cell:
+        row, col = product_name_cell
+        safe_cell_assignment(ws, row, col, sorted_product_names[0])
+    
+    # Format template row 36 once; its compiled styles are stamped onto every record
+    data_row_stamp = compile_data_row_stamp(ws)
+    
+    size_columns_for_streaming(wb, product_sections, product_name_cell, data_row_stamp)
+    
+    writer.start(data_row_stamp)
+    for product_name in sorted_product_names:
+        writer.write_product(product_name, product_sections[product_name])
+    writer.finish(username)
+    writer.save(target)
+
+def size_columns_for_streaming(wb, product_sections, product_name_cell, data_row_stamp):
+    """
+    Size columns before streaming. Write-only sheets need their widths before the
+    first row is written, so every record is fed to the width tracker up front,
+    measured with the merges the data row stamp will give it.
+    """
+    ws = wb.active
+    tracker = get_width_tracker(ws)
+    merge_spans = {min_col: (min_col, max_col) for min_col, max_col in data_row_stamp.merge_spans}
+    data_row = 36
+    
+    for records in product_sections.values():
+        tracker.observe(data_row, 2, len(records), merge_spans.get(2))  # Serial numbers restart for every product
+        for record in records:
+            for col, value in (
+                (5, record['SubscriberName']),
+                (7, record['SystemUser']),
+                (10, format_date_text(record['SubscriberEnquiryDate'])),
+                (11, record['ProductName']),
+                (12, format_date_text(record['DetailsViewedDate'])),
+                (15, record['SearchOutput']),
+            ):
+                tracker.observe(data_row, col, value, merge_spans.get(col))
+    
+    # Cloned product headers add the product name and "Unique Tracking Number"
+    if len(product_sections) > 1:
+        longest_name = max(product_sections.keys(), key=lambda name: len(str(name)))
+        for cell, value in ((product_name_cell, longest_name), ((35, 4), "Unique Tracking Number")):
+            if cell is None:
+                continue
+            merged_range = get_merged_index(ws).find(*cell)
+            if merged_range is None:
+                tracker.observe(cell[0], cell[1], value)
+            elif is_anchor(merged_range, *cell):
+                tracker.observe(cell[0], cell[1], value, (merged_range.min_col, merged_range.max_col))
+    
+    for sheet in wb.worksheets:
+        auto_size_columns(sheet)
+
+class ReportJobError(Exception):
+    """A report job could not produce its file; the message is shown to the user."""
+
+
+def build_report_workbook(target, subscriber_name, start_date, end_date, summary_bills, product_sections,
+                          include_bills, include_products, username, rate_book=None):
+    """
+    Fill the report template for one subscriber and save the workbook to target.
+    Shared by the single and bulk report jobs.
+    
+    Args:
+        target: Binary file-like object the .xlsx is written to
+        subscriber_name: Subscriber the report is for
+        start_date: Start of the report period (date)
+        end_date: End of the report period (date)
+        summary_bills: Dictionary of {bucket: count} for the bill summary
+        product_sections: Dictionary of {ProductName: [usage records]}
+        include_bills: Whether to fill the bill summary (rows 12-30)
+        include_products: Whether to write the product detail sections
+        username: User named in the "Report Generated by" line
+        rate_book: RateBook with the subscriber's rates; loaded when not given
+    
+    Raises:
+        ReportJobError: If the Excel template cannot be loaded
+    """
+    # Format the dates for display in the report (DD/MM/YYYY)
+    start_date_display = start_date.strftime('%d/%m/%Y')
+    end_date_display = end_date.strftime('%d/%m/%Y')
+    
+    try:
+        template_path = os.path.join(settings.MEDIA_ROOT, 'Templateuse.xlsx')
+        wb = openpyxl.load_workbook(template_path)
+        track_column_widths(wb)
+        ws = wb.active
+    except Exception as e:
+        logger.error(f"Error loading Excel template: {str(e)}")
+        raise ReportJobError(f"Error loading Excel template: {str(e)}")
+    
+    # Look for "Productname" cell to identify where to put the dynamic product name
+    product_name_cell = None
+    for row in range(30, 35):  # Search rows 30-34
+        for col in range(1, 10):  # Search columns A-I
+            cell_value = ws.cell(row=row, column=col).value
+            if cell_value and "product" in str(cell_value).lower():
+                product_name_cell = (row, col)
+                break
+        if product_name_cell:
+            break
+
+    # Write subscriber info directly to cells using the safe method
+    # For row 2, which is merged from H to P, we need to set the value to the first cell in the merged range
+    # First, find the merged range that contains row 2
+    row2_merged_range = next(
+        (merged_range for merged_range in get_merged_index(ws).ranges_in_row(2)
+         if merged_range.min_row == 2 and merged_range.max_row == 2),
+        None
+    )
+
+    # If we found a merged range for row 2, set the value with the required format on its first cell
+    if row2_merged_range:
+        new_content = f"FirstCentral NIGERIA - BILLING DETAILS - {subscriber_name}"
+        write_to_cell(ws, 2, row2_merged_range.min_col, new_content)
+    else:
+        # Fallback to the original method if no merged range is found
+        safe_cell_assignment(ws, 2, 5, subscriber_name)  # E2
+
+    safe_cell_assignment(ws, 5, 4, f"BILLING DETAILS - {subscriber_name}")  # D5
+
+    # For row 6, which is merged from B to Q, we need to set the value to the first cell in the merged range
+    # First, find the merged range that contains row 6
+    row6_merged_range = next(
+        (merged_range for merged_range in get_merged_index(ws).ranges_in_row(6)
+         if merged_range.min_row == 6 and merged_range.max_row == 6),
+        None
+    )
+
+    # If we found a merged range for row 6, set the value on its first cell
+    date_range_text = f"REPORT GENERATED FOR RECORDS BETWEEN {start_date_display} and {end_date_display}"
+    if row6_merged_range:
+        # Set the value to the first cell in the merged range (column B = 2)
+        write_to_cell(ws, 6, 2, date_range_text)
+    else:
+        # Fallback to the original method if no merged range is found
+        safe_cell_assignment(ws, 6, 4, date_range_text)  # D6
+
+
+
+    if include_bills:
+        # Write quantities (I), rates (M) and amounts (P) for rows 12-30
+        if rate_book is None:
+            rate_book = RateBook.for_subscriber(subscriber_name)
+        populate_bill_summary(ws, summary_bills, rate_book, subscriber_name)
+
+
+
+    # Large reports keep the template header but stream rows 36+ through a write-only workbook
+    streamed = include_products and should_stream_report(sum(len(records) for records in product_sections.values()))
+    if streamed:
+        stream_product_sections(wb, product_sections, username, target)
+
+    if include_products and not streamed:
+        start_row_offset = 36  # Initial start row for product sections on Sheet1
+        current_sheet = ws
+        sheet2 = wb["Sheet2"] if "Sheet2" in wb.sheetnames else None
+
+        # Sort product_sections by product_name
+        sorted_product_names = sorted(product_sections.keys())
+
+        # First, find the original product name cell in the template (rows 32-35)
+        product_name_cell = None
+        for row in range(32, 36):  # Rows 32-35 (inclusive)
+            for col in range(1, 16):  # Assuming columns A-O are important
+                cell_value = ws.cell(row=row, column=col).value
+                if cell_value and "product" in str(cell_value).lower():
+                    product_name_cell = (row, col)
+                    break
+            if product_name_cell:
+                break
+
+        # Save the template header structure (rows 32-35) for subsequent products
+        header_template = []
+        header_rows = (32, 35)  # Range of rows to copy for the header template
+        for row in range(header_rows[0], header_rows[1] + 1):
+            row_data = []
+            for col in range(1, 16):  # Assuming columns A-O are important
+                cell = ws.cell(row=row, column=col)
+                # Store cell value and position only - we'll copy styles directly later
+                cell_info = {
+                    'value': cell.value,
+                    'position': (row, col)
+                }
+                # Check if cell is the top-left cell of a merged range
+                m_range = get_merged_index(ws).find(row, col)
+                if m_range is not None and is_anchor(m_range, row, col):
+                    cell_info['merged'] = (m_range.max_row - m_range.min_row + 1, 
+                                          m_range.max_col - m_range.min_col + 1)
+                row_data.append(cell_info)
+            header_template.append(row_data)
+
+        # Set data row start - will be used for first product                
+        data_start_row = 36  # Initial start for data rows after template header
+
+        # Format template row 36 once; every data row is stamped from it
+        data_row_stamp = compile_data_row_stamp(ws)
+        lastProduct = ""
+
+        # For each product, use appropriate header section
+        for product_idx, product_name in enumerate(sorted_product_names):
+            product_records = product_sections[product_name]
+
+            if product_idx == 0:
+                # For first product, use the existing template header
+                if product_name_cell:
+                    row, col = product_name_cell
+                    # Replace "Product Name" with actual first product name in template
+                    safe_cell_assignment(ws, row, col, product_name)
+                current_sheet = ws
+                current_row_offset = data_start_row  # Start data at row 36
+                serial_number_base = data_start_row - 1
+            else:
+                # Add space between different products (extra spacing)
+                current_row_offset += 4  # Add significant spacing between products
+
+                # Create new header for subsequent products
+                header_start_row = current_row_offset
+
+                # Clone the header section for this product
+                for template_row_idx, template_row in enumerate(header_template):
+                    target_row = header_start_row + template_row_idx
+
+                    # Ensure we're not past row limits
+                    if current_sheet == ws and target_row > 1000000 and sheet2:
+                        current_sheet = sheet2
+                        # Reset for Sheet2
+                        header_start_row = 13
+                        target_row = header_start_row + template_row_idx
+
+                    # Unmerge any existing merged cells in the target area
+                    for m_range in get_merged_index(current_sheet).ranges_in_row(target_row):
+                        unmerge_range(current_sheet, m_range)
+
+                    # Copy each cell from the template to the target area
+                    for col_idx, cell_info in enumerate(template_row):
+                        target_col = col_idx + 1
+                        target_cell = current_sheet.cell(row=target_row, column=target_col)
+
+                        # Copy styles directly from the original cell
+                        original_row, original_col = cell_info['position']
+                        original_cell = ws.cell(row=original_row, column=original_col)
+
+                        # Copy cell format using openpyxl's built-in method
+                        target_cell._style = copy(original_cell._style)
+
+                        # Set value using safe_cell_assignment to handle merged cells properly
+                        if template_row_idx == product_name_cell[0] - header_rows[0] and \
+                           col_idx == product_name_cell[1] - 1:
+                            # For the product name cell, use the safe assignment method
+                            safe_cell_assignment(current_sheet, target_row, target_col, product_name)
+                        elif cell_info['value'] is not None:
+                            # For other cells with values, use the safe assignment method
+                            safe_cell_assignment(current_sheet, target_row, target_col, cell_info['value'])
+
+                        # Recreate merged cells
+                        if 'merged' in cell_info:
+                            rows, cols = cell_info['merged']
+                            plan_merge(
+                                current_sheet,
+                                target_row, 
+                                target_col,
+                                target_row + rows - 1, 
+                                target_col + cols - 1
+                            )
+
+                # Update data start row to be after this new header
+                current_row_offset = header_start_row + (header_rows[1] - header_rows[0] + 1)
+                serial_number_base = current_row_offset - 1
+
+                # Add header for the data section
+                safe_cell_assignment(current_sheet, current_row_offset - 1, 4, "Unique Tracking Number")
+                get_width_tracker(current_sheet).observe_rows(header_start_row, current_row_offset - 1)
+
+            # Process data records for this product
+            for record_idx, record in enumerate(product_records):
+                current_row = current_row_offset + record_idx
+
+                # Switch to Sheet2 when reaching max row (like VBA)
+                if current_row > 1000000 and sheet2 and current_sheet != sheet2:
+                    current_sheet = sheet2
+                    current_row_offset = 13  # Reset row offset for Sheet2 as per VBA
+                    serial_number_base = 12  # Reset serial number base for Sheet2
+                    current_row = current_row_offset + record_idx  # Recalculate current_row for Sheet2
+
+                # Stamp the precompiled template data row format (styles, merges, height)
+                data_row_stamp.apply(current_sheet, current_row)
+
+                # Now assign values as before
+                safe_cell_assignment(current_sheet, current_row, 2, current_row - serial_number_base)  # Serial Number
+                safe_cell_assignment(current_sheet, current_row, 3, "")  # Branch ID
+                safe_cell_assignment(current_sheet, current_row, 4, "")  # Unique Tracking Number column left blank
+                safe_cell_assignment(current_sheet, current_row, 5, record['SubscriberName'])
+                safe_cell_assignment(current_sheet, current_row, 7, record['SystemUser'] if record['SystemUser'] else "")
+                # Format SubscriberEnquiryDate
+                subscriber_enquiry_date = record['SubscriberEnquiryDate']
+                if subscriber_enquiry_date:
+
+                    if isinstance(subscriber_enquiry_date, str):
+                        date_str = subscriber_enquiry_date
+                    else:
+                        # Convert to date object first to remove any time component
+                        if hasattr(subscriber_enquiry_date, 'date'):
+                            date_only = subscriber_enquiry_date.date()
+                        else:
+                            date_only = subscriber_enquiry_date
+                        date_str = date_only.strftime('%Y-%m-%d')
+                    # Set cell format to text BEFORE assignment to prevent Excel from adding time component
+                    current_sheet.cell(row=current_row, column=10).number_format = '@'
+                    safe_cell_assignment(current_sheet, current_row, 10, date_str)
+                    # Ensure the format stays as text after assignment
+                    current_sheet.cell(row=current_row, column=10).number_format = '@'
+                else:
+                    safe_cell_assignment(current_sheet, current_row, 10, "")
+                safe_cell_assignment(current_sheet, current_row, 11, record['ProductName'])
+                # Format DetailsViewedDate to match SubscriberEnquiryDate format
+                details_viewed_date = record['DetailsViewedDate']
+                if details_viewed_date:
+                    if isinstance(details_viewed_date, str):
+                        date_str = details_viewed_date
+                    else:
+                        # Convert to date object first to remove any time component
+                        if hasattr(details_viewed_date, 'date'):
+                            date_only = details_viewed_date.date()
+                        else:
+                            date_only = details_viewed_date
+                        date_str = date_only.strftime('%Y-%m-%d')
+                    # Set cell format to text BEFORE assignment to prevent Excel from adding time component
+                    current_sheet.cell(row=current_row, column=12).number_format = '@'
+                    safe_cell_assignment(current_sheet, current_row, 12, date_str)
+                    # Ensure the format stays as text after assignment
+                    current_sheet.cell(row=current_row, column=12).number_format = '@'
+                else:
+                    safe_cell_assignment(current_sheet, current_row, 12, "")
+                safe_cell_assignment(current_sheet, current_row, 15, record['SearchOutput'] if record['SearchOutput'] else "")
+                get_width_tracker(current_sheet).observe_row(current_row)
+
+            # Move offset to after this product's data for next product
+            current_row_offset += len(product_records)
+
+            # Set lastProduct for the next iteration
+            lastProduct = product_name
+
+    if not streamed:
+        # Auto-size columns for better readability
+        for sheet in wb.worksheets:
+            auto_size_columns(sheet)
+
+        # Add 'Generated by: <username>' to the first available merged O-Q row, or row 8 if none, with bold and italic formatting
+        # Without product sections the line goes below the bill summary (rows 12-30)
+        last_data_row = current_row_offset - 1 if include_products and product_sections else 30
+        add_generated_by(ws, username, last_data_row)
+
+        # Apply the merges recorded while rendering, then save workbook to target
+        apply_merge_plans(wb)
+        wb.save(target)
+
+
+def generate_single_report_file(subscriber_id, start_date, end_date, include_bills, include_products, username):
+    """
+    Query one subscriber's usage for the period, build the report and store it
+    under MEDIA_ROOT/reports/single.
+    
+    Returns:
+        Download URL of the generated .xlsx
+    
+    Raises:
+        ReportJobError: If there is no data for the period or the template cannot be loaded
+    """
+    start_date_display = start_date.strftime('%d/%m/%Y')
+    end_date_display = end_date.strftime('%d/%m/%Y')
+    
+    # Fetch data using Django ORM
+    if include_bills:
+        # Query for summary bills using Django ORM
+        queryset = Usagereport.objects.filter(
+            DetailsViewedDate__gte=start_date,
+            DetailsViewedDate__lte=end_date,
+            SubscriberName=subscriber_id
+        )
+        
+        # Count every bill bucket in one conditional-aggregate query
+        summary_bills = summarise_bill_counts(queryset)
+    else:
+        summary_bills = {}
+
+    # Query for product details using Django ORM
+    product_sections = {}
+    if include_products:
+        product_data = Usagereport.objects.filter(
+            DetailsViewedDate__gte=start_date,
+            DetailsViewedDate__lte=end_date,
+            SubscriberName=subscriber_id
+        ).order_by('ProductName', 'DetailsViewedDate').values(
+            'SubscriberName', 'SystemUser', 'SearchIdentity', 'SubscriberEnquiryDate',
+            'SearchOutput', 'DetailsViewedDate', 'ProductInputed', 'ProductName'
+        )
+        
+        # Group by ProductName
+        for record in product_data:
+            product_name = record['ProductName']
+            if product_name not in product_sections:
+                product_sections[product_name] = []
+            product_sections[product_name].append(record)
+        
+        if not product_sections:
+            raise ReportJobError(f"No data found for subscriber {subscriber_id} between {start_date_display} and {end_date_display}.")
+
+    buffer = io.BytesIO()
+    build_report_workbook(
+        buffer, subscriber_id, start_date, end_date, summary_bills, product_sections,
+        include_bills, include_products, username
+    )
+    
+    # Generate filename and create directory if it doesn't exist
+    month_year = start_date.strftime('%B%Y')
+    clean_subscriber = clean_filename(subscriber_id)
+    filename = f"{clean_subscriber}_{month_year}_{uuid.uuid4().hex[:8]}.xlsx"
+    single_reports_dir = os.path.join(settings.MEDIA_ROOT, 'reports', 'single')
+    os.makedirs(single_reports_dir, exist_ok=True)
+    file_path = os.path.join(single_reports_dir, filename)
+    
+    # Write buffer contents to file using getvalue() to get entire content regardless of position
+    with open(file_path, 'wb') as f:
+        f.write(buffer.getvalue())
+    return settings.MEDIA_URL + f'reports/single/{filename}'
+
+def render_subscriber_report(target_path, subscriber_name, start_date, end_date, summary_bills, usage,
+                             include_bills, include_products, username, rate_book):
+    """
+    Render one subscriber's workbook for a bulk run into target_path and return the path.
+    Runs in the bulk worker processes, so it only touches the data it is given;
+    usage arrives as a columnar UsageBatch and is expanded into product sections here.
+    """
+    product_sections = {}
+    if include_products:
+        # Sort by ProductName and DetailsViewedDate, then group by ProductName
+        product_sections = usage.sort_by('ProductName', 'DetailsViewedDate').group_records('ProductName')
+    
+    with open(target_path, 'wb') as target:
+        build_report_workbook(
+            target, subscriber_name, start_date, end_date, summary_bills, product_sections,
+            include_bills, include_products, username, rate_book=rate_book
+        )
+    return target_path
+
+def generate_bulk_report_file(subscribers_list, start_date, end_date, include_bills, include_products, username):
+    """
+    Build one report per subscriber for the period and store them as a zip
+    under MEDIA_ROOT/reports/bulk. Workbooks are rendered in a process pool
+    (REPORT_BULK_WORKERS) as soon as each subscriber's usage rows have been
+    streamed from the database, written to temporary files and copied into the
+    zip on disk in subscriber order, so memory is bounded by the subscribers in
+    flight rather than the whole period. A subscriber that fails is skipped and noted.
+    
+    Returns:
+        Tuple of (download URL, processed subscriber names, list of notes for skipped subscribers)
+    
+    Raises:
+        ReportJobError: If no report could be generated or the template cannot be loaded
+    """
+    start_date_display = start_date.strftime('%d/%m/%Y')
+    end_date_display = end_date.strftime('%d/%m/%Y')
+    
+    # Fetch all custom product rates in one query
+    logger.info("Fetching all custom product rates...")
+    rate_book = RateBook.for_subscribers(subscribers_list)
+    logger.info(f"Loaded {len(rate_book)} custom rates")
+    
+    # Workers write each workbook to a scratch file that is then copied into the zip
+    work_dir = tempfile.mkdtemp(prefix='bulkrep_')
+    notes = []
+    
+    def make_job(subscriber_name, usage):
+        # Count bills here; workers group the columnar usage batch and render the workbooks
+        if include_bills:
+            # Count rows per distinct ProductName, then classify each name once
+            summary_bills = summarise_product_counts(usage.count_by('ProductName'))
+        else:
+            summary_bills = {}
+        
+        return {
+            'target_path': os.path.join(work_dir, f"{uuid.uuid4().hex}.xlsx"),
+            'subscriber_name': subscriber_name,
+            'start_date': start_date,
+            'end_date': end_date,
+            'summary_bills': summary_bills,
+            'usage': usage,
+            'include_bills': include_bills,
+            'include_products': include_products,
+            'username': username,
+            'rate_book': rate_book.subset(subscriber_name),
+        }
+    
+    def bulk_jobs():
+        # Stream usage one subscriber at a time so only the groups being rendered stay in memory
+        logger.info(f"Streaming usage data for {len(subscribers_list)} subscribers...")
+        requested = set(subscribers_list)
+        seen = set()
+        record_count = 0
+        for subscriber_name, usage in iter_subscriber_usage(subscribers_list, start_date, end_date):
+            if subscriber_name not in requested:
+                continue
+            logger.info(f"Processing subscriber: {subscriber_name}")
+            seen.add(subscriber_name)
+            record_count += len(usage)
+            yield make_job(subscriber_name, usage)
+        logger.info(f"Streamed {record_count} usage records")
+        
+        # Subscribers without usage still get a bills-only report; product reports need rows
+        for subscriber_name in subscribers_list:
+            if subscriber_name in seen:
+                continue
+            if include_products:
+                notes.append(f"No data found for subscriber {subscriber_name} between {start_date_display} and {end_date_display}.")
+            else:
+                logger.info(f"Processing subscriber: {subscriber_name}")
+                yield make_job(subscriber_name, UsageBatch.from_rows([]))
+    
+    # Render the workbooks in a process pool as each subscriber's rows arrive
+    workers = bulk_worker_count(len(subscribers_list))
+    logger.info(f"Rendering subscriber reports with {workers} worker(s)")
+    
+    # Write the zip straight to its final location, one entry at a time
+    month_year = start_date.strftime('%B%Y')
+    zip_filename = f"all_subscriber_reports_{month_year}_{uuid.uuid4().hex[:8]}.zip"
+    bulk_reports_dir = os.path.join(settings.MEDIA_ROOT, 'reports', 'bulk')
+    os.makedirs(bulk_reports_dir, exist_ok=True)
+    zip_path = os.path.join(bulk_reports_dir, zip_filename)
+    partial_path = zip_path + '.part'
+    processed_subscribers = []
+    
+    try:
+        # xlsx files are already deflated, so entries are stored rather than compressed again;
+        # allowZip64 lets month-end archives grow past 4 GB
+        with zipfile.ZipFile(partial_path, 'w', zipfile.ZIP_STORED, allowZip64=True) as zip_file:
+            for job, workbook_path, error in run_ordered(render_subscriber_report, bulk_jobs(), workers):
+                subscriber_name = job['subscriber_name']
+                if isinstance(error, ReportJobError):
+                    # The template itself is unusable, so no other subscriber can succeed either
+                    raise error
+                if error is not None:
+                    logger.error(f"Error processing subscriber {subscriber_name}: {str(error)}")
+                    notes.append(f"Skipped report for {subscriber_name} due to error: {str(error)}")
+                    continue
+                
+                # Prepare filename using the subscriber name
+                clean_subscriber = clean_filename(subscriber_name)
+                filename = f"{clean_subscriber}_{month_year}.xlsx"
+                
+                # Copy the workbook into the zip in chunks, then drop the scratch file
+                zip_file.write(workbook_path, filename)
+                os.remove(workbook_path)
+                
+                # Add to processed subscribers list
+                processed_subscribers.append(subscriber_name)
+        
+        if not processed_subscribers:
+            raise ReportJobError(" ".join(
+                ["No reports were generated. Please check the data or try different criteria."] + notes
+            ))
+        os.replace(partial_path, zip_path)
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        shutil.rmtree(work_dir, ignore_errors=True)
+    
+    download_url = settings.MEDIA_URL + f'reports/bulk/{zip_filename}'
+    return download_url, processed_subscribers, notes
+
+def report_job_context(report_gen):
+    """Template context for download_ready.html, which polls the job until the file exists."""
+    return {
+        'report': report_gen,
+        'download_url': report_gen.download_url if report_gen.status == 'success' else None,
+        'status_url': reverse('bulkrep:report_status', args=[report_gen.pk]),
+    }
+
+def report_job_payload(report_gen):
+    """JSON body describing the state of a report job."""
+    return {
+        'id': report_gen.pk,
+        'status': report_gen.status,
+        'ready': report_gen.status == 'success' and bool(report_gen.download_url),
+        'download_url': report_gen.download_url if report_gen.status == 'success' else None,
+        'message': report_gen.status_message,
+        'error': report_gen.error_message if report_gen.status == 'failed' else None,
+    }
+
+@login_required
+def report_status(request, report_id):
+    """Status endpoint for a background report job, polled by download_ready.html."""
+    report_gen = ReportGeneration.objects.filter(pk=report_id).first()
+    if report_gen is None or (report_gen.user_id != request.user.id and not request.user.is_superuser):
+        return JsonResponse({'error': 'Report not found'}, status=404)
+    return JsonResponse(report_job_payload(report_gen))
+
 @login_required
 def get_subscriber_product_rate(subscriber_name, product_name, default_rate_key, logger=None):
     """Helper function to get subscriber product rate with better error handling."""
@@ -1477,7 +1228,7 @@ def get_subscriber_product_rate(subscriber_name, product_name, default_rate_key,
         return rate
 
 
-def get_subscriber_product_rate_safe(subscriber_name, product_name, default_rate_map, default_rate_key, logger=None):
+def get_subscriber_product_rate_safe(subscriber_name, product_name, default_rate_map, default_rate_key, logger=None, rate_book=None):
     """Safe helper function to get subscriber product rate with better error handling for multiple records.
     
     Args:
@@ -1486,6 +1237,7 @@ def get_subscriber_product_rate_safe(subscriber_name, product_name, default_rate
         default_rate_map: Dictionary of default rates (ENQUIRY_RATES or PRODUCT_RATES)
         default_rate_key: Key to use in the default_rate_map
         logger: Optional logger object
+        rate_book: Optional pre-loaded RateBook; pass one when looking up many rates
     
     Returns:
         Decimal rate value
@@ -1494,30 +1246,12 @@ def get_subscriber_product_rate_safe(subscriber_name, product_name, default_rate
         logger = logging.getLogger(__name__)
         
     try:
-        # Use filter().first() instead of get() to avoid MultipleObjectsReturned
-        rate_obj = SubscriberProductRate.objects.filter(
-            subscriber_name__iexact=subscriber_name, 
-            product_name__iexact=product_name
-        ).first()
+        if rate_book is None:
+            rate_book = RateBook.for_subscriber(subscriber_name)
         
-        if rate_obj and hasattr(rate_obj, 'rate'):
-            # Ensure we're returning a Decimal object
-            if isinstance(rate_obj.rate, Decimal):
-                rate = rate_obj.rate
-            else:
-                rate = Decimal(str(rate_obj.rate))
-            logger.debug(f"Using custom rate for {subscriber_name} - {product_name}: {rate}")
-            return rate
-        else:
-            # No custom rate found, use default
-            default_value = default_rate_map.get(default_rate_key, Decimal('0.00'))
-            # Ensure default value is converted to Decimal
-            if not isinstance(default_value, Decimal):
-                rate = Decimal(str(default_value))
-            else:
-                rate = default_value
-            logger.debug(f"No custom rate found. Using default rate for {product_name}: {rate}")
-            return rate
+        rate = rate_book.rate(subscriber_name, product_name, default_rate_map, default_rate_key)
+        logger.debug(f"Using rate for {subscriber_name} - {product_name}: {rate}")
+        return rate
     except Exception as e:
         # Handle any unexpected errors
         logger.error(f"Error retrieving rate for {subscriber_name} - {product_name}: {e}")
@@ -1616,644 +1350,23 @@ def bulk_report(request):
             messages.error(request, 'No valid subscribers selected.')
             return render(request, 'bulkrep/bulk_report.html', context)
             
-        # Remove any empty strings just in case
-        subscribers_list = list(filter(None, set(subscribers_list)))
+        # Remove any empty strings just in case; sorted so zip entries come out in a stable order
+        subscribers_list = sorted(filter(None, set(subscribers_list)))
         
         if not subscribers_list:
             messages.warning(request, f"No subscribers found for the selected criteria between {start_date_display} and {end_date_display}.")
             return render(request, 'bulkrep/bulk_report.html', context)
 
-        # OPTIMIZATION: Fetch all usage data and product rates upfront to eliminate N+1 queries
-        print(f"Fetching all usage data for {len(subscribers_list)} subscribers...")
-        
-        # Fetch all usage data in one query
-        all_usage_data = list(Usagereport.objects.filter(
-            DetailsViewedDate__gte=start_date,
-            DetailsViewedDate__lte=end_date,
-            SubscriberName__in=subscribers_list
-        ).values(
-            'SubscriberName', 'ProductName', 'SystemUser', 'SearchIdentity', 
-            'SubscriberEnquiryDate', 'SearchOutput', 'DetailsViewedDate', 
-            'ProductInputed'
-        ))
-        
-        # Group usage data by subscriber for instant lookup
-        usage_by_subscriber = {}
-        for record in all_usage_data:
-            subscriber = record['SubscriberName']
-            if subscriber not in usage_by_subscriber:
-                usage_by_subscriber[subscriber] = []
-            usage_by_subscriber[subscriber].append(record)
-        
-        # Fetch all custom product rates in one query
-        print(f"Fetching all custom product rates...")
-        all_custom_rates = list(SubscriberProductRate.objects.filter(
-            subscriber_name__in=subscribers_list
-        ).values('subscriber_name', 'product_name', 'rate'))
-        
-        # Create lookup dictionary for custom rates: {(subscriber, product): rate}
-        custom_rates_lookup = {}
-        for rate_record in all_custom_rates:
-            key = (rate_record['subscriber_name'].lower(), rate_record['product_name'].lower())
-            custom_rates_lookup[key] = Decimal(str(rate_record['rate']))
-        
-        print(f"Loaded {len(all_usage_data)} usage records and {len(all_custom_rates)} custom rates")
-        
-        # Helper function to get custom rate with fallback to default
-        def get_custom_rate(subscriber_name, product_name, default_rate):
-            """Get custom rate for subscriber/product with fallback to default rate."""
-            key = (subscriber_name.lower(), product_name.lower())
-            return custom_rates_lookup.get(key, Decimal(str(default_rate)))
-        
-        # Generate reports for all selected subscribers using a zip file
-        try:
-            template_path = os.path.join(settings.MEDIA_ROOT, 'Templateuse.xlsx')
-            zip_buffer = io.BytesIO()
-            
-            with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-                processed_subscribers = []
-                
-                for subscriber_name in subscribers_list:
-                    try:
-                        # Log which subscriber we're processing
-                        print(f"Processing subscriber: {subscriber_name}")
-                        
-                        # OPTIMIZED: Use pre-fetched data instead of database queries
-                        subscriber_usage_data = usage_by_subscriber.get(subscriber_name, [])
-                        
-                        if include_bills:
-                            # Initialize summary dictionary with all possible keys
-                            summary_bills = {
-                                'consumer_snap_check': 0,
-                                'consumer_basic_trace': 0,
-                                'consumer_basic_credit': 0,
-                                'consumer_detailed_credit': 0,
-                                'xscore_consumer_credit': 0,
-                                'commercial_basic_trace': 0,
-                                'commercial_detailed_credit': 0,
-                                'enquiry_report': 0,
-                                'consumer_dud_cheque': 0,
-                                'commercial_dud_cheque': 0,
-                                'director_basic_report': 0,
-                                'director_detailed_report': 0
-                            }
-                            
-                            # Count each product type using Python filtering (much faster than DB queries)
-                            for record in subscriber_usage_data:
-                                product_name = record['ProductName']
-                                if 'Snap Check' in product_name:
-                                    summary_bills['consumer_snap_check'] += 1
-                                elif 'Basic Trace' in product_name:
-                                    summary_bills['consumer_basic_trace'] += 1
-                                elif 'Basic Credit' in product_name:
-                                    summary_bills['consumer_basic_credit'] += 1
-                                elif 'Detailed Credit' in product_name and 'X-SCore' not in product_name:
-                                    summary_bills['consumer_detailed_credit'] += 1
-                                elif 'X-SCore Consumer Detailed Credit' in product_name:
-                                    summary_bills['xscore_consumer_credit'] += 1
-                                elif 'Commercial Basic Trace' in product_name:
-                                    summary_bills['commercial_basic_trace'] += 1
-                                elif 'Commercial detailed Credit' in product_name:
-                                    summary_bills['commercial_detailed_credit'] += 1
-                                elif 'Enquiry Report' in product_name:
-                                    summary_bills['enquiry_report'] += 1
-                                elif 'Consumer Dud Cheque' in product_name:
-                                    summary_bills['consumer_dud_cheque'] += 1
-                                elif 'Commercial Dud Cheque' in product_name:
-                                    summary_bills['commercial_dud_cheque'] += 1
-                                elif 'Director Basic Report' in product_name:
-                                    summary_bills['director_basic_report'] += 1
-                                elif 'Director Detailed Report' in product_name:
-                                    summary_bills['director_detailed_report'] += 1
-                        else:
-                            summary_bills = {}
-
-                        # OPTIMIZED: Use pre-fetched data for product details
-                        if include_products:
-                            # Sort the data by ProductName and DetailsViewedDate
-                            product_data = sorted(subscriber_usage_data, key=lambda x: (x['ProductName'], x['DetailsViewedDate']))
-                            
-                            # Group by ProductName
-                            product_sections = {}
-                            for record in product_data:
-                                product_name = record['ProductName']
-                                if product_name not in product_sections:
-                                    product_sections[product_name] = []
-                                product_sections[product_name].append(record)
-                        else:
-                            product_sections = {}
-                            product_data = []
-
-                        if not product_data and include_products:
-                            messages.warning(request, f"No data found for subscriber {subscriber_name} between {start_date_display} and {end_date_display}.")
-                            continue
-
-                        # Generate Excel report
-                        try:
-                            template_path = os.path.join(settings.MEDIA_ROOT, 'Templateuse.xlsx')
-                            excel_buffer = io.BytesIO()
-                            wb = openpyxl.load_workbook(template_path)
-                            ws = wb.active
-                        except Exception as e:
-                            logger.error(f"Error loading Excel template: {str(e)}")
-                            messages.error(request, f"Error loading Excel template: {str(e)}")
-                            return render(request, 'bulkrep/bulk_report.html', context)
-                        try:
-                            # Look for "Productname" cell to identify where to put the dynamic product name
-                            product_name_cell = None
-                            for row in range(30, 35):  # Search rows 30-34
-                                for col in range(1, 10):  # Search columns A-I
-                                    cell_value = ws.cell(row=row, column=col).value
-                                    if cell_value and "product" in str(cell_value).lower():
-                                        try:
-                                            product_name_cell = (row, col)
-                                        except Exception as e:
-                                            logger.error(f"Error finding product name cell: {str(e)}")
-                                            messages.error(request, f"Error finding product name cell: {str(e)}")
-                                            return render(request, 'bulkrep/single_report.html', context)
-                                        break
-                                if product_name_cell:
-                                    break
-                            
-                            # Write subscriber info directly to cells using the safe method
-                            # For row 2, which is merged from H to P, we need to set the value to the first cell in the merged range
-                            # First, find the merged range that contains row 2
-                            row2_merged_range = None
-                            for merged_range in list(ws.merged_cells.ranges):
-                                if merged_range.min_row == 2 and merged_range.max_row == 2:
-                                    row2_merged_range = merged_range
-                                    break
-                            
-                            # If we found a merged range for row 2, unmerge it, set the value with the required format, and remerge it
-                            if row2_merged_range:
-                                merged_range_str = str(row2_merged_range)
-                                ws.unmerge_cells(merged_range_str)
-                                # Set the value to the first cell in the merged range with the required format
-                                original_cell = ws.cell(row=2, column=row2_merged_range.min_col)
-                                new_content = f"FirstCentral NIGERIA - BILLING DETAILS - {subscriber_name}"
-                                original_cell.value = new_content
-                                
-                                # Remerge the cells
-                                ws.merge_cells(merged_range_str)
-                            else:
-                                # Fallback to the original method if no merged range is found
-                                safe_cell_assignment(ws, 2, 5, subscriber_name)  # E2
-                            
-                            safe_cell_assignment(ws, 5, 4, f"BILLING DETAILS - {subscriber_name}")  # D5
-                            
-                            # For row 6, which is merged from B to Q, we need to set the value to the first cell in the merged range
-                            # First, find the merged range that contains row 6
-                            row6_merged_range = None
-                            for merged_range in list(ws.merged_cells.ranges):
-                                if merged_range.min_row == 6 and merged_range.max_row == 6:
-                                    row6_merged_range = merged_range
-                                    break
-                            
-                            # If we found a merged range for row 6, unmerge it, set the value, and remerge it
-                            date_range_text = f"REPORT GENERATED FOR RECORDS BETWEEN {start_date_display} and {end_date_display}"
-                            if row6_merged_range:
-                                merged_range_str = str(row6_merged_range)
-                                ws.unmerge_cells(merged_range_str)
-                                # Set the value to the first cell in the merged range (column B = 2)
-                                ws.cell(row=6, column=2).value = date_range_text
-                                # Remerge the cells
-                                ws.merge_cells(merged_range_str)
-                            else:
-                                # Fallback to the original method if no merged range is found
-                                safe_cell_assignment(ws, 6, 4, date_range_text)  # D6
-                                
-                            
-                            
-                            if include_bills:
-                                # Set quantities in column I (existing code)
-                                safe_cell_assignment(ws, 12, 9, summary_bills.get('consumer_snap_check', 0) or 0)  # I12
-                                safe_cell_assignment(ws, 13, 9, summary_bills.get('consumer_basic_trace', 0) or 0)  # I13
-                                safe_cell_assignment(ws, 14, 9, summary_bills.get('consumer_basic_credit', 0) or 0)  # I14
-                                safe_cell_assignment(ws, 15, 9, summary_bills.get('consumer_detailed_credit', 0) or 0)  # I15
-                                safe_cell_assignment(ws, 16, 9, summary_bills.get('xscore_consumer_credit', 0) or 0)  # I16
-                                safe_cell_assignment(ws, 17, 9, summary_bills.get('commercial_basic_trace', 0) or 0)  # I17
-                                safe_cell_assignment(ws, 18, 9, summary_bills.get('commercial_detailed_credit', 0) or 0)  # I18
-                                safe_cell_assignment(ws, 20, 9, summary_bills.get('enquiry_report', 0) or 0)  # I20
-                                safe_cell_assignment(ws, 22, 9, summary_bills.get('consumer_dud_cheque', 0) or 0)  # I22
-                                safe_cell_assignment(ws, 23, 9, summary_bills.get('commercial_dud_cheque', 0) or 0)  # I23
-                                safe_cell_assignment(ws, 25, 9, summary_bills.get('director_basic_report', 0) or 0)  # I25
-                                safe_cell_assignment(ws, 26, 9, summary_bills.get('director_detailed_report', 0) or 0)  # I26
-                                
-                                # OPTIMIZED: Set rates in column M (13) using pre-fetched lookup
-                                
-                                # Consumer Snap Check (row 12)
-                                custom_rate = get_custom_rate(subscriber_name, 'Consumer Snap Check', ENQUIRY_RATES['consumer_snap_check'])
-                                safe_cell_assignment(ws, 12, 13, f"₦{custom_rate:,.2f}")  # M12
-                                
-                                # Consumer Basic Trace (row 13)
-                                custom_rate = get_custom_rate(subscriber_name, 'Consumer Basic Trace', ENQUIRY_RATES['consumer_basic_trace'])
-                                safe_cell_assignment(ws, 13, 13, f"₦{custom_rate:,.2f}")  # M13
-                                
-                                # Consumer Basic Credit (row 14)
-                                custom_rate = get_custom_rate(subscriber_name, 'Consumer Basic Credit', ENQUIRY_RATES['consumer_basic_credit'])
-                                safe_cell_assignment(ws, 14, 13, f"₦{custom_rate:,.2f}")  # M14
-                                
-                                # Consumer Detailed Credit (row 15)
-                                custom_rate = get_custom_rate(subscriber_name, 'Consumer Detailed Credit', ENQUIRY_RATES['consumer_detailed_credit'])
-                                safe_cell_assignment(ws, 15, 13, f"₦{custom_rate:,.2f}")  # M15
-                                
-                                # X-Score Consumer Credit (row 16)
-                                custom_rate = get_custom_rate(subscriber_name, 'X-Score Consumer Detailed Credit', ENQUIRY_RATES['xscore_consumer_credit'])
-                                safe_cell_assignment(ws, 16, 13, f"₦{custom_rate:,.2f}")  # M16
-                                
-                                # Commercial Basic Trace (row 17)
-                                custom_rate = get_custom_rate(subscriber_name, 'Commercial Basic Trace', ENQUIRY_RATES['commercial_basic_trace'])
-                                safe_cell_assignment(ws, 17, 13, f"₦{custom_rate:,.2f}")  # M17
-                                
-                                # Commercial Detailed Credit (row 18)
-                                custom_rate = get_custom_rate(subscriber_name, 'Commercial Detailed Credit', ENQUIRY_RATES['commercial_detailed_credit'])
-                                safe_cell_assignment(ws, 18, 13, f"₦{custom_rate:,.2f}")  # M18
-                                
-                                # Enquiry Report (row 20)
-                                custom_rate = get_custom_rate(subscriber_name, 'Enquiry Report', ENQUIRY_RATES['enquiry_report'])
-                                safe_cell_assignment(ws, 20, 13, f"₦{custom_rate:,.2f}")  # M20
-                                
-                                # Consumer Dud Cheque (row 22)
-                                custom_rate = get_custom_rate(subscriber_name, 'Consumer Dud Cheque', ENQUIRY_RATES['consumer_dud_cheque'])
-                                safe_cell_assignment(ws, 22, 13, f"₦{custom_rate:,.2f}")  # M22
-                                
-                                # Commercial Dud Cheque (row 23)
-                                custom_rate = get_custom_rate(subscriber_name, 'Commercial Dud Cheque', ENQUIRY_RATES['commercial_dud_cheque'])
-                                safe_cell_assignment(ws, 23, 13, f"₦{custom_rate:,.2f}")  # M23
-                                
-                                # Director Basic Report (row 25)
-                                custom_rate = get_custom_rate(subscriber_name, 'Director Basic Report', ENQUIRY_RATES['director_basic_report'])
-                                safe_cell_assignment(ws, 25, 13, f"₦{custom_rate:,.2f}")  # M25
-                                
-                                # Director Detailed Report (row 26)
-                                custom_rate = get_custom_rate(subscriber_name, 'Director Detailed Report', ENQUIRY_RATES['director_detailed_report'])
-                                safe_cell_assignment(ws, 26, 13, f"₦{custom_rate:,.2f}")  # M26
-                                            # Calculate and set amounts in column P (16) - merged from P to Q
-                                total_amount = 0
-                                
-                                # Store custom rates in a dictionary for easier reference
-                                custom_rates = {}
-                                
-                                # Calculate amounts (quantity × rate) and populate column P with Naira formatting
-                                # Use the optimized custom rate lookup
-                                
-                                # Consumer Snap Check
-                                custom_rate = get_custom_rate(subscriber_name, 'Consumer Snap Check', ENQUIRY_RATES['consumer_snap_check'])
-                                consumer_snap_amount = Decimal(str(summary_bills.get('consumer_snap_check', 0) or 0)) * custom_rate
-                                safe_cell_assignment(ws, 12, 16, f"₦{consumer_snap_amount:,.2f}")  # P12
-                                total_amount += consumer_snap_amount
-                                
-                                # Consumer Basic Trace
-                                custom_rate = get_custom_rate(subscriber_name, 'Consumer Basic Trace', ENQUIRY_RATES['consumer_basic_trace'])
-                                consumer_basic_trace_amount = Decimal(str(summary_bills.get('consumer_basic_trace', 0) or 0)) * custom_rate
-                                safe_cell_assignment(ws, 13, 16, f"₦{consumer_basic_trace_amount:,.2f}")  # P13
-                                total_amount += consumer_basic_trace_amount
-                                
-                                # Consumer Basic Credit
-                                custom_rate = get_custom_rate(subscriber_name, 'Consumer Basic Credit', ENQUIRY_RATES['consumer_basic_credit'])
-                                consumer_basic_credit_amount = Decimal(str(summary_bills.get('consumer_basic_credit', 0) or 0)) * custom_rate
-                                safe_cell_assignment(ws, 14, 16, f"₦{consumer_basic_credit_amount:,.2f}")  # P14
-                                total_amount += consumer_basic_credit_amount
-                                
-                                # Consumer Detailed Credit
-                                custom_rate = get_custom_rate(subscriber_name, 'Consumer Detailed Credit', ENQUIRY_RATES['consumer_detailed_credit'])
-                                consumer_detailed_credit_amount = Decimal(str(summary_bills.get('consumer_detailed_credit', 0) or 0)) * custom_rate
-                                safe_cell_assignment(ws, 15, 16, f"₦{consumer_detailed_credit_amount:,.2f}")  # P15
-                                total_amount += consumer_detailed_credit_amount
-                                
-                                # X-Score Consumer Credit
-                                custom_rate = get_custom_rate(subscriber_name, 'X-Score Consumer Detailed Credit', ENQUIRY_RATES['xscore_consumer_credit'])
-                                xscore_consumer_amount = Decimal(str(summary_bills.get('xscore_consumer_credit', 0) or 0)) * custom_rate
-                                safe_cell_assignment(ws, 16, 16, f"₦{xscore_consumer_amount:,.2f}")  # P16
-                                total_amount += xscore_consumer_amount
-                                
-                                # Commercial Basic Trace
-                                custom_rate = get_custom_rate(subscriber_name, 'Commercial Basic Trace', ENQUIRY_RATES['commercial_basic_trace'])
-                                commercial_basic_trace_amount = Decimal(str(summary_bills.get('commercial_basic_trace', 0) or 0)) * custom_rate
-                                safe_cell_assignment(ws, 17, 16, f"₦{commercial_basic_trace_amount:,.2f}")  # P17
-                                total_amount += commercial_basic_trace_amount
-                                
-                                # Commercial Detailed Credit
-                                custom_rate = get_custom_rate(subscriber_name, 'Commercial Detailed Credit', ENQUIRY_RATES['commercial_detailed_credit'])
-                                commercial_detailed_credit_amount = Decimal(str(summary_bills.get('commercial_detailed_credit', 0) or 0)) * custom_rate
-                                safe_cell_assignment(ws, 18, 16, f"₦{commercial_detailed_credit_amount:,.2f}")  # P18
-                                total_amount += commercial_detailed_credit_amount
-                                
-                                # Enquiry Report
-                                custom_rates['enquiry_report'] = get_custom_rate(subscriber_name, 'Enquiry Report', ENQUIRY_RATES['enquiry_report'])
-                                logger.debug(f"Using rate for {subscriber_name} - Enquiry Report: {custom_rates['enquiry_report']}")
-                                
-                                enquiry_report_amount = Decimal(str(summary_bills.get('enquiry_report', 0) or 0)) * custom_rates['enquiry_report']
-                                safe_cell_assignment(ws, 20, 16, f"₦{enquiry_report_amount:,.2f}")  # P20
-                                total_amount += enquiry_report_amount
-                                
-                                # Consumer Dud Cheque
-                                custom_rates['consumer_dud_cheque'] = get_custom_rate(subscriber_name, 'Consumer Dud Cheque', ENQUIRY_RATES['consumer_dud_cheque'])
-                                logger.debug(f"Using rate for {subscriber_name} - Consumer Dud Cheque: {custom_rates['consumer_dud_cheque']}")
-                                
-                                consumer_dud_amount = Decimal(str(summary_bills.get('consumer_dud_cheque', 0) or 0)) * custom_rates['consumer_dud_cheque']
-                                safe_cell_assignment(ws, 22, 16, f"₦{consumer_dud_amount:,.2f}")  # P22
-                                total_amount += consumer_dud_amount
-                                
-                                # Commercial Dud Cheque
-                                custom_rates['commercial_dud_cheque'] = get_custom_rate(subscriber_name, 'Commercial Dud Cheque', ENQUIRY_RATES['commercial_dud_cheque'])
-                                logger.debug(f"Using rate for {subscriber_name} - Commercial Dud Cheque: {custom_rates['commercial_dud_cheque']}")
-                                
-                                commercial_dud_amount = Decimal(str(summary_bills.get('commercial_dud_cheque', 0) or 0)) * custom_rates['commercial_dud_cheque']
-                                safe_cell_assignment(ws, 23, 16, f"₦{commercial_dud_amount:,.2f}")  # P23
-                                total_amount += commercial_dud_amount
-                                
-                                # Director Basic Report
-                                custom_rates['director_basic_report'] = get_custom_rate(subscriber_name, 'Director Basic Report', ENQUIRY_RATES['director_basic_report'])
-                                logger.debug(f"Using rate for {subscriber_name} - Director Basic Report: {custom_rates['director_basic_report']}")
-                                
-                                director_basic_amount = Decimal(str(summary_bills.get('director_basic_report', 0) or 0)) * custom_rates['director_basic_report']
-                                safe_cell_assignment(ws, 25, 16, f"₦{director_basic_amount:,.2f}")  # P25
-                                total_amount += director_basic_amount
-                                
-                                # Director Detailed Report
-                                custom_rates['director_detailed_report'] = get_custom_rate(subscriber_name, 'Director Detailed Report', ENQUIRY_RATES['director_detailed_report'])
-                                logger.debug(f"Using rate for {subscriber_name} - Director Detailed Report: {custom_rates['director_detailed_report']}")
-                                
-                                director_detailed_amount = Decimal(str(summary_bills.get('director_detailed_report', 0) or 0)) * custom_rates['director_detailed_report']
-                                safe_cell_assignment(ws, 26, 16, f"₦{director_detailed_amount:,.2f}")  # P26
-                                total_amount += director_detailed_amount
-                                
-                                # Set total amount with Naira formatting
-                                safe_cell_assignment(ws, 28, 16, f"₦{total_amount:,.2f}")  # P28 for total
-                                
-                                # Calculate 7.5% VAT amount
-                                vat_amount = total_amount * Decimal(str(0.075))
-                                safe_cell_assignment(ws, 29, 16, f"₦{vat_amount:,.2f}")  # P29 for VAT amount
-                                
-                                # Calculate amount due (total + VAT)
-                                amount_due = total_amount + vat_amount
-                                safe_cell_assignment(ws, 30, 16, f"₦{amount_due:,.2f}")  # P30 for amount due
-                                
-
-                            
-                            if include_products:
-                                start_row_offset = 36  # Initial start row for product sections on Sheet1
-                                current_sheet = ws
-                                sheet2 = wb["Sheet2"] if "Sheet2" in wb.sheetnames else None
-                                
-                                # Sort product_sections by product_name
-                                sorted_product_names = sorted(product_sections.keys())
-                                
-                                # First, find the original product name cell in the template (rows 32-35)
-                                product_name_cell = None
-                                for row in range(32, 36):  # Rows 32-35 (inclusive)
-                                    for col in range(1, 16):  # Assuming columns A-O are important
-                                        cell_value = ws.cell(row=row, column=col).value
-                                        if cell_value and "product" in str(cell_value).lower():
-                                            product_name_cell = (row, col)
-                                            break
-                                    if product_name_cell:
-                                        break
-                                        
-                                # Save the template header structure (rows 32-35) for subsequent products
-                                header_template = []
-                                header_rows = (32, 35)  # Range of rows to copy for the header template
-                                for row in range(header_rows[0], header_rows[1] + 1):
-                                    row_data = []
-                                    for col in range(1, 16):  # Assuming columns A-O are important
-                                        cell = ws.cell(row=row, column=col)
-                                        # Store cell value and position only - we'll copy styles directly later
-                                        cell_info = {
-                                            'value': cell.value,
-                                            'position': (row, col)
-                                        }
-                                        # Check if cell is part of merged range
-                                        for m_range in ws.merged_cells.ranges:
-                                            if (row, col) == (m_range.min_row, m_range.min_col):
-                                                cell_info['merged'] = (m_range.max_row - m_range.min_row + 1, 
-                                                                    m_range.max_col - m_range.min_col + 1)
-                                                break
-                                        row_data.append(cell_info)
-                                    header_template.append(row_data)
-                                
-                                # Set data row start - will be used for first product                
-                                data_start_row = 36  # Initial start for data rows after template header
-                                lastProduct = ""
-                                
-                                # For each product, use appropriate header section
-                                for product_idx, product_name in enumerate(sorted_product_names):
-                                    product_records = product_sections[product_name]
-                                    
-                                    if product_idx == 0:
-                                        # For first product, use the existing template header
-                                        if product_name_cell:
-                                            row, col = product_name_cell
-                                            # Replace "Product Name" with actual first product name in template
-                                            safe_cell_assignment(ws, row, col, product_name)
-                                        current_sheet = ws
-                                        current_row_offset = data_start_row  # Start data at row 36
-                                        serial_number_base = data_start_row - 1
-                                    else:
-                                        # Add space between different products (extra spacing)
-                                        current_row_offset += 4  # Add significant spacing between products
-                                            
-                                        # Create new header for subsequent products
-                                        header_start_row = current_row_offset
-                                        
-                                        # Clone the header section for this product
-                                        for template_row_idx, template_row in enumerate(header_template):
-                                            target_row = header_start_row + template_row_idx
-                                        
-                                            # Ensure we're not past row limits
-                                            if current_sheet == ws and target_row > 1000000 and sheet2:
-                                                current_sheet = sheet2
-                                                # Reset for Sheet2
-                                                header_start_row = 13
-                                                target_row = header_start_row + template_row_idx
-                                        
-                                            # Unmerge any existing merged cells in the target area
-                                            for m_range in list(current_sheet.merged_cells.ranges):
-                                                if m_range.min_row <= target_row <= m_range.max_row:
-                                                    current_sheet.unmerge_cells(
-                                                        start_row=m_range.min_row, 
-                                                        start_column=m_range.min_col,
-                                                        end_row=m_range.max_row, 
-                                                        end_column=m_range.max_col
-                                                    )
-                                        
-                                            # Copy each cell from the template to the target area
-                                            for col_idx, cell_info in enumerate(template_row):
-                                                target_col = col_idx + 1
-                                                target_cell = current_sheet.cell(row=target_row, column=target_col)
-                                                
-                                                # Copy styles directly from the original cell
-                                                original_row, original_col = cell_info['position']
-                                                original_cell = ws.cell(row=original_row, column=original_col)
-                                                
-                                                # Copy cell format using openpyxl's built-in method
-                                                target_cell._style = copy(original_cell._style)
-                                                
-                                                # Set value using safe_cell_assignment to handle merged cells properly
-                                                if template_row_idx == product_name_cell[0] - header_rows[0] and \
-                                                col_idx == product_name_cell[1] - 1:
-                                                    # For the product name cell, use the safe assignment method
-                                                    safe_cell_assignment(current_sheet, target_row, target_col, product_name)
-                                                elif cell_info['value'] is not None:
-                                                    # For other cells with values, use the safe assignment method
-                                                    safe_cell_assignment(current_sheet, target_row, target_col, cell_info['value'])
-                                                
-                                                # Recreate merged cells
-                                                if 'merged' in cell_info:
-                                                    rows, cols = cell_info['merged']
-                                                    current_sheet.merge_cells(
-                                                        start_row=target_row, 
-                                                        start_column=target_col,
-                                                        end_row=target_row + rows - 1, 
-                                                        end_column=target_col + cols - 1
-                                                    )
-                                        
-                                        # Update data start row to be after this new header
-                                        current_row_offset = header_start_row + (header_rows[1] - header_rows[0] + 1)
-                                        serial_number_base = current_row_offset - 1
-                                        
-                                        # Add header for the data section
-                                        safe_cell_assignment(current_sheet, current_row_offset - 1, 4, "Unique Tracking Number")
-
-                                    # Process data records for this product
-                                    for record_idx, record in enumerate(product_records):
-                                        current_row = current_row_offset + record_idx
-                                        
-                                        # Switch to Sheet2 when reaching max row (like VBA)
-                                        if current_row > 1000000 and sheet2 and current_sheet != sheet2:
-                                            current_sheet = sheet2
-                                            current_row_offset = 13  # Reset row offset for Sheet2 as per VBA
-                                            serial_number_base = 12  # Reset serial number base for Sheet2
-                                            current_row = current_row_offset + record_idx  # Recalculate current_row for Sheet2
-                                        
-                                        # Copy row format from template data row
-                                        template_data_row = 36
-                                        max_col = 17  # Extend to include all columns that need formatting
-                                        copy_row_format(current_sheet, template_data_row, current_row, max_col)
-                                        
-                                        # Now assign values as before
-                                        safe_cell_assignment(current_sheet, current_row, 2, current_row - serial_number_base)  # Serial Number
-                                        safe_cell_assignment(current_sheet, current_row, 3, "")  # Branch ID
-                                        safe_cell_assignment(current_sheet, current_row, 4, "")  # Unique Tracking Number column left blank
-                                        safe_cell_assignment(current_sheet, current_row, 5, record['SubscriberName'])
-                                        safe_cell_assignment(current_sheet, current_row, 7, record['SystemUser'] if record['SystemUser'] else "")
-                                        # Format SubscriberEnquiryDate
-                                        subscriber_enquiry_date = record['SubscriberEnquiryDate']
-                                        if subscriber_enquiry_date:
-                                            if isinstance(subscriber_enquiry_date, str):
-                                                date_str = subscriber_enquiry_date
-                                            else:
-                                                # Convert to date object first to remove any time component
-                                                if hasattr(subscriber_enquiry_date, 'date'):
-                                                    date_only = subscriber_enquiry_date.date()
-                                                else:
-                                                    date_only = subscriber_enquiry_date
-                                                date_str = date_only.strftime('%Y-%m-%d')
-                                            # Set cell format to text BEFORE assignment to prevent Excel from adding time component
-                                            current_sheet.cell(row=current_row, column=10).number_format = '@'
-                                            safe_cell_assignment(current_sheet, current_row, 10, date_str)
-                                            # Ensure the format stays as text after assignment
-                                            current_sheet.cell(row=current_row, column=10).number_format = '@'
-                                        else:
-                                            safe_cell_assignment(current_sheet, current_row, 10, "")
-                                        safe_cell_assignment(current_sheet, current_row, 11, record['ProductName'])
-                                        # Format DetailsViewedDate to match SubscriberEnquiryDate format
-                                        details_viewed_date = record['DetailsViewedDate']
-                                        if details_viewed_date:
-                                            if isinstance(details_viewed_date, str):
-                                                date_str = details_viewed_date
-                                            else:
-                                                # Convert to date object first to remove any time component
-                                                if hasattr(details_viewed_date, 'date'):
-                                                    date_only = details_viewed_date.date()
-                                                else:
-                                                    date_only = details_viewed_date
-                                                date_str = date_only.strftime('%Y-%m-%d')
-                                            # Set cell format to text BEFORE assignment to prevent Excel from adding time component
-                                            current_sheet.cell(row=current_row, column=12).number_format = '@'
-                                            safe_cell_assignment(current_sheet, current_row, 12, date_str)
-                                            # Ensure the format stays as text after assignment
-                                            current_sheet.cell(row=current_row, column=12).number_format = '@'
-                                        else:
-                                            safe_cell_assignment(current_sheet, current_row, 12, "")
-                                        safe_cell_assignment(current_sheet, current_row, 15, record['SearchOutput'] if record['SearchOutput'] else "")
-                                        
-                                        # Apply merge and center formatting to this data row
-                                        merge_and_center_data_row(current_sheet, current_row)
-                                    
-                                    # Move offset to after this product's data for next product
-                                    current_row_offset += len(product_records)
-                                    
-                                    # Set lastProduct for the next iteration
-                                    lastProduct = product_name
-
-                            # Auto-size columns for better readability
-                            for sheet in wb.worksheets:
-                                auto_size_columns(sheet)
-
-                            add_generated_by(ws, request.user.username, current_row_offset - 1)
-
-                        except Exception as e:
-                            logger.error(f"Error generating report data: {str(e)}")
-                            messages.error(request, f"Error generating report data: {str(e)}")
-                            return render(request, 'bulkrep/bulk_report.html', context)
-                        
-                        # Save to buffer
-                        wb.save(excel_buffer)
-                        excel_buffer.seek(0)
-                        
-                        # Prepare filename using the subscriber name
-                        month_year = start_date.strftime('%B%Y')
-                        clean_subscriber = clean_filename(subscriber_name)
-                        filename = f"{clean_subscriber}_{month_year}.xlsx"
-                        
-                        # Add to zip file
-                        zip_file.writestr(filename, excel_buffer.getvalue())
-                        
-                        # Add to processed subscribers list
-                        processed_subscribers.append(subscriber_name)
-                        
-                    except Exception as e:
-                        print(f"Error processing subscriber {subscriber_name}: {str(e)}")
-                        error_msg = f"Skipped report for {subscriber_name} due to error: {str(e)}"
-                        messages.warning(request, error_msg)
-                        if 'report_gen' in locals() and report_gen:
-                            report_gen.status = 'failed'
-                            report_gen.error_message = error_msg[:500]  # Truncate to fit in the field
-                            report_gen.completed_at = timezone.now()
-                            report_gen.save()
-                        continue
-            
-            # Return the zip file if any reports were generated
-            if processed_subscribers:
-                zip_buffer.seek(0)
-                month_year = start_date.strftime('%B%Y')
-                zip_filename = f"all_subscriber_reports_{month_year}_{uuid.uuid4().hex[:8]}.zip"
-                bulk_reports_dir = os.path.join(settings.MEDIA_ROOT, 'reports', 'bulk')
-                os.makedirs(bulk_reports_dir, exist_ok=True)
-                zip_path = os.path.join(bulk_reports_dir, zip_filename)
-                with open(zip_path, 'wb') as f:
-                    f.write(zip_buffer.read())
-                download_url = settings.MEDIA_URL + f'reports/bulk/{zip_filename}'
-                
-                # Update report generation status to success
-                if 'report_gen' in locals() and report_gen:
-                    report_gen.status = 'success'
-                    report_gen.completed_at = timezone.now()
-                    report_gen.save()
-                
-                success_msg = f"Successfully generated reports for {len(processed_subscribers)} out of {len(subscribers_list)} subscribers for the period {start_date_display} to {end_date_display}."
-                messages.success(request, success_msg)
-                return render(request, 'bulkrep/download_ready.html', {
-                    'download_url': download_url
-                })
-            else:
-                messages.warning(request, "No reports were generated. Please check the data or try different criteria.")
-                return render(request, 'bulkrep/bulk_report.html', context)
-            
-        except Exception as e:
-            messages.error(request, f"Error generating bulk reports: {str(e)}")
-            return render(request, 'bulkrep/bulk_report.html', context)
+        # Per-subscriber workbooks and the zip are built by a background job; the download page polls it
+        report_gen = tasks.submit_report_job(
+            tasks.generate_bulk_report, report_gen,
+            subscribers=subscribers_list,
+            start_date=start_date.isoformat(),
+            end_date=end_date.isoformat(),
+            include_bills=include_bills,
+            include_products=include_products,
+        )
+        return render(request, 'bulkrep/download_ready.html', report_job_context(report_gen))
     
     # For GET requests, render the bulk report form
     return render(request, 'bulkrep/bulk_report.html', context)
@@ -2282,6 +1395,12 @@ def dashboard_api(request):
     if not request.user.is_superuser:
         return JsonResponse({'error': 'Insufficient permissions'}, status=403)
     
+    # Conditional GET: a client already holding the current data version gets a 304
+    version = data_version()
+    not_modified = not_modified_response(request, version)
+    if not_modified is not None:
+        return not_modified
+    
     try:
         # Get date range from request
         start_date_str = request.GET.get('start_date', None)
@@ -2341,13 +1460,10 @@ def dashboard_api(request):
                 end_date = today.replace(month=today.month + 1, day=1)
             print(f"three_month_view=true: overriding dates to start_date={start_date}, end_date={end_date}")
         
-        # Legacy support for time_range parameter
+        # time_range=alltime is sent by the dashboard's All Time preset
         time_range = request.GET.get('time_range', None)
         if time_range == 'alltime' and not start_date_str and not end_date_str:
-            start_date = Usagereport.objects.aggregate(min_date=Min('DetailsViewedDate'))['min_date']
-            if start_date is None:
-                start_date = end_date - timedelta(days=365)  # fallback to 1 year
-            end_date = timezone.now().date()
+            start_date, end_date = get_alltime_date_range()
         
         # Get individual chart filters
         usage_trends_days = request.GET.get('usage_trends_days')
@@ -2368,106 +1484,44 @@ def dashboard_api(request):
         print(f"dashboard_api final dates before calculations: start_date={start_date}, end_date={end_date}")
         print(f"three_month_view={three_month_view}, time_range={time_range}")
         
-        # Create cache key based on all parameters
-        cache_params = {
-            'start_date': start_date.strftime('%Y-%m-%d'),
-            'end_date': end_date.strftime('%Y-%m-%d'),
-            'usage_trends_days': usage_trends_days or '',
-            'product_filter': product_filter or '',
-            'subscriber_filter': subscriber_filter or '',
-            'revenue_product_filter': revenue_product_filter or '',
-            'new_subscribers_days': new_subscribers_days or '',
-            'churn_days': churn_days or '',
-            'three_month_view': str(three_month_view),
-            'churn_analysis': str(churn_analysis),
+        if churn_analysis:
+            # For churn analysis, only calculate churn data with date range
+            churn_days = None
+        
+        filters = {
+            'usage_trends_days': usage_trends_days,
+            'product_filter': product_filter,
+            'subscriber_filter': subscriber_filter,
+            'revenue_product_filter': revenue_product_filter,
+            'new_subscribers_days': new_subscribers_days,
+            'churn_days': churn_days,
         }
         
-        # Create a hash of the parameters for the cache key
-        cache_key_string = '|'.join([f"{k}:{v}" for k, v in sorted(cache_params.items())])
-        cache_key = f"dashboard_api_{hashlib.md5(cache_key_string.encode()).hexdigest()}"
+        # Payload metrics and the parameters each one depends on; every metric is
+        # cached under its own key, so only the metrics missing from the cache are computed
+        metric_params = dashboard_metric_params(
+            start_date, end_date, three_month_view=three_month_view, churn_analysis=churn_analysis, **filters
+        )
         
-        # Try to get cached data
-        cached_data = cache.get(cache_key)
-        if cached_data is not None:
-            return JsonResponse(cached_data)
+        def compute(names):
+            return compute_dashboard_metrics(names, start_date, end_date, **filters)
         
-        # Calculate all metrics with filters
-        # Skip revenue calculations for 3-month view to improve performance
-        if three_month_view:
-            # For 3-month view, skip revenue calculations
-            revenue_data = {'total_revenue': 0, 'revenue_by_product': []}
-            top_products = get_top_products_by_frequency_filtered(start_date, end_date, product_filter)
-        else:
-            # Determine which revenue calculation function to use based on filters
-            if subscriber_filter and revenue_product_filter:
-                # Both filters applied - use combined filtering
-                revenue_data = get_revenue_data_combined_filtered(start_date, end_date, subscriber_filter, revenue_product_filter)
-                top_products = get_top_products_by_subscriber_filtered(start_date, end_date, subscriber_filter)
-            elif subscriber_filter:
-                # Only subscriber filter applied
-                revenue_data = get_revenue_data_subscriber_filtered(start_date, end_date, subscriber_filter)
-                top_products = get_top_products_by_subscriber_filtered(start_date, end_date, subscriber_filter)
-            elif revenue_product_filter:
-                # Only product filter applied
-                revenue_data = get_revenue_data_product_filtered(start_date, end_date, revenue_product_filter)
-                top_products = get_top_products_by_frequency_filtered(start_date, end_date, product_filter)
-            else:
-                # No filters applied - use existing logic
-                revenue_data = get_revenue_data_filtered(start_date, end_date, revenue_product_filter)
-                top_products = get_top_products_by_frequency_filtered(start_date, end_date, product_filter)
+        # Entries past their TTL are still served (marked with their age) while a
+        # background refresh replaces them; only missing metrics are computed here
+        cached_data, stale = lookup_metrics(metric_params, version)
+        if stale:
+            refresh_metrics_in_background(list(stale), metric_params, compute, version)
         
-        # Build data dictionary based on view type
-        if three_month_view:
-            # For 3-month view, only calculate 3-month usage data
-            data = {
-                'three_month_usage': get_three_month_rolling_usage(subscriber_filter),
-            }
-        elif churn_analysis:
-            # For churn analysis, only calculate churn data with date range
-            data = {
-                'churn_data': get_churn_data_filtered(start_date, end_date, None),
-            }
-        else:
-            # Full dashboard with optimized metrics based on subscriber filter
-            if subscriber_filter and subscriber_filter != 'all':
-                # Optimized metrics for subscriber filtering - skip unnecessary global calculations
-                data = {
-                    'total_subscribers': 1,  # Always 1 when filtering by specific subscriber
-                    'total_usage_entries': get_total_usage_entries(start_date, end_date, subscriber_filter),
-                    'top_subscribers': get_top_subscribers_by_usage_filtered(start_date, end_date, subscriber_filter, limit=10),
-                    'top_products': top_products,
-                    'churn_data': get_churn_data_filtered(start_date, end_date, churn_days),
-                    'usage_trends': get_usage_trends_filtered(start_date, end_date, usage_trends_days, subscriber_filter),
-                    'revenue_data': revenue_data,
-                    'new_subscribers': get_new_subscribers_trend_filtered(start_date, end_date, new_subscribers_days),
-                    'retention_rate': get_retention_rate(start_date, end_date),  # TODO: Make subscriber-specific
-                    'highest_product_by_transaction': get_highest_product_by_transaction(start_date, end_date),  # TODO: Make subscriber-specific
-                    'highest_product_by_revenue': get_highest_product_by_revenue(start_date, end_date),  # TODO: Make subscriber-specific
-                    'daily_comparison': get_daily_comparison(subscriber_filter),
-                    # Skip these unnecessary calls when filtering by subscriber:
-                    # 'top_subscriber': not needed when filtering by specific subscriber
-                    # 'unique_products': should use subscriber-specific products
-                    # 'unique_subscribers': not needed when filtering by specific subscriber
-                }
-            else:
-                # Full dashboard with all metrics for global view
-                data = {
-                    'total_subscribers': get_total_subscribers(start_date, end_date, subscriber_filter),
-                    'total_usage_entries': get_total_usage_entries(start_date, end_date, subscriber_filter),
-                    'top_subscriber': get_top_subscriber(start_date, end_date),
-                    'top_subscribers': get_top_subscribers_by_usage_filtered(start_date, end_date, subscriber_filter, limit=10),
-                    'top_products': top_products,
-                    'churn_data': get_churn_data_filtered(start_date, end_date, churn_days),
-                    'usage_trends': get_usage_trends_filtered(start_date, end_date, usage_trends_days, subscriber_filter),
-                    'revenue_data': revenue_data,
-                    'new_subscribers': get_new_subscribers_trend_filtered(start_date, end_date, new_subscribers_days),
-                    'retention_rate': get_retention_rate(start_date, end_date),
-                    'highest_product_by_transaction': get_highest_product_by_transaction(start_date, end_date),
-                    'highest_product_by_revenue': get_highest_product_by_revenue(start_date, end_date),
-                    'unique_products': get_unique_products(),
-                    'unique_subscribers': get_unique_subscribers(),
-                    'daily_comparison': get_daily_comparison(subscriber_filter),
-                }
+        missing = [name for name in metric_params if name not in cached_data]
+        computed, timed_out = compute(missing) if missing else ({}, [])
+        
+        # Timed-out metrics are not cached, so the next request tries them again
+        cache_metrics(computed, metric_params, version)
+        data = {
+            name: computed[name] if name in computed else cached_data[name]
+            for name in metric_params
+            if name in computed or name in cached_data
+        }
         
         # Debug daily comparison result
         if settings.DEBUG and 'daily_comparison' in data:
@@ -2475,12 +1529,19 @@ def dashboard_api(request):
         
         # 3-month usage data is already included in the data dictionary above
         
-        # Cache the data for 5 minutes (300 seconds)
-        cache.set(cache_key, data, 300)
+        if timed_out:
+            # Partial payload: tell the client which metrics are missing
+            data['timed_out'] = timed_out
+        if stale:
+            # Seconds since each stale metric was computed
+            data['stale'] = stale
         
         # Ensure proper JSON response with explicit content type
         response = JsonResponse(data)
         response['Content-Type'] = 'application/json'
+        if version and not timed_out and not stale:
+            # Only a complete, current payload may be revalidated with If-None-Match
+            response['ETag'] = data_version_etag(version)
         return response
     except Exception as e:
         # Log the full error for debugging
@@ -2497,6 +1558,183 @@ def dashboard_api(request):
         return error_response
 
 
+def get_alltime_date_range():
+    """Date range of the all-time view: first usage date to today (the past year when there is no usage)."""
+    end_date = timezone.now().date()
+    start_date = Usagereport.objects.aggregate(min_date=Min('DetailsViewedDate'))['min_date']
+    if start_date is None:
+        start_date = end_date - timedelta(days=365)  # fallback to 1 year
+    return start_date, end_date
+
+
+def dashboard_metric_params(start_date, end_date, usage_trends_days=None, product_filter=None,
+                            subscriber_filter=None, revenue_product_filter=None, new_subscribers_days=None,
+                            churn_days=None, three_month_view=False, churn_analysis=False):
+    """
+    Payload metrics of a dashboard_api request and the parameters each one depends on.
+
+    The parameters of a metric are its cache key (see dashboard_cache), so
+    requests that differ only in filters a metric ignores share its entry.
+
+    Returns:
+        Dictionary of {metric name: {parameter: value}} in payload order
+    """
+    selected_subscriber = subscriber_filter if subscriber_filter and subscriber_filter != 'all' else None
+    period = {'start_date': start_date.strftime('%Y-%m-%d'), 'end_date': end_date.strftime('%Y-%m-%d')}
+    subscriber = {'subscriber_filter': selected_subscriber or ''}
+
+    if three_month_view:
+        # For 3-month view, only calculate 3-month usage data
+        return {
+            'three_month_usage': {**subscriber, 'month': timezone.now().date().strftime('%Y-%m')},
+        }
+    if churn_analysis:
+        # For churn analysis, only calculate churn data with date range
+        return {
+            'churn_data': {**period, 'churn_days': churn_days or ''},
+        }
+
+    metric_params = {
+        'total_subscribers': {**period, **subscriber},
+        'total_usage_entries': {**period, **subscriber},
+        'top_subscriber': period,
+        'top_subscribers': {**period, **subscriber},
+        'top_products': {
+            **period,
+            'subscriber_filter': subscriber_filter or '',
+            'product_filter': '' if subscriber_filter else product_filter or '',
+        },
+        'churn_data': {**period, 'churn_days': churn_days or ''},
+        'usage_trends': {**period, **subscriber, 'usage_trends_days': usage_trends_days or ''},
+        'revenue_data': {
+            **period,
+            'subscriber_filter': subscriber_filter or '',
+            'revenue_product_filter': revenue_product_filter or '',
+        },
+        'new_subscribers': {**period, 'new_subscribers_days': new_subscribers_days or ''},
+        'retention_rate': period,
+        'highest_product_by_transaction': period,
+        'highest_product_by_revenue': period,
+        'unique_products': {},
+        'unique_subscribers': {},
+        'daily_comparison': {**subscriber, 'day': daily_comparison_dates()[0].strftime('%Y-%m-%d')},
+    }
+    if selected_subscriber:
+        # Skip these unnecessary calls when filtering by subscriber:
+        # 'top_subscriber': not needed when filtering by specific subscriber
+        # 'unique_products': should use subscriber-specific products
+        # 'unique_subscribers': not needed when filtering by specific subscriber
+        for name in ('top_subscriber', 'unique_products', 'unique_subscribers'):
+            del metric_params[name]
+    return metric_params
+
+
+def compute_dashboard_metrics(names, start_date, end_date, usage_trends_days=None, product_filter=None,
+                              subscriber_filter=None, revenue_product_filter=None, new_subscribers_days=None,
+                              churn_days=None, timeout=None):
+    """
+    Compute the named dashboard metrics for a date range and set of chart filters.
+
+    Only the sources the named metrics need are queried. They run concurrently
+    (run_metrics); a source that overruns its time budget or raises leaves out
+    every metric that depends on it instead of failing the whole request.
+
+    Args:
+        names: Payload keys to compute (e.g. 'churn_data', 'three_month_usage')
+        start_date: First day of the dashboard range
+        end_date: Last day of the dashboard range
+        usage_trends_days, product_filter, subscriber_filter, revenue_product_filter,
+        new_subscribers_days, churn_days: Chart filters as received by dashboard_api
+        timeout: Seconds each source may take; defaults to DASHBOARD_METRIC_TIMEOUT
+
+    Returns:
+        Tuple of ({name: value} for computed metrics, [names that timed out or failed])
+    """
+    names = set(names)
+    selected_subscriber = subscriber_filter if subscriber_filter and subscriber_filter != 'all' else None
+    revenue_filtered = bool(subscriber_filter or revenue_product_filter)
+    data = {}
+
+    if selected_subscriber and 'total_subscribers' in names:
+        data['total_subscribers'] = 1  # Always 1 when filtering by specific subscriber
+        names.discard('total_subscribers')
+
+    # Metrics derived in memory from the rollup scan
+    if subscriber_filter:
+        top_products = lambda usage: usage.subscriber_top_products(start_date, end_date, subscriber_filter)
+    else:
+        top_products = lambda usage: usage.top_products(start_date, end_date, product_filter)
+    usage_metrics = {
+        'total_subscribers': lambda usage: usage.total_subscribers(start_date, end_date),
+        'total_usage_entries': lambda usage: usage.total_usage(start_date, end_date, selected_subscriber),
+        'top_subscriber': lambda usage: usage.top_subscriber(start_date, end_date),
+        'top_subscribers': lambda usage: usage.top_subscribers(start_date, end_date, selected_subscriber, limit=10),
+        'top_products': top_products,
+        'churn_data': lambda usage: usage.churn(start_date, end_date, churn_days),
+        'usage_trends': lambda usage: usage.usage_trends(start_date, end_date, usage_trends_days, selected_subscriber),
+        'retention_rate': lambda usage: usage.retention(start_date, end_date),  # TODO: Make subscriber-specific
+        'highest_product_by_transaction': lambda usage: usage.highest_product_by_transaction(start_date, end_date),  # TODO: Make subscriber-specific
+        'daily_comparison': lambda usage: usage.daily_comparison(selected_subscriber),
+    }
+    usage_metrics = {name: metric for name, metric in usage_metrics.items() if name in names}
+
+    # Unfiltered revenue is priced from the scan; it also picks the highest product by revenue
+    revenue_metrics = names & {'highest_product_by_revenue'}
+    if not revenue_filtered:
+        revenue_metrics |= names & {'revenue_data'}
+
+    # One rollup scan covers the range, its comparison periods and the daily
+    # comparison days; the other sources are independent queries run alongside it
+    sources = {}
+    if usage_metrics or revenue_metrics:
+        sources['usage'] = (DashboardSlice.for_dashboard, (start_date, end_date, usage_trends_days, churn_days))
+    if revenue_metrics:
+        sources['subscriber_rates'] = (get_all_subscriber_product_rate, ())
+    if 'three_month_usage' in names:
+        sources['three_month_usage'] = (get_three_month_rolling_usage, (subscriber_filter,))
+    if 'new_subscribers' in names:
+        sources['new_subscribers'] = (get_new_subscribers_trend_filtered, (start_date, end_date, new_subscribers_days))
+    if 'revenue_data' in names and revenue_filtered:
+        # Determine which revenue calculation function to use based on filters
+        if subscriber_filter and revenue_product_filter:
+            # Both filters applied - use combined filtering
+            sources['revenue_data'] = (get_revenue_data_combined_filtered, (start_date, end_date, subscriber_filter, revenue_product_filter))
+        elif subscriber_filter:
+            # Only subscriber filter applied
+            sources['revenue_data'] = (get_revenue_data_subscriber_filtered, (start_date, end_date, subscriber_filter))
+        else:
+            # Only product filter applied
+            sources['revenue_data'] = (get_revenue_data_product_filtered, (start_date, end_date, revenue_product_filter))
+    if 'unique_products' in names:
+        sources['unique_products'] = (get_unique_products, ())
+    if 'unique_subscribers' in names:
+        sources['unique_subscribers'] = (get_unique_subscribers, ())
+
+    results, timed_out = run_metrics(sources, timeout=timeout)
+    usage = results.pop('usage', None)
+    subscriber_rates = results.pop('subscriber_rates', None)
+    data.update(results)
+    timed_out = [name for name in timed_out if name not in ('usage', 'subscriber_rates')]
+
+    if usage is not None:
+        data.update({name: metric(usage) for name, metric in usage_metrics.items()})
+    else:
+        timed_out.extend(usage_metrics)
+
+    if revenue_metrics:
+        if usage is not None and subscriber_rates is not None:
+            all_revenue = usage.revenue(start_date, end_date, subscriber_rates)
+            if 'highest_product_by_revenue' in revenue_metrics:
+                data['highest_product_by_revenue'] = all_revenue[0]['product'] if all_revenue else 'N/A'
+            if 'revenue_data' in revenue_metrics:
+                # No filters applied - the unfiltered revenue is already priced
+                data['revenue_data'] = all_revenue
+        else:
+            timed_out.extend(sorted(revenue_metrics))
+
+    return data, timed_out
+
+
 # Dashboard Helper Functions
 def get_total_subscribers(start_date, end_date, subscriber_filter=None):
     """Get total number of unique subscribers for date range, filtered by subscriber if provided"""
@@ -2512,12 +1750,12 @@ def get_total_subscribers(start_date, end_date, subscriber_filter=None):
 
 def get_total_usage_entries(start_date, end_date, subscriber_filter=None):
     """Get total usage entries for date range, filtered by subscriber if provided"""
-    query = Usagereport.objects.filter(DetailsViewedDate__range=[start_date, end_date])
+    query = UsageDailyRollup.objects.filter(date__range=[start_date, end_date])
     
     if subscriber_filter and subscriber_filter != 'all':
-        query = query.filter(SubscriberName=subscriber_filter)
+        query = query.filter(subscriber_name=subscriber_filter)
         
-    return query.count()
+    return query.aggregate(total=Sum('usage_count'))['total'] or 0
 
 
 def get_top_subscriber(start_date, end_date):
@@ -2538,7 +1776,7 @@ def get_top_subscriber(start_date, end_date):
 def get_unique_products():
     """Get list of unique product names for filter dropdown"""
     try:
-        products = Usagereport.objects.values_list('ProductName', flat=True).distinct().order_by('ProductName')
+        products = UsageDailyRollup.objects.values_list('product_name', flat=True).distinct().order_by('product_name')
         return [product for product in products if product]  # Filter out None/empty values
     except Exception as e:
         logger.error(f"Error getting unique products: {str(e)}")
@@ -2548,7 +1786,7 @@ def get_unique_products():
 def get_unique_subscribers():
     """Get list of unique subscriber names for filter dropdown"""
     try:
-        subscribers = Usagereport.objects.values_list('SubscriberName', flat=True).distinct().order_by('SubscriberName')
+        subscribers = UsageDailyRollup.objects.values_list('subscriber_name', flat=True).distinct().order_by('subscriber_name')
         return [subscriber for subscriber in subscribers if subscriber]  # Filter out None/empty values
     except Exception as e:
         logger.error(f"Error getting unique subscribers: {str(e)}")
@@ -2617,14 +1855,8 @@ def get_revenue_data(start_date, end_date):
     
     for product_key, rate in ENQUIRY_RATES.items():
         # Map product keys to actual product names in database
-        product_variations = [
-            product_key.replace('_', ' '),
-            product_key.replace('_', '-'),
-            product_key.title().replace('_', ' '),
-        ]
-        
         usage_count = 0
-        for variation in product_variations:
+        for variation in rate_key_variations(product_key):
             count = Usagereport.objects.filter(
                 DetailsViewedDate__range=[start_date, end_date],
                 ProductName__icontains=variation
@@ -2673,16 +1905,16 @@ def get_retention_rate(start_date, end_date):
 def get_top_subscribers_by_usage_filtered(start_date, end_date, subscriber_filter=None, limit=None):
     """Get all subscribers by usage with optional filtering"""
     try:
-        queryset = Usagereport.objects.filter(
-            DetailsViewedDate__range=[start_date, end_date]
+        queryset = UsageDailyRollup.objects.filter(
+            date__range=[start_date, end_date]
         )
         
         # Apply subscriber filter if provided
         if subscriber_filter and subscriber_filter != 'all':
-            queryset = queryset.filter(SubscriberName=subscriber_filter)
+            queryset = queryset.filter(subscriber_name=subscriber_filter)
         
-        all_subscribers = queryset.values('SubscriberName').annotate(
-            usage_count=Count('SearchIdentity')
+        all_subscribers = queryset.values(SubscriberName=F('subscriber_name')).annotate(
+            usage_count=Sum('usage_count')
         ).order_by('-usage_count')
         
         # Apply limit only if specified (for backward compatibility)
@@ -2698,16 +1930,16 @@ def get_top_subscribers_by_usage_filtered(start_date, end_date, subscriber_filte
 def get_top_products_by_frequency_filtered(start_date, end_date, product_filter=None, limit=10):
     """Get top products by frequency with optional filtering"""
     try:
-        queryset = Usagereport.objects.filter(
-            DetailsViewedDate__range=[start_date, end_date]
+        queryset = UsageDailyRollup.objects.filter(
+            date__range=[start_date, end_date]
         )
         
         # Apply product filter if provided
         if product_filter and product_filter != 'all':
-            queryset = queryset.filter(ProductName__icontains=product_filter)
+            queryset = queryset.filter(product_name__icontains=product_filter)
         
-        top_products = queryset.values('ProductName').annotate(
-            frequency=Count('SearchIdentity')
+        top_products = queryset.values(ProductName=F('product_name')).annotate(
+            frequency=Sum('usage_count')
         ).order_by('-frequency')[:limit]
         
         return list(top_products)
@@ -3019,6 +2251,12 @@ def download_new_subscribers(request):
 
 def new_subscribers_trend_api(request):
     """API endpoint for new subscribers trend data with custom date range"""
+    # Conditional GET: a client already holding the current data version gets a 304
+    version = data_version()
+    not_modified = not_modified_response(request, version)
+    if not_modified is not None:
+        return not_modified
+    
     try:
         # Get date range from request
         start_date_str = request.GET.get('start_date', None)
@@ -3035,14 +2273,25 @@ def new_subscribers_trend_api(request):
         if start_date > end_date:
             return JsonResponse({'error': 'Start date cannot be later than end date'}, status=400)
         
-        # Get new subscribers data
-        new_subscribers_data = get_new_subscribers_trend_optimized(start_date, end_date)
-        
-        return JsonResponse({
+        # Get new subscribers data; the dashboard's new_subscribers entry for the same range is reused
+        metric_params = {'new_subscribers': {
+            'start_date': start_date.strftime('%Y-%m-%d'),
+            'end_date': end_date.strftime('%Y-%m-%d'),
+            'new_subscribers_days': '',
+        }}
+        new_subscribers_data = get_cached_metrics(metric_params, version).get('new_subscribers')
+        if new_subscribers_data is None:
+            new_subscribers_data = get_new_subscribers_trend_optimized(start_date, end_date)
+            cache_metrics({'new_subscribers': new_subscribers_data}, metric_params, version)
+        
+        response = JsonResponse({
             'new_subscribers': new_subscribers_data,
             'start_date': start_date_str,
             'end_date': end_date_str
         })
+        if version:
+            response['ETag'] = data_version_etag(version)
+        return response
         
     except ValueError as e:
         return JsonResponse({'error': 'Invalid date format. Use YYYY-MM-DD'}, status=400)
@@ -3062,18 +2311,16 @@ def get_usage_trends_filtered(start_date, end_date, usage_trends_days=None, subs
             trends_start = start_date
         
         # Build the query with date range filter
-        query = Usagereport.objects.filter(
-            DetailsViewedDate__range=[trends_start, end_date]
+        query = UsageDailyRollup.objects.filter(
+            date__range=[trends_start, end_date]
         )
         
         # Apply subscriber filter if provided
         if subscriber_filter and subscriber_filter != 'all':
-            query = query.filter(SubscriberName=subscriber_filter)
+            query = query.filter(subscriber_name=subscriber_filter)
         
-        return list(query.extra({
-            'date': "CAST(DetailsViewedDate AS DATE)"
-        }).values('date').annotate(
-            count=Count('SearchIdentity')
+        return list(query.values('date').annotate(
+            count=Sum('usage_count')
         ).order_by('date'))
     except Exception as e:
         logger.error(f"Error getting filtered usage trends: {str(e)}")
@@ -3092,15 +2339,8 @@ def get_subscriber_product_rate(subscriber, product_key):
         Decimal: The rate for the subscriber-product combination
     """
     try:
-        # Map product keys to actual product names in database
-        product_variations = [
-            product_key.replace('_', ' '),
-            product_key.replace('_', '-'),
-            product_key.title().replace('_', ' '),
-        ]
-        
-        # Try to find a subscriber-specific rate
-        for variation in product_variations:
+        # Try to find a subscriber-specific rate under each spelling of the product
+        for variation in rate_key_variations(product_key):
             try:
                 # Use filter().first() to handle duplicate records gracefully
                 subscriber_rate = SubscriberProductRate.objects.filter(
@@ -3146,62 +2386,17 @@ def get_revenue_data_filtered(start_date, end_date, revenue_product_filter=None)
     try:
         # 1. Fetch all custom rates into memory once.
         subscriber_rates = get_all_subscriber_product_rate()
-        
-        revenue_by_product = defaultdict(lambda: {'revenue': Decimal('0.00'), 'count': 0})
 
-        # 2. Get all usage data, aggregated by the database.
-        usage_query = Usagereport.objects.filter(
-            DetailsViewedDate__range=[start_date, end_date]
-        )
+        # 2. Usage per subscriber and product; closed months come from the permanent month cache
+        usage_counts = DashboardSlice.load(start_date, end_date).usage_counts(start_date, end_date)
 
         # Apply product filter if provided
         if revenue_product_filter and revenue_product_filter != 'all':
-            usage_query = usage_query.filter(ProductName__icontains=revenue_product_filter)
-
-        aggregated_usage = usage_query.values('SubscriberName', 'ProductName').annotate(
-            usage_count=Count('SearchIdentity')  # CORRECTED: Changed from 'id' to the primary key 'SearchIdentity'
-        ).order_by('SubscriberName')
-
-        # 3. Process the aggregated data in memory.
-        for usage in aggregated_usage:
-            subscriber = usage['SubscriberName']
-            product_name_db = usage['ProductName']
-            count = usage['usage_count']
-
-            # Match the database product name to a key in ENQUIRY_RATES
-            matched_key = None
-            for key in ENQUIRY_RATES.keys():
-                if key.replace('_', ' ').lower() in product_name_db.lower():
-                    matched_key = key
-                    break
-            
-            if not matched_key:
-                continue
+            needle = revenue_product_filter.lower()
+            usage_counts = [usage for usage in usage_counts if usage[1] and needle in usage[1].lower()]
 
-            # Check for a custom rate in memory, otherwise use the default.
-            rate = subscriber_rates.get(subscriber, {}).get(
-                product_name_db.lower(), 
-                Decimal(str(ENQUIRY_RATES[matched_key]))
-            )
-            
-            revenue = Decimal(str(rate)) * Decimal(str(count))
-            
-            # Aggregate totals for the final report
-            product_title = matched_key.replace('_', ' ').title()
-            revenue_by_product[product_title]['revenue'] += revenue
-            revenue_by_product[product_title]['count'] += count
-
-        # 4. Format the final output.
-        revenue_data = [
-            {
-                'product': product,
-                'revenue': float(data['revenue']),
-                'count': data['count']
-            }
-            for product, data in revenue_by_product.items()
-        ]
-        
-        return sorted(revenue_data, key=lambda x: x['revenue'], reverse=True)
+        # 3. Price the aggregated data in memory and format the final output.
+        return price_usage_counts(usage_counts, subscriber_rates)
 
     except Exception as e:
         logger.error(f"Error getting filtered revenue data: {str(e)}")
@@ -3210,28 +2405,19 @@ def get_revenue_data_filtered(start_date, end_date, revenue_product_filter=None)
 def get_revenue_data_subscriber_filtered(start_date, end_date, subscriber_name):
     """Calculate revenue for specific subscriber"""
     try:
+        # The subscriber's usage per product name (closed months from the permanent month
+        # cache); each distinct name is mapped to the ENQUIRY_RATES keys it belongs to
+        usage = DashboardSlice.load(start_date, end_date)
         
+        usage_by_key = defaultdict(int)
+        for _, product_name, usage_count in usage.usage_counts(start_date, end_date, subscriber_name):
+            for product_key in rate_keys_for_product(product_name):
+                usage_by_key[product_key] += usage_count
         
         revenue_data = []
         
-        for product_key, default_rate in ENQUIRY_RATES.items():
-            # Map product keys to actual product names in database
-            product_variations = [
-                product_key.replace('_', ' '),
-                product_key.replace('_', '-'),
-                product_key.title().replace('_', ' '),
-            ]
-            
-            # Single query with OR conditions for all variations
-            q_objects = Q()
-            for variation in product_variations:
-                q_objects |= Q(ProductName__icontains=variation)
-            
-            # Get usage entries for specific subscriber
-            usage_count = Usagereport.objects.filter(
-                DetailsViewedDate__range=[start_date, end_date],
-                SubscriberName=subscriber_name
-            ).filter(q_objects).count()
+        for product_key in ENQUIRY_RATES:
+            usage_count = usage_by_key.get(product_key, 0)
             
             if usage_count > 0:
                  # Get subscriber-specific rate or fall back to default
@@ -3257,57 +2443,26 @@ def get_revenue_data_subscriber_filtered(start_date, end_date, subscriber_name):
 def get_revenue_data_product_filtered(start_date, end_date, product_name):
     """Calculate revenue for specific product across all subscribers"""
     try:
-        from django.db.models import Q
-        
         # Find matching product key from ENQUIRY_RATES
-        matching_product_key = None
-        for product_key in ENQUIRY_RATES.keys():
-            product_variations = [
-                product_key.replace('_', ' '),
-                product_key.replace('_', '-'),
-                product_key.title().replace('_', ' '),
-            ]
-            
-            for variation in product_variations:
-                if product_name.lower() in variation.lower() or variation.lower() in product_name.lower():
-                    matching_product_key = product_key
-                    break
-            
-            if matching_product_key:
-                break
+        matching_product_key = match_rate_key_for_filter(product_name)
         
         if not matching_product_key:
             return []
         
-        # Map product keys to actual product names in database
-        product_variations = [
-            matching_product_key.replace('_', ' '),
-            matching_product_key.replace('_', '-'),
-            matching_product_key.title().replace('_', ' '),
-        ]
-        
-        # Single query with OR conditions for all variations
-        q_objects = Q()
-        for variation in product_variations:
-            q_objects |= Q(ProductName__icontains=variation)
-        
-        # Get usage entries for specific product
-        usage_entries = Usagereport.objects.filter(
-            DetailsViewedDate__range=[start_date, end_date]
-        ).filter(q_objects)
+        # Usage of every spelling of the product (closed months from the permanent month cache),
+        # grouped by subscriber to apply correct rates
+        usage = DashboardSlice.load(start_date, end_date)
+        subscriber_usage = defaultdict(int)
+        for subscriber, product_name, count in usage.usage_counts(start_date, end_date):
+            if matching_product_key in rate_keys_for_product(product_name):
+                subscriber_usage[subscriber] += count
         
-        usage_count = usage_entries.count()
+        usage_count = sum(subscriber_usage.values())
         
         if usage_count > 0:
             # Calculate revenue using subscriber-specific rates where available
             total_revenue = Decimal('0.00')
             
-            # Group by subscriber to apply correct rates
-            subscriber_usage = {}
-            for entry in usage_entries:
-                subscriber = entry.SubscriberName
-                subscriber_usage[subscriber] = subscriber_usage.get(subscriber, 0) + 1
-            
             # Calculate revenue with proper rates
             for subscriber, count in subscriber_usage.items():
                 rate = get_subscriber_product_rate(subscriber, matching_product_key)
@@ -3340,45 +2495,19 @@ def get_revenue_data_product_filtered(start_date, end_date, product_name):
 def get_revenue_data_combined_filtered(start_date, end_date, subscriber_name, product_name):
     """Calculate revenue for subscriber + product combination"""
     try:
-        from django.db.models import Q
-        
         # Find matching product key from ENQUIRY_RATES
-        matching_product_key = None
-        for product_key in ENQUIRY_RATES.keys():
-            product_variations = [
-                product_key.replace('_', ' '),
-                product_key.replace('_', '-'),
-                product_key.title().replace('_', ' '),
-            ]
-            
-            for variation in product_variations:
-                if product_name.lower() in variation.lower() or variation.lower() in product_name.lower():
-                    matching_product_key = product_key
-                    break
-            
-            if matching_product_key:
-                break
+        matching_product_key = match_rate_key_for_filter(product_name)
         
         if not matching_product_key:
             return []
         
-        # Map product keys to actual product names in database
-        product_variations = [
-            matching_product_key.replace('_', ' '),
-            matching_product_key.replace('_', '-'),
-            matching_product_key.title().replace('_', ' '),
-        ]
-        
-        # Single query with OR conditions for all variations
-        q_objects = Q()
-        for variation in product_variations:
-            q_objects |= Q(ProductName__icontains=variation)
-        
-        # Get usage entries for specific subscriber and product
-        usage_count = Usagereport.objects.filter(
-            DetailsViewedDate__range=[start_date, end_date],
-            SubscriberName=subscriber_name
-        ).filter(q_objects).count()
+        # Usage of every spelling of the product by the subscriber (closed months from the
+        # permanent month cache)
+        usage = DashboardSlice.load(start_date, end_date)
+        usage_count = sum(
+            count for _, product_name, count in usage.usage_counts(start_date, end_date, subscriber_name)
+            if matching_product_key in rate_keys_for_product(product_name)
+        )
         
         if usage_count > 0:
             # Get subscriber-specific rate for this product
@@ -3433,7 +2562,7 @@ def get_top_products_by_subscriber_filtered(start_date, end_date, subscriber_nam
 def get_new_subscribers_details(start_date, end_date):
     """Get detailed list of new subscribers with names and join dates"""
     try:
-        from datetime import datetime, date
+        from datetime import datetime
 
         # Ensure start_date and end_date are consistently date objects
         if isinstance(start_date, datetime):
@@ -3446,38 +2575,32 @@ def get_new_subscribers_details(start_date, end_date):
         elif isinstance(end_date, str):
             end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
 
-        # Get first usage date for each subscriber with their names
-        new_subscribers = Usagereport.objects.values('SubscriberName').annotate(
-            first_usage=Min('DetailsViewedDate')
-        ).filter(
-            first_usage__range=[start_date, end_date]
-        ).order_by('first_usage', 'SubscriberName')
+        # Index range scan over the materialized first usage dates
+        new_subscribers = SubscriberFirstSeen.objects.filter(
+            first_seen__range=[start_date, end_date]
+        ).order_by('first_seen', 'subscriber_name').values_list('subscriber_name', 'first_seen')
 
         # Format the results
-        subscribers_details = []
-        for item in new_subscribers:
-            first_usage = item['first_usage']
-            if first_usage is None:
-                continue
-
-            # Ensure first_usage is a date object
-            if isinstance(first_usage, datetime):
-                first_usage = first_usage.date()
-            elif isinstance(first_usage, str):
-                first_usage = datetime.strptime(first_usage.split(' ')[0], '%Y-%m-%d').date()
-            
-            if isinstance(first_usage, date):
-                subscribers_details.append({
-                    'name': item['SubscriberName'],
-                    'date_joined': first_usage.strftime('%Y-%m-%d')
-                })
-        
-        return subscribers_details
+        return [
+            {'name': subscriber_name, 'date_joined': first_seen.strftime('%Y-%m-%d')}
+            for subscriber_name, first_seen in new_subscribers
+        ]
     except Exception as e:
         logger.error(f"Error getting new subscribers details: {str(e)}")
         return []
 
 
+def count_new_subscribers_by_date(start_date, end_date):
+    """Return {'YYYY-MM-DD': new subscriber count} for days with new subscribers in the range"""
+    first_seen_counts = SubscriberFirstSeen.objects.filter(
+        first_seen__range=[start_date, end_date]
+    ).values('first_seen').annotate(new_subscribers=Count('id')).order_by()
+    return {
+        item['first_seen'].strftime('%Y-%m-%d'): item['new_subscribers']
+        for item in first_seen_counts
+    }
+
+
 def get_new_subscribers_trend_optimized(start_date, end_date):
     """Get new subscribers trend - OPTIMIZED version without day filtering"""
     try:
@@ -3494,31 +2617,8 @@ def get_new_subscribers_trend_optimized(start_date, end_date):
         elif isinstance(end_date, str):
             end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
 
-        # Single query to get first usage date for each subscriber
-        first_usage_dates = Usagereport.objects.values('SubscriberName').annotate(
-            first_usage=Min('DetailsViewedDate')
-        ).filter(
-            first_usage__range=[start_date, end_date]
-        )
-
-        # Group by date
-        trend_data = {}
-        for item in first_usage_dates:
-            first_usage = item['first_usage']
-            if first_usage is None:
-                continue
-
-            # Defensively ensure first_usage is a date object before calling strftime
-            if isinstance(first_usage, datetime):
-                first_usage = first_usage.date()
-            elif isinstance(first_usage, str):
-                # If the database returns a string, convert it. This handles formats like 'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM:SS'
-                first_usage = datetime.strptime(first_usage.split(' ')[0], '%Y-%m-%d').date()
-            
-            # Now we can safely call strftime
-            if isinstance(first_usage, date):
-                date_key = first_usage.strftime('%Y-%m-%d')
-                trend_data[date_key] = trend_data.get(date_key, 0) + 1
+        # New subscribers per day, counted over the materialized first usage dates
+        trend_data = count_new_subscribers_by_date(start_date, end_date)
         
         # Create complete date range with zero counts for missing dates
         new_subscribers_by_date = []
@@ -3560,29 +2660,8 @@ def get_new_subscribers_trend_filtered(start_date, end_date, new_subscribers_day
         else:
             trends_start = start_date
         
-        # Single query to get first usage date for each subscriber
-        first_usage_dates = Usagereport.objects.values('SubscriberName').annotate(
-            first_usage=Min('DetailsViewedDate')
-        ).filter(
-            first_usage__range=[trends_start, end_date]
-        )
-        
-        # Group by date
-        trend_data = {}
-        for item in first_usage_dates:
-            first_usage = item['first_usage']
-            if first_usage is None:
-                continue
-
-            # Defensively ensure first_usage is a date object before calling strftime
-            if isinstance(first_usage, datetime):
-                first_usage = first_usage.date()
-            elif isinstance(first_usage, str):
-                first_usage = datetime.strptime(first_usage.split(' ')[0], '%Y-%m-%d').date()
-            
-            if isinstance(first_usage, date):
-                date_key = first_usage.strftime('%Y-%m-%d')
-                trend_data[date_key] = trend_data.get(date_key, 0) + 1
+        # New subscribers per day, counted over the materialized first usage dates
+        trend_data = count_new_subscribers_by_date(trends_start, end_date)
         
         # Create complete date range with zero counts for missing dates
         new_subscribers_by_date = []
@@ -3655,7 +2734,7 @@ def get_three_month_rolling_usage(subscriber_filter=None):
         current_month_start = today.replace(day=1)
         
         # Calculate the three months to display
-        months_data = []
+        months = []
         
         for i in range(3):
             if i == 0:
@@ -3673,19 +2752,19 @@ def get_three_month_rolling_usage(subscriber_filter=None):
                 else:
                     month_start = current_month_start.replace(month=current_month_start.month - i)
             
-            # Calculate month end
-            if month_start.month == 12:
-                month_end = month_start.replace(year=month_start.year + 1, month=1, day=1)
-            else:
-                month_end = month_start.replace(month=month_start.month + 1, day=1)
-            
+            # Calculate month end (last day of the month)
+            month_end = month_start.replace(day=calendar.monthrange(month_start.year, month_start.month)[1])
+            months.append((month_start, month_end))
+        
+        # One slice over the three months: the closed previous months come from the
+        # permanent month cache, so only the current month is read from the database
+        usage = DashboardSlice.load(months[-1][0], months[0][1])
+        selected_subscriber = subscriber_filter if subscriber_filter and subscriber_filter != 'all' else None
+        
+        months_data = []
+        for month_start, month_end in months:
             # Get usage count for this month
-            query = Usagereport.objects.filter(DetailsViewedDate__range=[month_start, month_end])
-            
-            if subscriber_filter and subscriber_filter != 'all':
-                query = query.filter(SubscriberName=subscriber_filter)
-            
-            usage_count = query.count()
+            usage_count = usage.total_usage(month_start, month_end, selected_subscriber)
             
             # Format month name
             month_name = calendar.month_name[month_start.month]
@@ -3713,32 +2792,19 @@ def get_daily_comparison(subscriber_filter=None):
     Returns usage counts for the previous day and the same day of the previous month.
     e.g., if today is June 25th, it compares usage for June 24th vs May 24th.
     """
-    yesterday = (timezone.now() - timedelta(days=1)).date()
-
-    if yesterday.month == 1:
-        prev_month_year = yesterday.year - 1
-        prev_month = 12
-    else:
-        prev_month_year = yesterday.year
-        prev_month = yesterday.month - 1
-
-    # Handle cases where the day doesn't exist in the previous month (e.g., 31st)
-    last_day_of_prev_month = calendar.monthrange(prev_month_year, prev_month)[1]
-    day_to_use = min(yesterday.day, last_day_of_prev_month)
-
-    prev_month_day = date(prev_month_year, prev_month, day_to_use)
+    yesterday, prev_month_day = daily_comparison_dates()
 
     # Query usage for yesterday and the corresponding day last month
-    query_yesterday = Usagereport.objects.filter(DetailsViewedDate=yesterday)
-    query_prev = Usagereport.objects.filter(DetailsViewedDate=prev_month_day)
+    query_yesterday = UsageDailyRollup.objects.filter(date=yesterday)
+    query_prev = UsageDailyRollup.objects.filter(date=prev_month_day)
 
     # Apply subscriber filter if provided
     if subscriber_filter and subscriber_filter != 'all':
-        query_yesterday = query_yesterday.filter(SubscriberName=subscriber_filter)
-        query_prev = query_prev.filter(SubscriberName=subscriber_filter)
+        query_yesterday = query_yesterday.filter(subscriber_name=subscriber_filter)
+        query_prev = query_prev.filter(subscriber_name=subscriber_filter)
 
-    yesterday_count = query_yesterday.count()
-    prev_count = query_prev.count()
+    yesterday_count = query_yesterday.aggregate(total=Sum('usage_count'))['total'] or 0
+    prev_count = query_prev.aggregate(total=Sum('usage_count'))['total'] or 0
     
     # Debug logging
     if settings.DEBUG:
@@ -3750,10 +2816,10 @@ def get_daily_comparison(subscriber_filter=None):
         print(f"Subscriber filter: {subscriber_filter}")
         
         # Check if there's any data around these dates
-        recent_data = Usagereport.objects.filter(
-            DetailsViewedDate__gte=yesterday - timedelta(days=7),
-            DetailsViewedDate__lte=yesterday + timedelta(days=1)
-        ).count()
+        recent_data = UsageDailyRollup.objects.filter(
+            date__gte=yesterday - timedelta(days=7),
+            date__lte=yesterday + timedelta(days=1)
+        ).aggregate(total=Sum('usage_count'))['total'] or 0
         print(f"Data in last 7 days: {recent_data}")
 
     return {
@@ -0,0 +1,16 @@
+# Celery application for background report generation
+# Start a worker with: celery -A report worker -l info
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'report.settings')
+
+app = Celery('report')
+
+# Read CELERY_* settings from Django settings
+app.config_from_object('django.conf:settings', namespace='CELERY')
+
+# Load tasks.py from every installed app
+app.autodiscover_tasks()
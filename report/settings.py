@@ -193,9 +193,105 @@ CACHES = {
     }
 }
 
+# Dashboard data uses a two-tier cache (bulkrep/cache_backends.py): a bounded in-process
+# LRU in front of a shared cache, so hits don't touch SQL Server. The shared tier is Redis
+# when DASHBOARD_CACHE_REDIS_URL is set and a local file cache otherwise.
+DASHBOARD_CACHE_REDIS_URL = config('DASHBOARD_CACHE_REDIS_URL', default='')
+
+CACHES['dashboard'] = {
+    'BACKEND': 'bulkrep.cache_backends.TieredCache',
+    'LOCATION': 'dashboard',
+    'TIMEOUT': 300,
+    'OPTIONS': {
+        'SHARED_CACHE': 'dashboard_shared',
+        'MAX_ENTRIES': 1024,  # entries kept in each process
+        'LOCAL_TIMEOUT': 60,  # max seconds before a process re-reads the shared tier
+    }
+}
+
+if DASHBOARD_CACHE_REDIS_URL:
+    CACHES['dashboard_shared'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': DASHBOARD_CACHE_REDIS_URL,
+        'TIMEOUT': 300,
+    }
+else:
+    CACHES['dashboard_shared'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'dashboard',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        }
+    }
+
 # Cache key prefix to avoid conflicts
 CACHE_MIDDLEWARE_KEY_PREFIX = 'bulkrep'
 
+# Report generation
+# Reports with at least this many usage rows stream their product sections
+# through a write-only workbook so memory stays flat (negative disables streaming)
+REPORT_STREAMING_MIN_ROWS = config('REPORT_STREAMING_MIN_ROWS', default=5000, cast=int)
+
+# Worker processes used to render the per-subscriber workbooks of a bulk report
+# (0 = one per CPU core, 1 = render in the request/job process). Inside a Celery
+# prefork worker the processes come from billiard, which daemonic workers may start
+REPORT_BULK_WORKERS = config('REPORT_BULK_WORKERS', default=0, cast=int)
+
+# Usage rows fetched per database round trip when bulk reports stream their data
+REPORT_USAGE_CHUNK_SIZE = config('REPORT_USAGE_CHUNK_SIZE', default=2000, cast=int)
+
+# Usage aggregates (python manage.py refresh_usage_aggregates)
+# Days before each aggregate's watermark that are recomputed on every run,
+# to pick up usage rows loaded after their day was first aggregated
+USAGE_LATE_ARRIVAL_DAYS = config('USAGE_LATE_ARRIVAL_DAYS', default=3, cast=int)
+
+# Dashboard API
+# Threads per process evaluating dashboard metric queries side by side, shared by every
+# request, so it also bounds the database connections they open (0 = one after another)
+DASHBOARD_METRIC_WORKERS = config('DASHBOARD_METRIC_WORKERS', default=8, cast=int)
+
+# Seconds each metric may run (counted from when it starts) before the API returns a
+# partial payload with a 'timed_out' list naming the missing metrics
+DASHBOARD_METRIC_TIMEOUT = config('DASHBOARD_METRIC_TIMEOUT', default=20, cast=float)
+
+# Seconds each dashboard metric stays cached, by payload key; overrides the defaults in
+# bulkrep/dashboard_cache.py (e.g. {'unique_products': 43200}). Unlisted metrics keep 300.
+DASHBOARD_METRIC_CACHE_TTLS = {}
+
+# Seconds past its TTL a cached dashboard metric is still served (marked 'stale' with its
+# age) while one background refresh recomputes it; older entries are recomputed in the request
+DASHBOARD_MAX_STALENESS = config('DASHBOARD_MAX_STALENESS', default=3600, cast=int)
+
+# Seconds the dashboard data version (the ETag of the JSON endpoints) is reused before
+# the aggregate watermarks and rates are read again
+DASHBOARD_DATA_VERSION_TTL = config('DASHBOARD_DATA_VERSION_TTL', default=10, cast=int)
+
+# Subscribers whose current-month dashboards warm_dashboard_cache precomputes
+# (comma-separated, e.g. DASHBOARD_KEY_SUBSCRIBERS="Bank A,Bank B")
+DASHBOARD_KEY_SUBSCRIBERS = [
+    name.strip() for name in config('DASHBOARD_KEY_SUBSCRIBERS', default='').split(',') if name.strip()
+]
+
+# Seconds between scheduled dashboard cache warm-ups on Celery beat (0 = not scheduled)
+DASHBOARD_WARM_INTERVAL = config('DASHBOARD_WARM_INTERVAL', default=0, cast=int)
+
+# Background report jobs (Celery)
+# Point CELERY_BROKER_URL at Redis and start a worker (celery -A report worker). Jobs only
+# run eagerly inside the request by default with DEBUG on; the bulkrep.W001/E001 system
+# checks flag eager mode outside DEBUG and queued jobs without a shared broker.
+CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='memory://')
+CELERY_TASK_ALWAYS_EAGER = config('CELERY_TASK_ALWAYS_EAGER', default=DEBUG, cast=bool)
+CELERY_TASK_IGNORE_RESULT = True  # ReportGeneration rows are the job records
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1  # Report jobs are long; don't hoard them on one worker
+CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {}
+if DASHBOARD_WARM_INTERVAL > 0:
+    CELERY_BEAT_SCHEDULE['warm-dashboard-cache'] = {
+        'task': 'bulkrep.warm_dashboard_cache',
+        'schedule': DASHBOARD_WARM_INTERVAL,
+    }
+
 # Email configuration for password reset and notifications
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = config('EMAIL_HOST')